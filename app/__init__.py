@@ -4,10 +4,21 @@ import pymysql
 from werkzeug.exceptions import HTTPException
 from werkzeug.middleware.proxy_fix import ProxyFix
 
+from .archive import log_archive
+from .audit import audit_log_writer, read_auditor
+from .caches import auth_version_cache, response_cache, staff_role_cache
+from .commands import cli_commands
 from .config import AppConfig
 from .database import db
+from .images import image_pipeline
+from .indexes import bin_location_index, bin_whitelist_index
 from .jwt import jwt_manager
+from .leaderboard import leaderboard
+from .metrics import TimedQueuePool, metrics
+from .migrations import pending_migrations
 from .routes import route_blueprints
+from .statistics import submission_rollups
+from .versions import table_versions
 
 load_dotenv()
 
@@ -28,16 +39,39 @@ def create_app(test_config: dict | None = None):
         f'{app.config["DATABASE_HOST"]}/{app.config["DATABASE_NAME"]}'
     )
 
+    # the pool records how long requests wait for a connection
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {"poolclass": TimedQueuePool})
+
     jwt_manager.init_app(app)
 
     db.init_app(app)
+    audit_log_writer.init_app(app)
+    read_auditor.init_app(app)
+    log_archive.init_app(app)
+    image_pipeline.init_app(app)
+
+    metrics.init_app(app)
+    metrics.register_cache("staff_role", staff_role_cache)
+    metrics.register_cache("auth_version", auth_version_cache)
+    metrics.register_cache("catalog_response", response_cache)
+    metrics.register_cache("timeseries", submission_rollups.cache)
 
     with app.app_context():
         db.create_all()
+        table_versions.ensure_rows()
+
+        if pending_migrations():
+            print("The database has pending migrations, run `flask db upgrade`")
+        bin_location_index.rebuild()
+        bin_whitelist_index.rebuild()
+        leaderboard.rebuild()
 
     for routes_bp in route_blueprints:
         app.register_blueprint(routes_bp)
 
+    for command in cli_commands:
+        app.cli.add_command(command)
+
     @app.errorhandler(HTTPException)
     def handle_http_exception(e):
         print(f"{e.name} ({e.code})")
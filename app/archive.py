@@ -0,0 +1,251 @@
+"""Cold storage for user action logs that are older than the retention period"""
+
+from datetime import date, datetime, time, timedelta
+import gzip
+import json
+import os
+from pathlib import Path
+import uuid
+
+from sqlalchemy import delete, func, select
+
+from .constants import Constants
+from .database import db
+from .models import UserActionLog
+from .util import get_uploads_subdirectory, write_json_atomically
+
+
+class LogArchive:
+    # logs are moved out of user_action_logs into one gzip compressed JSON lines segment per day
+    # (<year>/<month>/<day>.jsonl.gz) with a small index next to it describing the segment's ids,
+    # time range, tables (with the range of resource ids logged for each) and action types,
+    # so that reads can skip segments without decompressing them
+    # records are stored as `UserActionLog.to_dict()` so they are returned unchanged by /logs/actions
+    def __init__(self):
+        self.retention_days = 90
+        self.batch_size = 5000
+        self.uploads_directory = ""
+
+    def init_app(self, app):
+        self.retention_days = app.config["LOG_RETENTION_DAYS"]
+        self.batch_size = app.config["LOG_ARCHIVE_BATCH_SIZE"]
+        self.uploads_directory = app.config["UPLOADS_DIRECTORY"]
+
+    @property
+    def directory(self) -> Path:
+        return get_uploads_subdirectory(
+            self.uploads_directory, Constants.LOG_ARCHIVE_DIRECTORY
+        )
+
+    # logs from before the start of this (local) day are archived
+    def cutoff(self, now: datetime | None = None) -> datetime:
+        now = now or datetime.now()
+        return datetime.combine(
+            now.date() - timedelta(days=self.retention_days), time()
+        )
+
+    def _segment_paths(self, day: date) -> tuple[Path, Path]:
+        month_directory = self.directory.joinpath(f"{day.year:04}", f"{day.month:02}")
+        return (
+            month_directory.joinpath(f"{day.day:02}.jsonl.gz"),
+            month_directory.joinpath(f"{day.day:02}.index.json"),
+        )
+
+    def _read_segment(self, day: date):
+        segment_path, _ = self._segment_paths(day)
+        if not segment_path.exists():
+            return
+        with gzip.open(segment_path, "rt", encoding="utf-8") as file:
+            for line in file:
+                yield json.loads(line)
+
+    def _read_index(self, day: date) -> dict | None:
+        _, index_path = self._segment_paths(day)
+        try:
+            with open(index_path, encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    # days that have a segment, oldest first
+    def days(self) -> list[date]:
+        return sorted(
+            date(int(path.parent.parent.name), int(path.parent.name), int(day))
+            for path in self.directory.glob("*/*/*.index.json")
+            for day in [path.name.split(".", 1)[0]]
+        )
+
+    # moves every log from before the cutoff to the archive, one day at a time,
+    # and returns the number of logs archived
+    def archive(self, now: datetime | None = None) -> int:
+        cutoff = self.cutoff(now)
+        archived = 0
+        while True:
+            oldest = db.session.execute(
+                select(func.min(UserActionLog.timestamp)).where(
+                    UserActionLog.timestamp < cutoff
+                )
+            ).scalar_one_or_none()
+            if oldest is None:
+                return archived
+            archived += self._archive_day(oldest.date())
+
+    def _archive_day(self, day: date) -> int:
+        start = datetime.combine(day, time())
+        segment_path, index_path = self._segment_paths(day)
+        segment_path.parent.mkdir(parents=True, exist_ok=True)
+
+        index = {
+            "day": day.isoformat(),
+            "count": 0,
+            "min_id": None,
+            "max_id": None,
+            "min_timestamp": None,
+            "max_timestamp": None,
+            "resource_tables": set(),
+            # table -> [lowest, highest] resource id
+            "resource_id_ranges": {},
+            "action_types": set(),
+        }
+
+        def add(file, record: dict):
+            index["count"] += 1
+            for key, value in (
+                ("id", record["id"]),
+                ("timestamp", record["timestamp"]),
+            ):
+                if index[f"min_{key}"] is None or value < index[f"min_{key}"]:
+                    index[f"min_{key}"] = value
+                if index[f"max_{key}"] is None or value > index[f"max_{key}"]:
+                    index[f"max_{key}"] = value
+            index["resource_tables"].add(record["resource_table"])
+            id_range = index["resource_id_ranges"].setdefault(
+                record["resource_table"],
+                [record["resource_id"], record["resource_id"]],
+            )
+            id_range[0] = min(id_range[0], record["resource_id"])
+            id_range[1] = max(id_range[1], record["resource_id"])
+            index["action_types"].add(record["action_type"])
+            file.write(json.dumps(record) + "\n")
+
+        # the segment is rewritten rather than appended to, so a run that was interrupted
+        # before deleting the rows it archived does not leave duplicates behind
+        temporary_path = segment_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        archived_ids = []
+        with gzip.open(temporary_path, "wt", encoding="utf-8") as file:
+            existing_ids = set()
+            for record in self._read_segment(day):
+                existing_ids.add(record["id"])
+                add(file, record)
+
+            result = db.session.execute(
+                select(UserActionLog)
+                .where(
+                    UserActionLog.timestamp >= start,
+                    UserActionLog.timestamp < start + timedelta(days=1),
+                )
+                .order_by(UserActionLog.id)
+                .execution_options(yield_per=self.batch_size)
+            )
+            for logs in result.scalars().partitions():
+                for log in logs:
+                    archived_ids.append(log.id)
+                    if log.id not in existing_ids:
+                        add(file, log.to_dict())
+
+        os.replace(temporary_path, segment_path)
+        write_json_atomically(
+            {
+                **index,
+                "resource_tables": sorted(index["resource_tables"]),
+                "action_types": sorted(index["action_types"]),
+            },
+            index_path,
+        )
+
+        # deleted in batches so that each transaction (and the locks it holds) stays small
+        for position in range(0, len(archived_ids), self.batch_size):
+            db.session.execute(
+                delete(UserActionLog).where(
+                    UserActionLog.id.in_(
+                        archived_ids[position : position + self.batch_size]
+                    )
+                )
+            )
+            db.session.commit()
+
+        return len(archived_ids)
+
+    # whether the segment can have logs of the resource id in `filters`
+    # (indexes written before resource id ranges were added are always read)
+    def _may_have_resource(self, index: dict, filters: dict) -> bool:
+        if "resource_id" not in filters or "resource_id_ranges" not in index:
+            return True
+
+        id_ranges = index["resource_id_ranges"]
+        tables = (
+            [filters["resource_table"]] if "resource_table" in filters else id_ranges
+        )
+        return any(
+            id_ranges[table][0] <= filters["resource_id"] <= id_ranges[table][1]
+            for table in tables
+            if table in id_ranges
+        )
+
+    # archived logs between the `start` and `end` unix timestamps (inclusive) with an id after `after`
+    # whose values match `filters` (column -> value), the first `limit` (or all) in order of id
+    def read(
+        self,
+        start: int,
+        end: int | None,
+        filters: dict,
+        after: int | None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        start_day = datetime.fromtimestamp(start).date()
+        end_day = datetime.fromtimestamp(end).date() if end is not None else None
+
+        records = []
+        for day in self.days():
+            if day < start_day or (end_day is not None and day > end_day):
+                continue
+
+            index = self._read_index(day)
+            if (
+                index is None
+                or index["count"] == 0
+                or index["max_timestamp"] < start
+                or (end is not None and index["min_timestamp"] > end)
+                or (after is not None and index["max_id"] <= after)
+                # the page is already full of logs older than any in this segment
+                or (
+                    limit is not None
+                    and len(records) == limit
+                    and index["min_id"] > records[-1]["id"]
+                )
+                # no log in the segment has the table or action type asked for
+                or any(
+                    key in filters and filters[key] not in index[f"{key}s"]
+                    for key in ("resource_table", "action_type")
+                )
+                or not self._may_have_resource(index, filters)
+            ):
+                continue
+
+            for record in self._read_segment(day):
+                if (
+                    record["timestamp"] >= start
+                    and (end is None or record["timestamp"] <= end)
+                    and (after is None or record["id"] > after)
+                    and all(record[key] == value for key, value in filters.items())
+                ):
+                    records.append(record)
+
+            records.sort(key=lambda record: record["id"])
+            if limit is not None:
+                del records[limit:]
+
+        return records
+
+
+log_archive = LogArchive()
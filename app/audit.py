@@ -0,0 +1,231 @@
+import atexit
+import os
+import queue
+import random
+import threading
+import time
+
+from sqlalchemy import insert
+
+from .database import db
+from .models import UserActionLog
+
+
+class AuditLogWriter:
+    # user action logs are put on a bounded queue and written by a background thread
+    # using multi-row INSERTs, either every `flush_interval` seconds or every `batch_size` logs
+    # when AUDIT_LOG_ASYNC is disabled logs are written immediately in the caller's session
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.batch_size = 500
+        self.flush_interval = 0.2
+        self.put_timeout = 1.0
+
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        self._counters_lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.backpressure_events = 0
+        self.last_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config["AUDIT_LOG_ASYNC"]
+        self.batch_size = app.config["AUDIT_LOG_BATCH_SIZE"]
+        self.flush_interval = app.config["AUDIT_LOG_FLUSH_INTERVAL"]
+        self.put_timeout = app.config["AUDIT_LOG_PUT_TIMEOUT"]
+        self._queue = queue.Queue(maxsize=app.config["AUDIT_LOG_QUEUE_SIZE"])
+        atexit.register(self.shutdown)
+
+    def write(self, log_data: dict):
+        self.write_many([log_data])
+
+    def write_many(self, logs_data: list[dict]):
+        if not logs_data:
+            return
+
+        if not self.enabled:
+            db.session.execute(insert(UserActionLog), logs_data)
+            return
+
+        self._ensure_thread()
+        for index, log_data in enumerate(logs_data):
+            try:
+                # blocks the caller while the queue is full
+                self._queue.put(log_data, timeout=self.put_timeout)
+            except queue.Full:
+                # the writer thread cannot keep up, so the caller writes its own logs
+                with self._counters_lock:
+                    self.backpressure_events += 1
+                self._flush(logs_data[index:])
+                return
+
+            with self._counters_lock:
+                self.enqueued += 1
+
+    # the thread is started lazily so that each (forked) gunicorn worker gets its own
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+
+            if self._pid is not None and self._pid != os.getpid():
+                # queue inherited from the parent process may have been mid-operation
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="audit-log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set() or not self._queue.empty():
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+
+    def _take_batch(self) -> list[dict]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: list[dict]):
+        start = time.perf_counter()
+        try:
+            self._write(batch)
+        except Exception as e:
+            print(f"Failed to write {len(batch)} user action logs -> {e}")
+            with self._counters_lock:
+                self.failed += len(batch)
+            return
+
+        duration = time.perf_counter() - start
+        with self._counters_lock:
+            self.written += len(batch)
+            self.flushes += 1
+            self.last_flush_seconds = duration
+            self.total_flush_seconds += duration
+
+    # writes the batch in its own session, outside of any request
+    def _write(self, batch: list[dict]):
+        with self.app.app_context():  # pyright: ignore
+            try:
+                db.session.execute(insert(UserActionLog), batch)
+                db.session.commit()
+            finally:
+                db.session.remove()
+
+    # called on interpreter exit so that queued logs are not lost
+    def shutdown(self, timeout: float = 10):
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        with self._counters_lock:
+            return {
+                "async": self.enabled,
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "failed": self.failed,
+                "flushes": self.flushes,
+                "backpressure_events": self.backpressure_events,
+                "last_flush_ms": round(self.last_flush_seconds * 1000, 3),
+                "average_flush_ms": (
+                    round(self.total_flush_seconds / self.flushes * 1000, 3)
+                    if self.flushes
+                    else 0
+                ),
+            }
+
+
+class ReadAuditor:
+    # reads of personal data are logged as `read` actions against the user whose data was read,
+    # `data_after` holds the table that was read
+    # a read of a table is logged with the probability given by `sample_rates` (unlisted tables are not logged)
+    # and repeated reads of the same data by the same user within `coalesce_window` seconds are logged once
+    # (per process), logs are written by the DatabaseController through the audit log writer
+    # so when it is asynchronous they are batched with other logs and written off the request path
+
+    # reads remembered for coalescing before expired ones are removed
+    max_tracked = 10_000
+
+    def __init__(self):
+        self.sample_rates: dict[str, float] = {}
+        self.coalesce_window = 300
+
+        self._lock = threading.Lock()
+        self._last_logged: dict[tuple[int, str, int], float] = {}
+
+        self.logged = 0
+        self.sampled_out = 0
+        self.coalesced = 0
+
+    def init_app(self, app):
+        self.sample_rates = app.config["READ_AUDIT_SAMPLE_RATES"]
+        self.coalesce_window = app.config["READ_AUDIT_COALESCE_WINDOW"]
+
+    def invalidate(self):
+        with self._lock:
+            self._last_logged = {}
+
+    # whether a read should be logged, also counts the reads that are not
+    def should_log(self, user_id: int, table: str, resource_user_id: int) -> bool:
+        sample_rate = self.sample_rates.get(table, 0)
+        key = (user_id, table, resource_user_id)
+        now = time.monotonic()
+
+        with self._lock:
+            if sample_rate < 1 and random.random() >= sample_rate:
+                self.sampled_out += 1
+                return False
+
+            last_logged = self._last_logged.get(key)
+            if last_logged is not None and now - last_logged < self.coalesce_window:
+                self.coalesced += 1
+                return False
+
+            self._last_logged[key] = now
+            if len(self._last_logged) > self.max_tracked:
+                self._last_logged = {
+                    key: logged_at
+                    for key, logged_at in self._last_logged.items()
+                    if now - logged_at < self.coalesce_window
+                }
+            self.logged += 1
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "logged": self.logged,
+                "sampled_out": self.sampled_out,
+                "coalesced": self.coalesced,
+            }
+
+
+audit_log_writer = AuditLogWriter()
+read_auditor = ReadAuditor()
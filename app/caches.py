@@ -0,0 +1,109 @@
+"""In-memory caches shared by all requests handled by a process"""
+
+from collections import OrderedDict
+import gzip
+import threading
+import time
+
+from .config import AppConfig
+
+
+class TTLCache:
+    # entries expire `ttl` seconds after being set, which bounds how long changes
+    # made by other processes (e.g. other gunicorn workers) can go unnoticed
+    def __init__(self, ttl: float, max_size: int = 10_000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries: dict = {}
+
+    # returns whether the key was found as well as the value, since None can be cached
+    def get(self, key) -> tuple[bool, object]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            return True, entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                self._entries.clear()
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class CachedResponse:
+    def __init__(self, body: bytes, gzip_min_size: int):
+        self.body = body
+        self.gzip_body = (
+            gzip.compress(body, compresslevel=6) if len(body) >= gzip_min_size else None
+        )
+
+
+class ResponseCache:
+    # serialised response bodies keyed by (table, table version, query string),
+    # a change to the table bumps its version so stale entries are never returned
+    # and are evicted once a newer version of the same table is cached
+    def __init__(self, max_size: int = 256, gzip_min_size: int = 1024):
+        self.max_size = max_size
+        self.gzip_min_size = gzip_min_size
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, CachedResponse] = OrderedDict()
+
+    def get(self, table: str, version: int, query: bytes) -> CachedResponse | None:
+        with self._lock:
+            entry = self._entries.get((table, version, query))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end((table, version, query))
+            return entry
+
+    def set(
+        self, table: str, version: int, query: bytes, body: bytes
+    ) -> CachedResponse:
+        # compressed outside of the lock
+        entry = CachedResponse(body, self.gzip_min_size)
+
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == table]:
+                if key[1] < version:
+                    del self._entries[key]
+
+            self._entries[(table, version, query)] = entry
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return entry
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# user id -> StaffRole (None if the user is not staff)
+staff_role_cache = TTLCache(AppConfig.ROLE_CACHE_TTL)
+
+# user id -> User.auth_version (None if the user does not exist)
+auth_version_cache = TTLCache(AppConfig.AUTH_VERSION_TTL)
+
+# catalog responses (bins, rewards and recyclables)
+response_cache = ResponseCache(
+    AppConfig.RESPONSE_CACHE_SIZE, AppConfig.RESPONSE_CACHE_GZIP_MIN_SIZE
+)
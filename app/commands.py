@@ -0,0 +1,90 @@
+import sys
+
+import click
+from flask.cli import AppGroup
+
+from .archive import log_archive
+from .ledger import points_ledger
+from .migrations import (
+    MIGRATIONS,
+    applied_versions,
+    migration_name,
+    migration_version,
+    upgrade,
+)
+from .statistics import statistics_counters, submission_rollups
+
+ledger_cli = AppGroup("ledger", help="Manage the points ledger.")
+
+
+@ledger_cli.command("rebuild")
+def rebuild_ledger():
+    """Recreate ledger entries and balances from submissions and purchases.
+
+    Points values and prices are taken from the current recyclables and rewards.
+    """
+    points_ledger.rebuild()
+    # the points issued and spent are counted from the ledger
+    statistics_counters.rebuild()
+    click.echo("Points ledger rebuilt")
+
+
+@ledger_cli.command("verify")
+def verify_ledger():
+    """Check that balances and ledger entries are consistent."""
+    problems = points_ledger.verify()
+    for problem in problems:
+        click.echo(problem)
+
+    if problems:
+        click.echo(f"{len(problems)} problem(s) found")
+        sys.exit(1)
+
+    click.echo("Points ledger is consistent")
+
+
+db_cli = AppGroup("db", help="Manage the database schema.")
+
+
+@db_cli.command("upgrade")
+def upgrade_database():
+    """Apply pending migrations to the database."""
+    upgrade(echo=click.echo)
+    click.echo("Database is up to date")
+
+
+@db_cli.command("status")
+def database_status():
+    """List migrations and whether they have been applied."""
+    applied = applied_versions()
+    for migration in MIGRATIONS:
+        version = migration_version(migration)
+        state = "applied" if version in applied else "pending"
+        click.echo(f"{version:04} {migration_name(migration)} {state}")
+
+
+statistics_cli = AppGroup("statistics", help="Manage the statistics counters.")
+
+
+@statistics_cli.command("rebuild")
+def rebuild_statistics():
+    """Recount the statistics counters and timeseries rollups from the database."""
+    statistics_counters.rebuild()
+    submission_rollups.rebuild()
+    click.echo("Statistics rebuilt")
+
+
+logs_cli = AppGroup("logs", help="Manage the user action logs.")
+
+
+@logs_cli.command("archive")
+def archive_logs():
+    """Move logs older than LOG_RETENTION_DAYS to compressed files in the uploads directory.
+
+    Archived logs are still returned by /logs/actions when `from` is before the retention period.
+    """
+    archived = log_archive.archive()
+    click.echo(f"{archived} log(s) archived")
+
+
+cli_commands = [ledger_cli, db_cli, statistics_cli, logs_cli]
@@ -1,4 +1,77 @@
 class AppConfig:
     MAX_BIN_DISTANCE = 50  # the maximum distance (in metres) a user can be from a bin to submission to it
     MAX_CONTENT_LENGTH = 10_485_760  # 10MB
+    MAX_SUBMISSION_BATCH = (
+        50  # submissions accepted by a single POST /submissions/batch
+    )
+    MAX_BULK_UPDATE = 1000  # submissions changed by a single PATCH /submissions/bulk
+    MODERATION_CLAIM_TTL = (
+        300  # seconds a moderator has to review the submissions they claimed
+    )
+    MODERATION_QUEUE_DEFAULT_LIMIT = 20
+    MODERATION_QUEUE_MAX_LIMIT = 100
     MINIMUM_AGE = 16  # minimum age required for account creation
+    DEFAULT_PAGE_SIZE = 100  # page size for list endpoints when no limit is given
+    MAX_PAGE_SIZE = 1000
+    EXPORT_BATCH_SIZE = 1000  # rows fetched per round trip when streaming exports
+    BIN_INDEX_TTL = 300  # seconds before the in-memory bin index is rebuilt
+    ROLE_CACHE_TTL = 60  # seconds a staff role lookup is cached for
+
+    # access tokens carry the user's role and frozen state so requests do not need to load the user,
+    # tokens are revoked when either changes (checked against a cache that lasts AUTH_VERSION_TTL seconds)
+    JWT_IDENTITY_CLAIMS = True
+    AUTH_VERSION_TTL = 30
+
+    # serialised catalog responses kept in memory, bodies of at least
+    # RESPONSE_CACHE_GZIP_MIN_SIZE bytes are also kept gzip compressed
+    RESPONSE_CACHE_SIZE = 256
+    RESPONSE_CACHE_GZIP_MIN_SIZE = 1024
+
+    NEARBY_DEFAULT_RADIUS = 1000  # metres
+    NEARBY_MAX_RADIUS = 10_000  # metres
+    NEARBY_DEFAULT_LIMIT = 10
+    NEARBY_MAX_LIMIT = 100
+
+    # user action logs are written by a background thread in batches
+    AUDIT_LOG_ASYNC = True
+    AUDIT_LOG_QUEUE_SIZE = (
+        10_000  # logs waiting to be written before callers are blocked
+    )
+    AUDIT_LOG_BATCH_SIZE = 500  # maximum number of logs per INSERT
+    AUDIT_LOG_FLUSH_INTERVAL = 0.2  # seconds
+    AUDIT_LOG_PUT_TIMEOUT = (
+        1.0  # seconds a caller waits on a full queue before writing itself
+    )
+
+    # user action logs older than LOG_RETENTION_DAYS are moved to compressed files by `flask logs archive`
+    LOG_RETENTION_DAYS = 90
+    LOG_ARCHIVE_BATCH_SIZE = 5000  # rows read and deleted per round trip when archiving
+
+    # reads of personal data are logged for READ_AUDIT_SAMPLE_RATES[table] (0 to 1) of requests,
+    # repeated reads by the same user within READ_AUDIT_COALESCE_WINDOW seconds are logged once
+    READ_AUDIT_SAMPLE_RATES = {"users": 1.0, "submissions": 1.0, "motivations": 1.0}
+    READ_AUDIT_COALESCE_WINDOW = 300
+
+    # each statistics counter is spread over this many rows to reduce lock contention
+    STATISTICS_COUNTER_SLOTS = 8
+
+    LEADERBOARD_TTL = 60  # seconds before the in-memory leaderboard is rebuilt
+    LEADERBOARD_DEFAULT_LIMIT = 10
+    LEADERBOARD_MAX_LIMIT = 100
+
+    TIMESERIES_DEFAULT_DAYS = 30  # period covered when `from` is not given
+    TIMESERIES_MAX_DAYS = 731
+    TIMESERIES_CACHE_TTL = 60  # seconds a timeseries is cached for
+
+    # request, database, cache and image metrics served at /metrics, each process writes its own
+    # to the uploads directory at most every METRICS_FLUSH_INTERVAL seconds to be added up
+    METRICS_ENABLED = True
+    METRICS_FLUSH_INTERVAL = 5  # seconds
+    # /metrics requires `Authorization: Bearer <token>`, and without a token it is
+    # refused unless the app is in debug or testing mode
+    METRICS_TOKEN = None
+
+    # number of processes converting uploaded images (0 processes them during the request),
+    # every web worker has its own pool so this is kept small
+    IMAGE_WORKERS = 2
+    IMAGE_JOB_TTL = 86_400  # seconds the status of an image job can be looked up for
@@ -2,3 +2,9 @@ class Constants:
     BIN_IMAGES_DIRECTORY = "bin-images"
     REWARD_IMAGES_DIRECTORY = "reward-images"
     SUBMISSION_IMAGES_DIRECTORY = "submission-images"
+    IMAGE_JOBS_DIRECTORY = "image-jobs"
+    LOG_ARCHIVE_DIRECTORY = "log-archive"
+    METRICS_DIRECTORY = "metrics"
+
+    # maximum width/height (in pixels) of the smaller versions of each image
+    IMAGE_VARIANT_SIZES = {"thumb": 96, "medium": 480}
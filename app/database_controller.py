@@ -1,18 +1,29 @@
-from sqlalchemy import select, func
+from datetime import datetime, timedelta
+
+from flask import g
+from sqlalchemy import insert, select, func, update
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
+from .audit import audit_log_writer
+from .caches import auth_version_cache, staff_role_cache
 from .database import db
 from .enums import StaffRole, SubmissionStatus, ActionType
+from .history import diff
+from .indexes import bin_location_index, bin_whitelist_index
+from .ledger import points_ledger
+from .statistics import (
+    statistics_counters,
+    submission_confirmations,
+    submission_rollups,
+)
+from .versions import table_versions
 from .models import (
     AllowedRecyclable,
     Bin,
     User,
     Staff,
-    Reward,
-    Purchase,
     Recyclable,
     Submission,
-    UserActionLog,
 )
 
 
@@ -63,13 +74,43 @@ def database_commit() -> bool:
         raise ServerError() from e
 
 
+# like `database_commit`, used when generated values (such as ids) are needed before committing
+def database_flush():
+    try:
+        db.session.flush()
+    except IntegrityError as e:
+        db.session.rollback()
+        raise InvalidDataError() from e
+    except SQLAlchemyError as e:
+        print(f"SQLAlchemyError -> {e}")
+        db.session.rollback()
+        raise ServerError("Unexpected server error") from e
+
+
+# like `database_flush` for statements executed without the ORM
+def database_execute(statement):
+    try:
+        return db.session.execute(statement)
+    except IntegrityError as e:
+        db.session.rollback()
+        raise InvalidDataError() from e
+    except SQLAlchemyError as e:
+        print(f"SQLAlchemyError -> {e}")
+        db.session.rollback()
+        raise ServerError("Unexpected server error") from e
+
+
 class DatabaseController:
     def create_new(self, model, data: dict, actor_user_id: int | None):
         instance = model(**data)
         db.session.add(instance)
 
+        database_flush()
+        self.before_commit(model, None, instance)
+
         committed = database_commit()
         if committed:
+            self.after_commit(model, instance)
             self.log_user_action(
                 actor_user_id,
                 ActionType.create,
@@ -81,6 +122,37 @@ class DatabaseController:
 
         return instance
 
+    # like `create_new` for several resources of the same model, the rows are inserted with
+    # a single multi-row INSERT and recorded and logged once for all of them
+    # only the points ledger, statistics and table versions are kept up to date, see `update_many`
+    def create_many(self, model, data: list[dict], actor_user_id: int | None):
+        result = database_execute(insert(model).values(data))
+
+        # InnoDB hands out the ids of all the rows of a multi-row INSERT at once, so they
+        # follow on from the first one, which is what MySQL reports as the last insert id
+        # (assuming the default auto_increment_increment of 1)
+        ids = list(range(result.lastrowid, result.lastrowid + len(data)))
+        created = self.get_many(model, ids)
+        instances = [created[id] for id in ids]
+        data_after = [instance.to_dict() for instance in instances]
+        self.before_commit_many(model, [], data_after)
+
+        committed = database_commit()
+        if committed:
+            self.log_user_actions(
+                actor_user_id,
+                ActionType.create,
+                model.__tablename__,
+                [(item["id"], None, item) for item in data_after],
+            )
+
+            # reloads the expired instances with one query rather than one per instance
+            self.get_many(model, ids)
+            for instance in instances:
+                self.after_commit(model, instance)
+
+        return instances
+
     def get(self, model, key: str, value):
         scalar = db.session.execute(
             db.select(model).where(getattr(model, key) == value)
@@ -89,10 +161,60 @@ class DatabaseController:
             raise NotFoundError()
         return scalar
 
+    # id -> resource, ids that do not exist are left out
+    def get_many(self, model, ids) -> dict:
+        scalars = db.session.execute(
+            db.select(model).where(model.id.in_(set(ids)))
+        ).scalars()
+        return {scalar.id: scalar for scalar in scalars}
+
+    # the ids out of `ids` that exist, checked with a single query
+    def get_existing_ids(self, model, ids) -> set[int]:
+        return set(
+            db.session.execute(
+                db.select(model.id).where(model.id.in_(set(ids)))
+            ).scalars()
+        )
+
     def get_all(self, model):
         scalars = db.session.execute(db.select(model)).scalars().all()
         return scalars
 
+    # keyset pagination, ids are auto incremented so ordering by id is also ordering by creation
+    def get_page(
+        self,
+        model,
+        limit: int,
+        after: int | None = None,
+        key: str | None = None,
+        value=None,
+        conditions: list | None = None,
+    ):
+        query = db.select(model).order_by(model.id).limit(limit + 1)
+        if after is not None:
+            query = query.where(model.id > after)
+        if key is not None:
+            query = query.where(getattr(model, key) == value)
+        if conditions:
+            query = query.where(*conditions)
+
+        scalars = db.session.execute(query).scalars().all()
+
+        # an extra row is fetched to determine if there is another page
+        next_cursor = None
+        if len(scalars) > limit:
+            scalars = scalars[:limit]
+            next_cursor = scalars[-1].id
+
+        return scalars, next_cursor
+
+    # rows are fetched with a server side cursor and yielded in lists of `batch_size`
+    def stream_all(self, model, batch_size: int):
+        result = db.session.execute(
+            db.select(model).order_by(model.id).execution_options(yield_per=batch_size)
+        )
+        yield from result.scalars().partitions()
+
     def get_all_matching(self, model, key: str, value):
         scalars = db.session.execute(
             db.select(model).where(getattr(model, key) == value)
@@ -111,17 +233,152 @@ class DatabaseController:
         for key, value in data.items():
             setattr(scalar, key, value)
 
+        self.before_commit(model, scalar_before_data, scalar)
+
         committed = database_commit()
         if committed:
+            self.after_commit(model, scalar)
+            # only the changed fields are logged, see `history.replay`
             self.log_user_action(
                 actor_user_id,
                 ActionType.update,
                 scalar.id,
                 model.__tablename__,
-                scalar_before_data,
-                scalar.to_dict(),
+                *diff(scalar_before_data, scalar.to_dict()),
+            )
+
+    # applies the same change to many resources with a single UPDATE ... WHERE id IN (...)
+    # and returns the ids of the resources that were changed (missing ids are ignored)
+    # only the points ledger and table versions are kept up to date, so this should not be
+    # used for models that have in-memory indexes or caches (bins, staff, users etc.)
+    # `filters` (column -> value) are checked again once the rows are locked,
+    # so rows that stopped matching after `ids` were selected are left alone
+    def update_many(
+        self,
+        model,
+        ids: list[int],
+        data: dict,
+        actor_user_id: int,
+        filters: dict | None = None,
+    ) -> list[int]:
+        # rows are locked until committed so the ledger sees what is actually updated
+        query = (
+            db.select(model)
+            .where(model.id.in_(set(ids)))
+            .order_by(model.id)
+            .with_for_update()
+        )
+        for key, value in (filters or {}).items():
+            query = query.where(getattr(model, key) == value)
+        scalars = db.session.execute(query).scalars()
+
+        # resources that already have the given values are left alone
+        data_before = [
+            scalar_data
+            for scalar_data in (scalar.to_dict() for scalar in scalars)
+            if any(scalar_data[key] != value for key, value in data.items())
+        ]
+        changed_ids = [scalar_data["id"] for scalar_data in data_before]
+        if not changed_ids:
+            db.session.rollback()
+            return []
+
+        db.session.execute(
+            update(model)
+            .where(model.id.in_(changed_ids))
+            .values(**data)
+            .execution_options(synchronize_session=False)
+        )
+        self.before_commit_many(
+            model,
+            data_before,
+            [{**scalar_data, **data} for scalar_data in data_before],
+        )
+
+        committed = database_commit()
+        if committed:
+            # only the changed fields are logged
+            self.log_user_actions(
+                actor_user_id,
+                ActionType.update,
+                model.__tablename__,
+                [
+                    (
+                        scalar_data["id"],
+                        {key: scalar_data[key] for key in data},
+                        data,
+                    )
+                    for scalar_data in data_before
+                ],
             )
 
+        return changed_ids
+
+    # oldest submissions with one of `statuses` that are not claimed by a moderator
+    # (or whose claim has expired)
+    def get_moderation_queue(self, statuses: list[SubmissionStatus], limit: int):
+        return self._moderation_queue(statuses, limit)
+
+    # claims up to `limit` submissions from the queue for `claim_ttl` seconds
+    # rows being claimed by another moderator are skipped rather than waited for
+    def claim_moderation_queue(
+        self,
+        statuses: list[SubmissionStatus],
+        limit: int,
+        moderator_id: int,
+        claim_ttl: int,
+    ) -> tuple[list, datetime]:
+        submissions = self._moderation_queue(statuses, limit, for_update=True)
+
+        ids = [submission.id for submission in submissions]
+        claim_expires_at = datetime.now() + timedelta(seconds=claim_ttl)
+        if ids:
+            db.session.execute(
+                update(Submission)
+                .where(Submission.id.in_(ids))
+                .values(claimed_by=moderator_id, claim_expires_at=claim_expires_at)
+                .execution_options(synchronize_session=False)
+            )
+        database_commit()
+
+        # reloads the expired submissions with one query rather than one per submission
+        self.get_many(Submission, ids)
+
+        return submissions, claim_expires_at
+
+    # each status is read in the order of the (status, created_at) index so that the
+    # query stops after `limit` rows, `status IN (...)` would need a filesort, which
+    # reads (and with `for_update` locks) every unclaimed submission with the statuses
+    def _moderation_queue(
+        self, statuses: list[SubmissionStatus], limit: int, for_update: bool = False
+    ) -> list:
+        submissions = []
+        for status in dict.fromkeys(statuses):
+            query = (
+                db.select(Submission)
+                .where(
+                    Submission.status == status,
+                    (Submission.claimed_by.is_(None))
+                    | (Submission.claim_expires_at < datetime.now()),
+                )
+                .order_by(Submission.created_at, Submission.id)
+                .limit(limit)
+            )
+            if for_update:
+                query = query.with_for_update(skip_locked=True)
+            submissions.extend(db.session.execute(query).scalars())
+
+        # rows past `limit` stay locked only until the claim is committed
+        submissions.sort(key=lambda submission: (submission.created_at, submission.id))
+        return submissions[:limit]
+
+    # ids of the resources matching all of `filters`, in order of creation
+    def get_ids_matching(self, model, filters: dict, limit: int) -> list[int]:
+        query = db.select(model.id).order_by(model.id).limit(limit)
+        for key, value in filters.items():
+            query = query.where(getattr(model, key) == value)
+        return list(db.session.execute(query).scalars())
+
     def delete(self, model, key: str, value, actor_user_id: int):
         scalar = db.session.execute(
             db.select(model).where(getattr(model, key) == value)
@@ -129,10 +386,12 @@ class DatabaseController:
         if scalar is None:
             raise NotFoundError()
 
+        self.before_commit(model, scalar.to_dict(), None)
         db.session.delete(scalar)
 
         committed = database_commit()
         if committed:
+            self.after_commit(model, scalar, deleted=True)
             self.log_user_action(
                 actor_user_id,
                 ActionType.delete,
@@ -142,6 +401,67 @@ class DatabaseController:
                 None,
             )
 
+    # writes that must happen in the same transaction as a change to a resource
+    # `data_before` is None for new resources and `instance` is None for deleted resources
+    def before_commit(self, model, data_before: dict | None, instance):
+        points_ledger.record(model, data_before, instance)
+        table_versions.bump(model)
+        statistics_counters.record(model, data_before, instance)
+        submission_rollups.record(model, data_before, instance)
+        submission_confirmations.record(model, data_before, instance)
+
+        # revoke access tokens that carry an outdated role or frozen state
+        user_ids = set()
+        if model is Staff:
+            if data_before is not None:
+                user_ids.add(data_before["user_id"])
+            if instance is not None:
+                user_ids.add(instance.user_id)
+        elif (
+            model is User
+            and data_before is not None
+            and instance is not None
+            and data_before["frozen"] != instance.frozen
+        ):
+            user_ids.add(instance.id)
+
+        if user_ids:
+            db.session.execute(
+                update(User)
+                .where(User.id.in_(user_ids))
+                .values(auth_version=User.auth_version + 1)
+            )
+
+    # like `before_commit` for many rows of the same model, with a single write each
+    # `rows_before` and `rows_after` hold the rows' `to_dict()` before and after the change
+    def before_commit_many(
+        self, model, rows_before: list[dict], rows_after: list[dict]
+    ):
+        points_ledger.record_many(model, rows_before, rows_after)
+        table_versions.bump(model)
+        statistics_counters.record_many(model, rows_before, rows_after)
+        submission_rollups.record_many(model, rows_before, rows_after)
+        submission_confirmations.record_many(model, rows_before, rows_after)
+
+    # keeps in-memory indexes and caches consistent with changes made through the controller
+    def after_commit(self, model, instance, deleted: bool = False):
+        if model is Bin:
+            if deleted:
+                bin_location_index.remove(instance.id)
+            else:
+                bin_location_index.refresh(instance)
+
+        if model in (Bin, Recyclable, AllowedRecyclable):
+            bin_whitelist_index.invalidate()
+
+        if model is Staff:
+            # a staff member's user_id can be changed, so every role is invalidated
+            staff_role_cache.invalidate()
+            auth_version_cache.invalidate()
+            g.pop("staff_roles", None)
+        elif model is User:
+            auth_version_cache.invalidate(instance.id)
+
     def log_user_action(
         self,
         user_id: int | None,
@@ -151,18 +471,40 @@ class DatabaseController:
         data_before: dict | None,
         data_after: dict | None,
     ):
+        self.log_user_actions(
+            user_id,
+            action_type,
+            resource_table,
+            [(resource_id, data_before, data_after)],
+        )
 
-        log = UserActionLog(
-            user_id=user_id,  # pyright: ignore
-            action_type=action_type,  # pyright: ignore
-            resource_id=resource_id,  # pyright: ignore
-            resource_table=resource_table,  # pyright: ignore
-            data_before=data_before,  # pyright: ignore
-            data_after=data_after,  # pyright: ignore
+    # `changes` is a list of (resource_id, data_before, data_after)
+    def log_user_actions(
+        self,
+        user_id: int | None,
+        action_type: ActionType,
+        resource_table: str,
+        changes: list[tuple[int, dict | None, dict | None]],
+    ):
+        timestamp = datetime.now()
+        audit_log_writer.write_many(
+            [
+                {
+                    "user_id": user_id,
+                    "action_type": action_type,
+                    "resource_id": resource_id,
+                    "resource_table": resource_table,
+                    "data_before": data_before,
+                    "data_after": data_after,
+                    "timestamp": timestamp,
+                }
+                for resource_id, data_before, data_after in changes
+            ]
         )
 
-        db.session.add(log)
-        database_commit()
+        # logs are only added to the current session when not written asynchronously
+        if not audit_log_writer.enabled:
+            database_commit()
 
     def is_unique(self, model, key: str, value) -> bool:
         scalar = db.session.execute(
@@ -183,67 +525,39 @@ class DatabaseController:
             raise ValueError("Result of `get_count_of` is not int")
         return count
 
+    # the balance is maintained by `PointsLedger` whenever submissions or purchases change
     def get_user_balance(self, id: int) -> int:
-        # ensure that user exists first
         try:
-            self.get(User, "id", id)
+            user = self.get(User, "id", id)
         except NotFoundError as e:
             raise NotFoundError("User not found") from e
 
-        submissions_subquery = (
-            db.select(Recyclable.points_value)
-            .join(Submission, Submission.recyclable_id == Recyclable.id)
-            .where(
-                Submission.user_id == id
-                and Submission.status == SubmissionStatus.confirmed
-            )
-            .subquery()
-        )
-
-        earned_query = db.select(db.func.sum(submissions_subquery.c.points_value))
-        points_earned = db.session.execute(earned_query).scalar_one_or_none()
-        if points_earned is None:
-            points_earned = 0
+        return user.points_balance
 
-        purchases_subquery = (
-            db.select(Purchase.quantity, Reward.price)
-            .join(Reward, Purchase.reward_id == Reward.id)
-            .where(Purchase.user_id == id)
-            .subquery()
-        )
+    # returns None if the bin accepts any recyclable
+    def get_bin_whitelist(self, id: int) -> list | None:
+        found, recyclable_ids = bin_whitelist_index.get(id)
+        if not found:
+            raise NotFoundError("Bin not found")
 
-        spent_query = db.select(
-            db.func.sum(purchases_subquery.c.quantity * purchases_subquery.c.price)
-        )
-        points_spent = db.session.execute(spent_query).scalar_one_or_none()
-        if points_spent is None:
-            points_spent = 0
+        if recyclable_ids is None:
+            return None
 
-        return int(points_earned - points_spent)
+        if not recyclable_ids:
+            return []
 
-    def get_bin_whitelist(self, id: int):
-        recyclables = []
-        try:
-            bin = self.get(Bin, "id", id)
-        except NotFoundError as e:
-            raise NotFoundError("Bin not found") from e
-
-        if not bin.whitelist:
-            return recyclables
-
-        allowed_recyclables = (
+        return (
             db.session.execute(
-                db.select(AllowedRecyclable).where(AllowedRecyclable.bin_id == bin.id)
+                db.select(Recyclable)
+                .where(Recyclable.id.in_(recyclable_ids))
+                .order_by(Recyclable.id)
             )
             .scalars()
             .all()
         )
 
-        for allowed_recyclable in allowed_recyclables:
-            recyclable = self.get(Recyclable, "id", allowed_recyclable.recyclable_id)
-            recyclables.append(recyclable)
-
-        return recyclables
+    def is_recyclable_allowed(self, bin_id: int, recyclable_id: int) -> bool:
+        return bin_whitelist_index.allows(bin_id, recyclable_id)
 
     def validate_login(self, data: dict):
         user = None
@@ -261,30 +575,52 @@ class DatabaseController:
 
     # if User is owner of particular resource (User, Submission, Purchase etc)
     def is_owner(self, user_id: int, model, resource_id: int):
+        # `user_id` is always the authenticated user, who is known to exist
+        if model is User:
+            return user_id == resource_id
+
         try:
             resource = self.get(model, "id", resource_id)
         except NotFoundError:
             return False
 
-        if model is User:
-            return user_id == resource.id
-
         return getattr(resource, "user_id", -1) == user_id
 
+    # memoised for the request on `g` and across requests in `staff_role_cache`
+    def get_staff_role(self, id: int) -> StaffRole | None:
+        staff_roles = g.setdefault("staff_roles", {})
+        if id in staff_roles:
+            return staff_roles[id]
+
+        found, role = staff_role_cache.get(id)
+        if not found:
+            role = db.session.execute(
+                db.select(Staff.role).where(Staff.user_id == id)
+            ).scalar_one_or_none()
+            staff_role_cache.set(id, role)
+
+        staff_roles[id] = role
+        return role  # pyright: ignore
+
+    # for roles that are already known for the request (e.g. from access token claims)
+    def set_request_staff_role(self, id: int, role: StaffRole | None):
+        g.setdefault("staff_roles", {})[id] = role
+
+    def get_auth_version(self, id: int) -> int | None:
+        found, auth_version = auth_version_cache.get(id)
+        if not found:
+            auth_version = db.session.execute(
+                db.select(User.auth_version).where(User.id == id)
+            ).scalar_one_or_none()
+            auth_version_cache.set(id, auth_version)
+        return auth_version  # pyright: ignore
+
     # admins also have moderator privileges
     def has_moderator_access_level(self, id: int) -> bool:
-        staff = db.session.execute(
-            db.select(Staff).where(Staff.user_id == id)
-        ).scalar_one_or_none()
-        return staff is not None
+        return self.get_staff_role(id) is not None
 
     def has_admin_access_level(self, id: int) -> bool:
-        staff = db.session.execute(
-            db.select(Staff).where(Staff.user_id == id)
-        ).scalar_one_or_none()
-        if staff is None or staff.role != StaffRole.admin:
-            return False
-        return True
+        return self.get_staff_role(id) == StaffRole.admin
 
     def is_owner_or_moderator(self, user_id: int, model, resource_id: int) -> bool:
         if self.has_moderator_access_level(user_id):
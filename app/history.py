@@ -0,0 +1,76 @@
+"""Past versions of a resource rebuilt from its user action logs"""
+
+from datetime import datetime
+
+from sqlalchemy import select
+
+from .archive import log_archive
+from .database import db
+from .enums import ActionType
+from .models import UserActionLog
+
+
+# the fields that differ between two versions of a resource, as they were before and after
+def diff(data_before: dict, data_after: dict) -> tuple[dict, dict]:
+    changed = [
+        key
+        for key in {**data_before, **data_after}
+        if data_before.get(key) != data_after.get(key)
+    ]
+    return (
+        {key: data_before.get(key) for key in changed},
+        {key: data_after.get(key) for key in changed},
+    )
+
+
+# applies logs (in order) to rebuild a resource, None if it does not exist after the last log
+# create and delete logs hold the whole resource while update logs only hold the fields changed
+# (older update logs hold the whole resource too, which replays the same way)
+def replay(logs: list[dict]) -> dict | None:
+    resource = None
+    for log in logs:
+        action_type = ActionType(log["action_type"])
+        if action_type == ActionType.create:
+            resource = dict(log["data_after"])
+        elif action_type == ActionType.update:
+            # fields are missing if the resource was created before it was logged
+            resource = {**(resource or {}), **log["data_after"]}
+        elif action_type == ActionType.delete:
+            resource = None
+    return resource
+
+
+# logs of a resource (archived and in the table) up to the `at` unix timestamp
+# and/or the log with id `log_id`, in order
+def get_resource_logs(
+    resource_table: str,
+    resource_id: int,
+    at: int | None = None,
+    log_id: int | None = None,
+) -> list[dict]:
+    query = (
+        select(UserActionLog)
+        .where(
+            UserActionLog.resource_table == resource_table,
+            UserActionLog.resource_id == resource_id,
+            UserActionLog.action_type != ActionType.read,
+        )
+        .order_by(UserActionLog.id)
+    )
+    if at is not None:
+        query = query.where(UserActionLog.timestamp <= datetime.fromtimestamp(at))
+    if log_id is not None:
+        query = query.where(UserActionLog.id <= log_id)
+
+    archived = [
+        log
+        for log in log_archive.read(
+            0,
+            at,
+            {"resource_table": resource_table, "resource_id": resource_id},
+            None,
+        )
+        if log["action_type"] != ActionType.read.value
+        and (log_id is None or log["id"] <= log_id)
+    ]
+    return archived + [log.to_dict() for log in db.session.execute(query).scalars()]
@@ -0,0 +1,153 @@
+import atexit
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import threading
+import time
+import uuid
+
+from werkzeug.datastructures import FileStorage
+
+from .constants import Constants
+from .metrics import metrics
+from .util import get_uploads_subdirectory, process_image_job, write_json_atomically
+
+
+class ImagePipeline:
+    # uploaded images are saved as they are and converted by a pool of worker processes,
+    # so the work scales with CPU cores rather than with the number of web workers
+    # job statuses are stored as files so that any web worker can report on any job
+    # when IMAGE_WORKERS is 0 images are processed immediately by the caller
+    def __init__(self):
+        self.workers = 0
+        self.uploads_directory = ""
+
+        # job files older than this are deleted, at most once every `job_ttl / 24` seconds
+        self.job_ttl = 86_400
+        self._pruned_at = 0.0
+
+        self._executor: ProcessPoolExecutor | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config["IMAGE_WORKERS"]
+        self.job_ttl = app.config["IMAGE_JOB_TTL"]
+        self.uploads_directory = app.config["UPLOADS_DIRECTORY"]
+        atexit.register(self.shutdown)
+
+    @property
+    def jobs_directory(self) -> Path:
+        return get_uploads_subdirectory(
+            self.uploads_directory, Constants.IMAGE_JOBS_DIRECTORY
+        )
+
+    # the pool is created lazily so that each (forked) gunicorn worker gets its own
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, image_file: FileStorage, image_path: Path, user_id: int) -> dict:
+        self._prune_jobs()
+
+        job_id = uuid.uuid4().hex
+        job_path = self.jobs_directory.joinpath(f"{job_id}.json")
+        upload_path = self.jobs_directory.joinpath(f"{job_id}.upload")
+
+        image_file.save(upload_path)
+
+        job = {"id": job_id, "user_id": user_id, "status": "pending"}
+        write_json_atomically(job, job_path)
+
+        start = time.perf_counter()
+        if self.workers == 0:
+            job = process_image_job(job_path, upload_path, image_path)
+            self._observe(start, job["status"])
+            return job
+
+        try:
+            future = self._get_executor().submit(
+                process_image_job, job_path, upload_path, image_path
+            )
+        except BrokenProcessPool:
+            # a worker process died, so the pool is replaced
+            with self._lock:
+                self._executor = None
+            future = self._get_executor().submit(
+                process_image_job, job_path, upload_path, image_path
+            )
+        future.add_done_callback(
+            lambda future: self._job_done(start, future, job, job_path, upload_path)
+        )
+        return job
+
+    def _job_done(
+        self, start: float, future: Future, job: dict, job_path: Path, upload_path: Path
+    ):
+        error = None if future.cancelled() else future.exception()
+        if future.cancelled() or error is not None:
+            # e.g. the worker process died (BrokenProcessPool) before the job was finished
+            print(f"Image job {job['id']} failed -> {error}")
+            upload_path.unlink(missing_ok=True)
+            write_json_atomically(
+                {**job, "status": "failed", "error": "Image could not be processed"},
+                job_path,
+            )
+            self._observe(start, "failed")
+        else:
+            self._observe(start, future.result()["status"])
+
+    def _observe(self, start: float, status: str):
+        metrics.observe(
+            "image_processing_duration_seconds",
+            time.perf_counter() - start,
+            status=status,
+        )
+
+    # deletes the files of jobs that have not changed for `job_ttl` seconds
+    def _prune_jobs(self):
+        now = time.time()
+        with self._lock:
+            if now - self._pruned_at < self.job_ttl / 24:
+                return
+            self._pruned_at = now
+
+        for path in self.jobs_directory.iterdir():
+            try:
+                if now - path.stat().st_mtime > self.job_ttl:
+                    path.unlink()
+            except FileNotFoundError:
+                # deleted by another web worker
+                pass
+
+    # returns None if there is no job with the id
+    def get_job(self, job_id: str) -> dict | None:
+        try:
+            uuid.UUID(hex=job_id)
+        except ValueError:
+            return None
+
+        try:
+            with open(
+                self.jobs_directory.joinpath(f"{job_id}.json"), encoding="utf-8"
+            ) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+image_pipeline = ImagePipeline()
@@ -0,0 +1,209 @@
+"""In-memory indexes that are kept up to date by the DatabaseController"""
+
+import heapq
+import math
+import threading
+import time
+
+from haversine import haversine, Unit
+
+from .config import AppConfig
+from .database import db
+from .models import AllowedRecyclable, Bin, Recyclable
+from .versions import table_versions
+
+_METRES_PER_DEGREE = 111_320
+
+
+class BinWhitelistIndex:
+    # bin id -> ids of the recyclables the bin accepts (None if the bin has no whitelist)
+    def __init__(self, ttl: int = 300, min_rebuild_interval: float = 1.0):
+        # changes made by other processes (e.g. other gunicorn workers) are picked up by
+        # comparing the versions of these tables with the ones the index was built from,
+        # see `TableVersions`
+        self.tables = [Bin, Recyclable]
+
+        # changes that do not bump a table version (such as allowed recyclables added
+        # outside of the controller) are picked up once the index is older than `ttl`
+        self.ttl = ttl
+
+        # unknown bin ids cause a rebuild, but no more often than this,
+        # in between they are loaded on their own
+        self.min_rebuild_interval = min_rebuild_interval
+
+        self._lock = threading.RLock()
+        self._whitelists: dict[int, frozenset[int] | None] = {}
+        self._versions: dict[str, int] = {}
+        self._built_at: float | None = None
+
+    # bin id -> whitelist of the bins matching `conditions`, bins and their allowed
+    # recyclables are loaded with a single query
+    @staticmethod
+    def _load(*conditions) -> dict[int, frozenset[int] | None]:
+        rows = db.session.execute(
+            db.select(Bin.id, Bin.whitelist, AllowedRecyclable.recyclable_id)
+            .outerjoin(AllowedRecyclable, AllowedRecyclable.bin_id == Bin.id)
+            .where(*conditions)
+        ).all()
+
+        allowed_recyclables: dict[int, set[int]] = {}
+        has_whitelist: dict[int, bool] = {}
+        for bin_id, whitelist, recyclable_id in rows:
+            has_whitelist[bin_id] = whitelist
+            allowed_recyclables.setdefault(bin_id, set())
+            if recyclable_id is not None:
+                allowed_recyclables[bin_id].add(recyclable_id)
+
+        return {
+            bin_id: frozenset(allowed_recyclables[bin_id]) if whitelist else None
+            for bin_id, whitelist in has_whitelist.items()
+        }
+
+    def rebuild(self):
+        versions = table_versions.get_many(self.tables)
+        whitelists = self._load()
+
+        with self._lock:
+            self._whitelists = whitelists
+            self._versions = versions
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    # returns whether the bin was found as well as its whitelist
+    def get(self, bin_id: int) -> tuple[bool, frozenset[int] | None]:
+        with self._lock:
+            # bins or recyclables changed by another process are picked up straight away
+            if (
+                self._built_at is None
+                or time.monotonic() - self._built_at > self.ttl
+                or table_versions.get_many(self.tables) != self._versions
+            ):
+                self.rebuild()
+            elif bin_id not in self._whitelists:
+                if time.monotonic() - self._built_at > self.min_rebuild_interval:
+                    self.rebuild()
+                else:
+                    # e.g. a bin created since the last rebuild
+                    self._whitelists.update(self._load(Bin.id == bin_id))
+
+            if bin_id not in self._whitelists:
+                return False, None
+            return True, self._whitelists[bin_id]
+
+    def allows(self, bin_id: int, recyclable_id: int) -> bool:
+        found, whitelist = self.get(bin_id)
+        if not found:
+            return False
+        return whitelist is None or recyclable_id in whitelist
+
+
+class BinLocationIndex:
+    # bins are bucketed into a grid of square cells `cell_size` degrees wide,
+    # so a nearby query only has to look at the cells that overlap the search radius
+    def __init__(self, cell_size: float = 0.01, ttl: int = 300):
+        self.cell_size = cell_size
+
+        # changes made by other processes (e.g. other gunicorn workers) are picked up
+        # by rebuilding the index once it is older than `ttl` seconds
+        self.ttl = ttl
+
+        self._lock = threading.RLock()
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        self._bins: dict[int, dict] = {}
+        self._built_at: float | None = None
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return (
+            math.floor(latitude / self.cell_size),
+            math.floor(longitude / self.cell_size),
+        )
+
+    def _add(self, bin_data: dict):
+        self._remove(bin_data["id"])
+        cell = self._cell(bin_data["latitude"], bin_data["longitude"])
+        self._cells.setdefault(cell, set()).add(bin_data["id"])
+        self._bins[bin_data["id"]] = bin_data
+
+    def _remove(self, id: int):
+        bin_data = self._bins.pop(id, None)
+        if bin_data is None:
+            return
+
+        cell = self._cell(bin_data["latitude"], bin_data["longitude"])
+        self._cells[cell].discard(id)
+        if not self._cells[cell]:
+            del self._cells[cell]
+
+    def rebuild(self):
+        bins = db.session.execute(db.select(Bin)).scalars().all()
+
+        with self._lock:
+            self._cells = {}
+            self._bins = {}
+            for bin in bins:
+                self._add(bin.to_dict())
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def refresh(self, bin: Bin):
+        with self._lock:
+            self._add(bin.to_dict())
+
+    def remove(self, id: int):
+        with self._lock:
+            self._remove(id)
+
+    def nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        radius: float,
+        limit: int,
+        recyclable_id: int | None = None,
+    ) -> list[tuple[float, dict]]:
+        with self._lock:
+            if self._built_at is None or time.monotonic() - self._built_at > self.ttl:
+                self.rebuild()
+
+            # size of the search radius in degrees (longitude degrees shrink towards the poles)
+            latitude_span = radius / _METRES_PER_DEGREE
+            longitude_span = radius / (
+                _METRES_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)
+            )
+
+            min_cell = self._cell(latitude - latitude_span, longitude - longitude_span)
+            max_cell = self._cell(latitude + latitude_span, longitude + longitude_span)
+
+            candidates = []
+            for cell_x in range(min_cell[0], max_cell[0] + 1):
+                for cell_y in range(min_cell[1], max_cell[1] + 1):
+                    for id in self._cells.get((cell_x, cell_y), ()):
+                        if (
+                            recyclable_id is not None
+                            and not bin_whitelist_index.allows(id, recyclable_id)
+                        ):
+                            continue
+
+                        bin_data = self._bins[id]
+                        distance = haversine(
+                            (latitude, longitude),
+                            (bin_data["latitude"], bin_data["longitude"]),
+                            unit=Unit.METERS,
+                        )
+                        if distance <= radius:
+                            candidates.append((distance, id))
+
+            return [
+                (distance, self._bins[id])
+                for distance, id in heapq.nsmallest(limit, candidates)
+            ]
+
+
+bin_whitelist_index = BinWhitelistIndex(ttl=AppConfig.BIN_INDEX_TTL)
+bin_location_index = BinLocationIndex(ttl=AppConfig.BIN_INDEX_TTL)
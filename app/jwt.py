@@ -1,3 +1,17 @@
 from flask_jwt_extended import JWTManager
 
+from .enums import StaffRole
+
 jwt_manager = JWTManager()
+
+
+# the authenticated user as described by the claims in their access token,
+# used as `current_user` so that handlers do not need to load the user from the database
+class Identity:
+    def __init__(self, id: int, role: StaffRole | None, frozen: bool):
+        self.id = id
+        self.role = role
+        self.frozen = frozen
+
+    def __repr__(self) -> str:
+        return str({"id": self.id, "role": self.role, "frozen": self.frozen})
@@ -0,0 +1,212 @@
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
+import threading
+import time
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from .config import AppConfig
+from .database import db
+from .lookups import lookup
+from .models import PointsLedgerEntry, Submission, User
+
+PERIODS = ["all", "week"]
+
+
+def _week_start() -> date:
+    today = date.today()
+    return today - timedelta(days=today.weekday())
+
+
+class Ranking:
+    # users' scores kept sorted (highest first) so that ranks are found with a binary search
+    # changing a score moves its entry within the list, which is O(n) but only a memmove
+    def __init__(self):
+        self._scores: dict[int, int] = {}
+        self._sorted: list[tuple[int, int]] = []  # (-score, user_id)
+
+    def add(self, user_id: int, amount: int):
+        score = self._scores.get(user_id)
+        if score is not None:
+            del self._sorted[bisect_left(self._sorted, (-score, user_id))]
+
+        score = (score or 0) + amount
+        self._scores[user_id] = score
+        insort(self._sorted, (-score, user_id))
+
+    def score(self, user_id: int) -> int:
+        return self._scores.get(user_id, 0)
+
+    # users with the same score share a rank, users without any points are ranked last
+    def rank(self, user_id: int) -> int:
+        return bisect_left(self._sorted, (-self.score(user_id),)) + 1
+
+    def top(self, limit: int) -> list[tuple[int, int, int]]:
+        return [
+            (self.rank(user_id), user_id, -negative_score)
+            for negative_score, user_id in self._sorted[:limit]
+        ]
+
+
+class Leaderboard:
+    # points earned from submissions, ranked across all users and within each organisation,
+    # for all time and for the current week (starting on Monday)
+    def __init__(self, ttl: int = 60):
+        # changes committed by other processes (e.g. other gunicorn workers) are picked up
+        # by rebuilding the leaderboard once it is older than `ttl` seconds
+        self.ttl = ttl
+
+        self._lock = threading.RLock()
+        self._rankings: dict[tuple[str, str | None], Ranking] = {}
+        self._organisations: dict[int, str] = {}
+        self._week_start: date | None = None
+        self._built_at: float | None = None
+        # incremented whenever points are applied, see `rebuild`
+        self._applied = 0
+        self._rebuilding = False
+
+    # the queries run without holding the lock, so the rankings can still be read meanwhile
+    def rebuild(self):
+        with self._lock:
+            applied = self._applied
+
+        week_start = _week_start()
+        earned = (
+            select(PointsLedgerEntry.user_id, func.sum(PointsLedgerEntry.amount))
+            .where(PointsLedgerEntry.source_table == Submission.__tablename__)
+            .group_by(PointsLedgerEntry.user_id)
+        )
+        all_time = db.session.execute(earned).all()
+        this_week = db.session.execute(
+            earned.where(
+                PointsLedgerEntry.created_at
+                >= datetime.combine(week_start, datetime.min.time())
+            )
+        ).all()
+        organisations = dict(
+            db.session.execute(
+                select(User.id, User.organisation).where(
+                    User.id.in_({user_id for user_id, _ in all_time})
+                )
+            ).all()
+        )
+
+        rankings = {}
+        for period, totals in (("all", all_time), ("week", this_week)):
+            for user_id, amount in totals:
+                self._add(rankings, organisations, period, user_id, int(amount))
+
+        with self._lock:
+            self._rankings = rankings
+            self._organisations = organisations
+            self._week_start = week_start
+            # points applied while the queries ran may be missing from their results,
+            # in which case it is rebuilt again when next read
+            self._built_at = time.monotonic() if self._applied == applied else None
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    @staticmethod
+    def _add(
+        rankings: dict,
+        organisations: dict[int, str],
+        period: str,
+        user_id: int,
+        amount: int,
+    ):
+        organisation = organisations.get(user_id, "")
+        for key in ((period, None), (period, organisation)):
+            rankings.setdefault(key, Ranking()).add(user_id, amount)
+
+    # only one thread rebuilds at a time, the others read the previous rankings meanwhile
+    # (unless there are none yet)
+    def _ensure_built(self):
+        with self._lock:
+            if (
+                self._built_at is not None
+                and time.monotonic() - self._built_at <= self.ttl
+                and self._week_start == _week_start()
+            ):
+                return
+            if self._rebuilding and self._week_start is not None:
+                return
+            self._rebuilding = True
+
+        try:
+            self.rebuild()
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    # called by the points ledger before committing, `earned` is a list of (user_id, amount)
+    # the points are added to the rankings once the session's transaction is committed
+    def stage(self, session, earned: list[tuple[int, int]]):
+        if not earned:
+            return
+
+        with self._lock:
+            unknown = {user_id for user_id, _ in earned} - self._organisations.keys()
+
+        # looked up now since no queries can be made while the commit is being handled
+        organisations = lookup(session, User.id, User.organisation, unknown)
+        session.info.setdefault("earned_points", []).extend(
+            (user_id, amount, organisations.get(user_id)) for user_id, amount in earned
+        )
+
+    # `earned` is a list of (user_id, amount, organisation) staged by `stage`
+    def apply(self, earned: list[tuple[int, int, str | None]]):
+        with self._lock:
+            self._applied += 1
+            if self._built_at is None:
+                return  # these points are included when it is next rebuilt
+
+            for user_id, amount, organisation in earned:
+                if organisation is not None:
+                    self._organisations.setdefault(user_id, organisation)
+                for period in PERIODS:
+                    self._add(
+                        self._rankings, self._organisations, period, user_id, amount
+                    )
+
+    # the organisation the user is ranked in, None if the user has no points
+    def organisation_of(self, user_id: int) -> str | None:
+        self._ensure_built()
+        with self._lock:
+            return self._organisations.get(user_id)
+
+    # returns a list of (rank, user_id, points)
+    def top(
+        self, period: str, organisation: str | None, limit: int
+    ) -> list[tuple[int, int, int]]:
+        self._ensure_built()
+        with self._lock:
+            ranking = self._rankings.get((period, organisation))
+            return ranking.top(limit) if ranking is not None else []
+
+    # returns the user's points and rank
+    def rank(
+        self, user_id: int, period: str, organisation: str | None = None
+    ) -> tuple[int, int]:
+        self._ensure_built()
+        with self._lock:
+            ranking = self._rankings.get((period, organisation), Ranking())
+            return ranking.score(user_id), ranking.rank(user_id)
+
+
+leaderboard = Leaderboard(AppConfig.LEADERBOARD_TTL)
+
+
+# points posted by the ledger are only applied once their transaction has been committed
+@event.listens_for(Session, "after_commit")
+def _apply_earned_points(session):
+    earned = session.info.pop("earned_points", None)
+    if earned:
+        leaderboard.apply(earned)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_earned_points(session):
+    session.info.pop("earned_points", None)
@@ -0,0 +1,341 @@
+from collections import defaultdict
+
+from sqlalchemy import case, delete, func, insert, literal, select, update
+
+from .database import db
+from .enums import SubmissionStatus
+from .leaderboard import leaderboard
+from .models import PointsLedgerEntry, Purchase, Recyclable, Reward, Submission, User
+from .statistics import statistics_counters
+
+
+class PointsLedger:
+    # called by the DatabaseController before committing a change so that ledger entries
+    # and the cached balance are written in the same transaction as the change itself
+    # `data_before` is the resource's `to_dict()` before the change (None when created)
+    # `instance` is the resource after the change (None when deleted)
+    def record(self, model, data_before: dict | None, instance):
+        if model is Submission:
+            self._record_submission(data_before, instance)
+        elif model is Purchase:
+            self._record_purchase(data_before, instance)
+
+    # like `record` for many rows (see `DatabaseController.update_many` and `create_many`)
+    # `rows_before` and `rows_after` hold the rows' `to_dict()` before and after the change,
+    # matched by id (created rows are only in `rows_after`, deleted ones only in `rows_before`)
+    def record_many(self, model, rows_before: list[dict], rows_after: list[dict]):
+        if model is not Submission:
+            return
+
+        def is_confirmed(row: dict | None) -> bool:
+            return (
+                row is not None
+                and SubmissionStatus(row["status"]) == SubmissionStatus.confirmed
+            )
+
+        def changed(row: dict, other: dict | None) -> bool:
+            return (
+                other is None
+                or row["user_id"] != other["user_id"]
+                or row["recyclable_id"] != other["recyclable_id"]
+            )
+
+        before_by_id = {before["id"]: before for before in rows_before}
+        after_by_id = {after["id"]: after for after in rows_after}
+
+        reversed_ids = [
+            before["id"]
+            for before in rows_before
+            if is_confirmed(before)
+            and (
+                not is_confirmed(after_by_id.get(before["id"]))
+                or changed(before, after_by_id.get(before["id"]))
+            )
+        ]
+        credited = [
+            after
+            for after in rows_after
+            if is_confirmed(after)
+            and (
+                not is_confirmed(before_by_id.get(after["id"]))
+                or changed(after, before_by_id.get(after["id"]))
+            )
+        ]
+
+        entries = []
+        if reversed_ids:
+            contributions = db.session.execute(
+                select(
+                    PointsLedgerEntry.source_id,
+                    PointsLedgerEntry.user_id,
+                    func.sum(PointsLedgerEntry.amount),
+                )
+                .where(
+                    PointsLedgerEntry.source_table == Submission.__tablename__,
+                    PointsLedgerEntry.source_id.in_(reversed_ids),
+                )
+                .group_by(PointsLedgerEntry.source_id, PointsLedgerEntry.user_id)
+            ).all()
+            entries.extend(
+                (user_id, -int(amount), Submission.__tablename__, source_id)
+                for source_id, user_id, amount in contributions
+            )
+
+        if credited:
+            points_values = dict(
+                db.session.execute(
+                    select(Recyclable.id, Recyclable.points_value).where(
+                        Recyclable.id.in_(
+                            {after["recyclable_id"] for after in credited}
+                        )
+                    )
+                ).all()
+            )
+            entries.extend(
+                (
+                    after["user_id"],
+                    points_values.get(after["recyclable_id"]) or 0,
+                    Submission.__tablename__,
+                    after["id"],
+                )
+                for after in credited
+            )
+
+        self._post_many(entries)
+
+    def _record_submission(self, data_before: dict | None, instance):
+        was_confirmed = (
+            data_before is not None
+            and SubmissionStatus(data_before["status"]) == SubmissionStatus.confirmed
+        )
+        is_confirmed = (
+            instance is not None
+            and SubmissionStatus(instance.status) == SubmissionStatus.confirmed
+        )
+        changed = (
+            data_before is None
+            or instance is None
+            or data_before["user_id"] != instance.user_id
+            or data_before["recyclable_id"] != instance.recyclable_id
+        )
+
+        # `data_before` is checked again so that its type is narrowed
+        if was_confirmed and data_before is not None and (not is_confirmed or changed):
+            self._reverse(Submission.__tablename__, data_before["id"])
+
+        if is_confirmed and (not was_confirmed or changed):
+            points_value = db.session.execute(
+                select(Recyclable.points_value).where(
+                    Recyclable.id == instance.recyclable_id
+                )
+            ).scalar_one_or_none()
+            self._post(
+                instance.user_id,
+                points_value or 0,
+                Submission.__tablename__,
+                instance.id,
+            )
+
+    def _record_purchase(self, data_before: dict | None, instance):
+        if (
+            data_before is not None
+            and instance is not None
+            and data_before["user_id"] == instance.user_id
+            and data_before["reward_id"] == instance.reward_id
+            and data_before["quantity"] == instance.quantity
+        ):
+            return
+
+        if data_before is not None:
+            self._reverse(Purchase.__tablename__, data_before["id"])
+
+        if instance is not None:
+            price = db.session.execute(
+                select(Reward.price).where(Reward.id == instance.reward_id)
+            ).scalar_one_or_none()
+            self._post(
+                instance.user_id,
+                -(price or 0) * instance.quantity,
+                Purchase.__tablename__,
+                instance.id,
+            )
+
+    # undo whatever the source has contributed so far (possibly to more than one user)
+    def _reverse(self, source_table: str, source_id: int):
+        contributions = db.session.execute(
+            select(PointsLedgerEntry.user_id, func.sum(PointsLedgerEntry.amount))
+            .where(
+                PointsLedgerEntry.source_table == source_table,
+                PointsLedgerEntry.source_id == source_id,
+            )
+            .group_by(PointsLedgerEntry.user_id)
+        ).all()
+
+        for user_id, amount in contributions:
+            self._post(user_id, -int(amount), source_table, source_id)
+
+    def _post(self, user_id: int, amount: int, source_table: str, source_id: int):
+        self._post_many([(user_id, amount, source_table, source_id)])
+
+    # `entries` is a list of (user_id, amount, source_table, source_id)
+    def _post_many(self, entries: list[tuple[int, int, str, int]]):
+        entries = [entry for entry in entries if entry[1] != 0]
+        if not entries:
+            return
+
+        db.session.execute(
+            insert(PointsLedgerEntry),
+            [
+                {
+                    "user_id": user_id,
+                    "amount": amount,
+                    "source_table": source_table,
+                    "source_id": source_id,
+                }
+                for user_id, amount, source_table, source_id in entries
+            ],
+        )
+
+        balance_changes = defaultdict(int)
+        for user_id, amount, _, _ in entries:
+            balance_changes[user_id] += amount
+
+        leaderboard.stage(
+            db.session,
+            [
+                (user_id, amount)
+                for user_id, amount, source_table, _ in entries
+                if source_table == Submission.__tablename__
+            ],
+        )
+
+        # points spent are entries of purchases, reversals of purchases count as refunds
+        statistics_counters.add(
+            {
+                "points_issued": sum(
+                    amount
+                    for _, amount, source_table, _ in entries
+                    if source_table == Submission.__tablename__
+                ),
+                "points_spent": -sum(
+                    amount
+                    for _, amount, source_table, _ in entries
+                    if source_table == Purchase.__tablename__
+                ),
+            }
+        )
+
+        # every balance is updated by a single statement
+        db.session.execute(
+            update(User)
+            .where(User.id.in_(balance_changes))
+            .values(
+                points_balance=User.points_balance
+                + case(balance_changes, value=User.id, else_=0)
+            )
+        )
+
+    # recreates the ledger from confirmed submissions and purchases
+    # points values and prices are taken from the current recyclables and rewards
+    def rebuild(self):
+        db.session.execute(delete(PointsLedgerEntry))
+
+        columns = ["user_id", "amount", "source_table", "source_id", "created_at"]
+        db.session.execute(
+            insert(PointsLedgerEntry).from_select(
+                columns,
+                select(
+                    Submission.user_id,
+                    Recyclable.points_value,
+                    literal(Submission.__tablename__),
+                    Submission.id,
+                    Submission.created_at,
+                )
+                .join(Recyclable, Submission.recyclable_id == Recyclable.id)
+                .where(Submission.status == SubmissionStatus.confirmed),
+            )
+        )
+        db.session.execute(
+            insert(PointsLedgerEntry).from_select(
+                columns,
+                select(
+                    Purchase.user_id,
+                    -Purchase.quantity * Reward.price,
+                    literal(Purchase.__tablename__),
+                    Purchase.id,
+                    Purchase.created_at,
+                ).join(Reward, Purchase.reward_id == Reward.id),
+            )
+        )
+
+        db.session.execute(
+            update(User).values(
+                points_balance=func.coalesce(
+                    select(func.sum(PointsLedgerEntry.amount))
+                    .where(PointsLedgerEntry.user_id == User.id)
+                    .scalar_subquery(),
+                    0,
+                )
+            )
+        )
+        db.session.commit()
+
+    # returns a description of every inconsistency found (empty if there are none)
+    def verify(self) -> list[str]:
+        problems = []
+
+        mismatched_balances = db.session.execute(
+            select(User.id, User.points_balance, func.sum(PointsLedgerEntry.amount))
+            .outerjoin(PointsLedgerEntry, PointsLedgerEntry.user_id == User.id)
+            .group_by(User.id, User.points_balance)
+            .having(
+                User.points_balance
+                != func.coalesce(func.sum(PointsLedgerEntry.amount), 0)
+            )
+        ).all()
+        for user_id, balance, ledger_sum in mismatched_balances:
+            problems.append(
+                f"User {user_id} has a balance of {balance} but a ledger total of {ledger_sum or 0}"
+            )
+
+        contributions = db.session.execute(
+            select(
+                PointsLedgerEntry.source_table,
+                PointsLedgerEntry.source_id,
+                func.sum(PointsLedgerEntry.amount),
+            ).group_by(PointsLedgerEntry.source_table, PointsLedgerEntry.source_id)
+        ).all()
+        credited = {
+            (source_table, source_id)
+            for source_table, source_id, amount in contributions
+            if amount != 0
+        }
+
+        expected = {
+            (Submission.__tablename__, id)
+            for id in db.session.execute(
+                select(Submission.id).where(
+                    Submission.status == SubmissionStatus.confirmed
+                )
+            ).scalars()
+        }
+        expected.update(
+            (Purchase.__tablename__, id)
+            for id in db.session.execute(
+                select(Purchase.id)
+                .join(Reward, Purchase.reward_id == Reward.id)
+                .where(Purchase.quantity * Reward.price != 0)
+            ).scalars()
+        )
+
+        for source_table, source_id in sorted(expected - credited):
+            problems.append(f"{source_table} {source_id} has no ledger entries")
+        for source_table, source_id in sorted(credited - expected):
+            problems.append(
+                f"{source_table} {source_id} should not have any ledger entries"
+            )
+
+        return problems
+
+
+points_ledger = PointsLedger()
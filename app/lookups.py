@@ -0,0 +1,39 @@
+"""Values read by more than one of the writes made in the same transaction"""
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+_NOT_FOUND = object()
+
+
+# maps each of `keys` to the `value_column` (or tuple of the columns in `value_column`)
+# of the row whose `key_column` matches it (keys without a row are left out), results are
+# kept until the transaction ends so the ledger, statistics and leaderboard do not each
+# load the same users and recyclables
+def lookup(session, key_column, value_column, keys) -> dict:
+    value_columns = value_column if isinstance(value_column, tuple) else (value_column,)
+    values = session.info.setdefault("lookups", {}).setdefault(
+        ":".join(str(column) for column in (key_column, *value_columns)), {}
+    )
+
+    missing = set(keys) - values.keys()
+    if missing:
+        values.update(dict.fromkeys(missing, _NOT_FOUND))
+        values.update(
+            (key, tuple(row) if isinstance(value_column, tuple) else row[0])
+            for key, *row in session.execute(
+                select(key_column, *value_columns).where(key_column.in_(missing))
+            )
+        )
+
+    return {key: values[key] for key in keys if values[key] is not _NOT_FOUND}
+
+
+@event.listens_for(Session, "after_commit")
+def _clear_lookups_after_commit(session):
+    session.info.pop("lookups", None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_lookups_after_rollback(session):
+    session.info.pop("lookups", None)
@@ -0,0 +1,339 @@
+"""Request, database, cache and image metrics served at /metrics in the Prometheus text format"""
+
+import bisect
+import fcntl
+import json
+import os
+from pathlib import Path
+import threading
+import time
+import uuid
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+from .constants import Constants
+from .database import db
+from .util import get_uploads_subdirectory, write_json_atomically
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# name -> (type, description, histogram buckets)
+METRICS = {
+    "http_requests_total": ("counter", "Requests handled", None),
+    "http_request_duration_seconds": (
+        "histogram",
+        "Time taken to handle a request",
+        _LATENCY_BUCKETS,
+    ),
+    "http_request_db_queries": (
+        "histogram",
+        "SQL statements executed while handling a request",
+        (0, 1, 2, 5, 10, 20, 50, 100),
+    ),
+    "db_query_duration_seconds": (
+        "histogram",
+        "Time taken by SQL statements",
+        (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+    ),
+    "db_pool_checkout_wait_seconds": (
+        "histogram",
+        "Time spent waiting for a database connection from the pool",
+        (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+    ),
+    "image_processing_duration_seconds": (
+        "histogram",
+        "Time from an image being uploaded to it being processed",
+        _LATENCY_BUCKETS,
+    ),
+    "cache_hits_total": ("counter", "Lookups found in an in-memory cache", None),
+    "cache_misses_total": ("counter", "Lookups not found in an in-memory cache", None),
+}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return (
+        "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+    )
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # running as another user
+        return True
+    return True
+
+
+# (name, labels) -> value and (name, labels) -> [bucket counts, sum] of several snapshots
+def _add_up(snapshots) -> tuple[dict, dict]:
+    counters: dict[tuple[str, tuple], float] = {}
+    histograms: dict[tuple[str, tuple], list] = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(sorted(labels.items())))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total in snapshot["histograms"]:
+            key = (name, tuple(sorted(labels.items())))
+            histogram = histograms.setdefault(key, [[0] * len(counts), 0])
+            histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+            histogram[1] += total
+    return counters, histograms
+
+
+class Metrics:
+    # each process keeps its own counters and histograms and writes them to <pid>-<token>.json
+    # at most every `flush_interval` seconds (and whenever it serves /metrics), the token
+    # keeps a process from overwriting the file of an exited one that had the same pid
+    # /metrics adds up the files of every process so any gunicorn worker can serve it,
+    # the files of processes that have exited are first added to `exited.json` so that
+    # totals never go backwards (pids are checked locally, so the uploads directory
+    # must not be shared between machines)
+    def __init__(self):
+        self.enabled = False
+        self.flush_interval = 5.0
+        self.uploads_directory = ""
+
+        self._lock = threading.Lock()
+        # (name, labels) -> value
+        self._counters: dict[tuple[str, tuple], float] = {}
+        # (name, labels) -> [count of each bucket (and of values above the last), sum]
+        self._histograms: dict[tuple[str, tuple], list] = {}
+        self._pid = 0
+        self._token = ""
+        # name -> cache with `hits` and `misses` attributes
+        self._caches: dict[str, object] = {}
+        self._flushed_at = 0.0
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    # a forked process (e.g. a gunicorn worker) starts without the metrics of its parent
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._pid = os.getpid()
+        self._token = uuid.uuid4().hex
+
+    def init_app(self, app):
+        self.enabled = app.config["METRICS_ENABLED"]
+        self.flush_interval = app.config["METRICS_FLUSH_INTERVAL"]
+        self.uploads_directory = app.config["UPLOADS_DIRECTORY"]
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._start_query)
+            event.listen(db.engine, "after_cursor_execute", self._end_query)
+
+    @property
+    def directory(self) -> Path:
+        return get_uploads_subdirectory(
+            self.uploads_directory, Constants.METRICS_DIRECTORY
+        )
+
+    def register_cache(self, name: str, cache):
+        self._caches[name] = cache
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(buckets) + 1), 0]
+            histogram[0][bisect.bisect_left(buckets, value)] += 1
+            histogram[1] += value
+
+    def _start_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_queries = 0
+
+    def _end_request(self, response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+
+        endpoint = request.endpoint or "none"
+        self.inc(
+            "http_requests_total",
+            blueprint=request.blueprint or "none",
+            endpoint=endpoint,
+            method=request.method,
+            status=str(response.status_code),
+        )
+        self.observe(
+            "http_request_duration_seconds",
+            time.perf_counter() - start,
+            endpoint=endpoint,
+        )
+        self.observe(
+            "http_request_db_queries", g.pop("metrics_queries", 0), endpoint=endpoint
+        )
+
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+        return response
+
+    def _start_query(
+        self, connection, cursor, statement, parameters, context, executemany
+    ):
+        context.metrics_start = time.perf_counter()
+
+    def _end_query(
+        self, connection, cursor, statement, parameters, context, executemany
+    ):
+        endpoint = "none"
+        if has_request_context():
+            endpoint = request.endpoint or "none"
+            g.metrics_queries = g.get("metrics_queries", 0) + 1
+
+        self.observe(
+            "db_query_duration_seconds",
+            time.perf_counter() - context.metrics_start,
+            endpoint=endpoint,
+        )
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = [
+                [name, dict(labels), value]
+                for (name, labels), value in self._counters.items()
+            ]
+            histograms = [
+                [name, dict(labels), list(counts), total]
+                for (name, labels), (counts, total) in self._histograms.items()
+            ]
+
+        # caches count their own hits and misses
+        for cache_name, cache in self._caches.items():
+            counters.append(["cache_hits_total", {"cache": cache_name}, cache.hits])
+            counters.append(["cache_misses_total", {"cache": cache_name}, cache.misses])
+
+        return {"counters": counters, "histograms": histograms}
+
+    def flush(self):
+        self._flushed_at = time.monotonic()
+        write_json_atomically(
+            self.snapshot(), self.directory.joinpath(f"{self._pid}-{self._token}.json")
+        )
+
+    def _read(self, path: Path) -> dict | None:
+        try:
+            with open(path, encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    # adds the snapshots of processes that have exited to `exited.json`,
+    # called with the directory locked
+    def _fold_exited(self):
+        exited_path = self.directory.joinpath("exited.json")
+        paths = []
+        for path in self.directory.glob("*.json"):
+            try:
+                pid = int(path.stem.split("-")[0])
+            except ValueError:
+                continue
+            if not _is_running(pid):
+                paths.append(path)
+        if not paths:
+            return
+
+        snapshots = [self._read(path) for path in [exited_path, *paths]]
+        counters, histograms = _add_up(
+            snapshot for snapshot in snapshots if snapshot is not None
+        )
+        write_json_atomically(
+            {
+                "counters": [
+                    [name, dict(labels), value]
+                    for (name, labels), value in counters.items()
+                ],
+                "histograms": [
+                    [name, dict(labels), counts, total]
+                    for (name, labels), (counts, total) in histograms.items()
+                ],
+            },
+            exited_path,
+        )
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    # the metrics of every process in the Prometheus text format
+    def render(self) -> str:
+        self.flush()
+
+        # the directory is locked so that no snapshot is counted twice while it is folded
+        with open(self.directory.joinpath("lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._fold_exited()
+            snapshots = [self._read(path) for path in self.directory.glob("*.json")]
+        counters, histograms = _add_up(
+            snapshot for snapshot in snapshots if snapshot is not None
+        )
+
+        lines = []
+        for name, (metric_type, description, buckets) in METRICS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+            if metric_type == "counter":
+                for (_, labels), value in sorted(
+                    item for item in counters.items() if item[0][0] == name
+                ):
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+
+            for (_, labels), (counts, total) in sorted(
+                item for item in histograms.items() if item[0][0] == name
+            ):
+                cumulative = 0
+                for bound, count in zip([*buckets, "+Inf"], counts):
+                    cumulative += count
+                    bucket_labels = _format_labels((*labels, ("le", bound)))
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+
+# QueuePool (the default for MySQL) that records how long each checkout waits in the pool's
+# queue for a connection to be returned, opening a new connection (when the pool has room
+# to grow) is not included
+class TimedQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        get = self._pool.get
+
+        def timed_get(block: bool = True, timeout: float | None = None):
+            start = time.perf_counter()
+            try:
+                return get(block, timeout)
+            finally:
+                metrics.observe(
+                    "db_pool_checkout_wait_seconds", time.perf_counter() - start
+                )
+
+        self._pool.get = timed_get
+
+
+metrics = Metrics()
@@ -0,0 +1,74 @@
+"""Versioned changes to the schema of an existing database
+
+`db.create_all()` only creates missing tables, so columns and indexes added to
+existing tables are applied by migrations with `flask db upgrade`. Migrations
+check the current schema before changing it, so they are safe to run against a
+database created by `db.create_all()` (which already matches the models).
+"""
+
+from datetime import datetime
+
+from sqlalchemy import select
+
+from ..database import db
+from ..models import SchemaMigration
+from . import (
+    m0001_user_balance_and_auth_version,
+    m0002_submission_claims,
+    m0003_secondary_indexes,
+    m0004_statistics_counters,
+    m0005_submission_rollups,
+    m0006_user_action_log_timestamp_index,
+    m0007_user_action_log_user_index,
+    m0008_submission_confirmations,
+)
+
+# in the order they are applied, a migration's version is the number in its module name
+MIGRATIONS = [
+    m0001_user_balance_and_auth_version,
+    m0002_submission_claims,
+    m0003_secondary_indexes,
+    m0004_statistics_counters,
+    m0005_submission_rollups,
+    m0006_user_action_log_timestamp_index,
+    m0007_user_action_log_user_index,
+    m0008_submission_confirmations,
+]
+
+
+def migration_version(migration) -> int:
+    return int(migration.__name__.rsplit(".", 1)[-1][1:5])
+
+
+def migration_name(migration) -> str:
+    return migration.__name__.rsplit(".", 1)[-1][6:]
+
+
+def applied_versions() -> set[int]:
+    return set(db.session.execute(select(SchemaMigration.version)).scalars())
+
+
+def pending_migrations() -> list:
+    applied = applied_versions()
+    return [
+        migration
+        for migration in MIGRATIONS
+        if migration_version(migration) not in applied
+    ]
+
+
+# applies every pending migration, each is recorded as soon as it succeeds
+# (DDL statements are committed implicitly by MySQL so a failed migration is not rolled back)
+def upgrade(echo=print):
+    for migration in pending_migrations():
+        echo(f"Applying {migration_version(migration):04} {migration_name(migration)}")
+        migration.upgrade()
+
+        db.session.add(
+            SchemaMigration(
+                version=migration_version(migration),  # pyright: ignore
+                name=migration_name(migration),  # pyright: ignore
+                applied_at=datetime.now(),  # pyright: ignore
+            )
+        )
+        db.session.commit()
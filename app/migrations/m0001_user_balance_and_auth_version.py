@@ -0,0 +1,11 @@
+from ..ledger import points_ledger
+from .operations import add_column
+
+
+def upgrade():
+    balance_added = add_column("users", "points_balance", "INTEGER NOT NULL DEFAULT 0")
+    add_column("users", "auth_version", "INTEGER NOT NULL DEFAULT 0")
+
+    # balances of existing users are calculated from their submissions and purchases
+    if balance_added:
+        points_ledger.rebuild()
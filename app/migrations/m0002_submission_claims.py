@@ -0,0 +1,6 @@
+from .operations import add_column
+
+
+def upgrade():
+    add_column("submissions", "claimed_by", "INTEGER NULL")
+    add_column("submissions", "claim_expires_at", "DATETIME NULL")
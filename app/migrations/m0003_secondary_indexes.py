@@ -0,0 +1,12 @@
+from ..models import PointsLedgerEntry, Purchase, Submission, UserActionLog
+from .operations import create_index
+
+
+def upgrade():
+    create_index(Submission, "ix_submissions_status_created_at")
+    create_index(Submission, "ix_submissions_user_id")
+    create_index(Submission, "ix_submissions_bin_id")
+    create_index(Submission, "ix_submissions_created_at")
+    create_index(Purchase, "ix_purchases_user_id")
+    create_index(UserActionLog, "ix_user_action_logs_resource")
+    create_index(PointsLedgerEntry, "ix_points_ledger_source")
@@ -0,0 +1,6 @@
+from ..statistics import statistics_counters
+
+
+def upgrade():
+    # the counters table is created by `db.create_all()`, existing data still has to be counted
+    statistics_counters.rebuild()
@@ -0,0 +1,6 @@
+from ..statistics import submission_rollups
+
+
+def upgrade():
+    # the rollups table is created by `db.create_all()`, existing submissions still have to be added
+    submission_rollups.rebuild()
@@ -0,0 +1,6 @@
+from ..models import UserActionLog
+from .operations import create_index
+
+
+def upgrade():
+    create_index(UserActionLog, "ix_user_action_logs_user_id")
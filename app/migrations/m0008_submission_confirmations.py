@@ -0,0 +1,7 @@
+from ..statistics import submission_confirmations
+
+
+def upgrade():
+    # the table is created by `db.create_all()`, submissions that are already confirmed
+    # are recorded with their user's current organisation and recyclable's current weight
+    submission_confirmations.backfill()
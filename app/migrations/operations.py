@@ -0,0 +1,59 @@
+"""Schema changes used by migrations, skipped when already applied"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+
+from ..database import db
+
+# MySQL/MariaDB make the change while the table remains readable and writable
+_ONLINE_ALTER_TABLE = ", ALGORITHM=INPLACE, LOCK=NONE"
+_ONLINE_CREATE_INDEX = " ALGORITHM=INPLACE LOCK=NONE"
+
+
+def _is_mysql() -> bool:
+    return db.engine.dialect.name == "mysql"
+
+
+def has_column(table: str, column: str) -> bool:
+    return column in {
+        existing["name"]
+        for existing in inspect(db.session.connection()).get_columns(table)
+    }
+
+
+def has_index(table: str, index: str) -> bool:
+    return index in {
+        existing["name"]
+        for existing in inspect(db.session.connection()).get_indexes(table)
+    }
+
+
+# `definition` is the column's SQL type and constraints, e.g. "INTEGER NOT NULL DEFAULT 0"
+# returns whether the column was added
+def add_column(table: str, column: str, definition: str) -> bool:
+    if has_column(table, column):
+        return False
+
+    statement = f"ALTER TABLE {table} ADD COLUMN {column} {definition}"
+    if _is_mysql():
+        statement += _ONLINE_ALTER_TABLE
+
+    with db.engine.begin() as connection:
+        connection.execute(text(statement))
+    return True
+
+
+# the index must be declared on the model, `create_all` creates it for new tables
+# returns whether the index was created
+def create_index(model, name: str) -> bool:
+    table = model.__table__
+    if has_index(table.name, name):
+        return False
+
+    index = next(index for index in table.indexes if index.name == name)
+    with db.engine.begin() as connection:
+        statement = str(CreateIndex(index).compile(dialect=connection.dialect))
+        if _is_mysql():
+            statement += _ONLINE_CREATE_INDEX
+        connection.execute(text(statement))
+    return True
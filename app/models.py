@@ -1,7 +1,10 @@
 from datetime import date, datetime
 
 from sqlalchemy import (
+    DateTime,
+    Double,
     ForeignKey,
+    Index,
     Integer,
     Float,
     String,
@@ -33,6 +36,13 @@ class User(db.Model):
     date_of_birth: Mapped[date] = mapped_column(Date, nullable=False)
     organisation: Mapped[str] = mapped_column(String(255), nullable=False, default="")
     frozen: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+
+    # cached sum of the user's points ledger entries, maintained by `PointsLedger`
+    points_balance: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # incremented when the user's role or frozen state changes to revoke existing access tokens
+    auth_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP, nullable=False)
 
     def check_password(self, password) -> bool:
@@ -176,6 +186,13 @@ class Recyclable(db.Model):
 
 class Submission(db.Model):
     __tablename__ = "submissions"
+    __table_args__ = (
+        # used by the moderation queue, which takes the oldest submissions with a given status
+        Index("ix_submissions_status_created_at", "status", "created_at"),
+        Index("ix_submissions_user_id", "user_id"),
+        Index("ix_submissions_bin_id", "bin_id"),
+        Index("ix_submissions_created_at", "created_at"),
+    )
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, nullable=False, autoincrement=True
     )
@@ -193,6 +210,11 @@ class Submission(db.Model):
     )
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP, nullable=False)
 
+    # moderator reviewing the submission until the claim expires, see the moderation queue
+    # no foreign key constraint so that the moderator's account can still be deleted
+    claimed_by: Mapped[int] = mapped_column(Integer, nullable=True)
+    claim_expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -234,6 +256,7 @@ class Reward(db.Model):
 
 class Purchase(db.Model):
     __tablename__ = "purchases"
+    __table_args__ = (Index("ix_purchases_user_id", "user_id"),)
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, nullable=False, autoincrement=True
     )
@@ -259,8 +282,109 @@ class Purchase(db.Model):
         return str(self.to_dict())
 
 
+# points earned (positive) and spent (negative) by a user
+# the amount is a snapshot of the recyclable's points value or the reward's price at the time
+class PointsLedgerEntry(db.Model):
+    __tablename__ = "points_ledger"
+    __table_args__ = (Index("ix_points_ledger_source", "source_table", "source_id"),)
+    id: Mapped[int] = mapped_column(
+        Integer, primary_key=True, nullable=False, autoincrement=True
+    )
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id"), nullable=False
+    )
+    amount: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # the submission or purchase that caused the entry
+    source_table: Mapped[str] = mapped_column(String(255), nullable=False)
+    source_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP, nullable=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "amount": self.amount,
+            "source_table": self.source_table,
+            "source_id": self.source_id,
+            "created_at": int(self.created_at.timestamp()),
+        }
+
+    def __repr__(self) -> str:
+        return str(self.to_dict())
+
+
+# running totals maintained by `StatisticsCounters`, each counter is split over several slots
+# so that concurrent transactions incrementing the same counter rarely wait for each other
+class StatisticsCounter(db.Model):
+    __tablename__ = "statistics_counters"
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    slot: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    value: Mapped[float] = mapped_column(Double, nullable=False, default=0)
+
+
+# confirmed submissions per day, see `SubmissionRollups`
+# the day is when the submission was made, the organisation is the submitting user's
+class SubmissionRollup(db.Model):
+    __tablename__ = "submission_rollups"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    bin_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    recyclable_id: Mapped[int] = mapped_column(
+        Integer, primary_key=True, autoincrement=False
+    )
+    organisation: Mapped[str] = mapped_column(String(255), primary_key=True)
+    submissions: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    weight: Mapped[float] = mapped_column(Double, nullable=False, default=0)
+
+
+# the day, organisation and weight a confirmed submission added to the statistics and
+# rollups when it was confirmed, taken off again if it stops being confirmed even if the
+# user or recyclable has been edited since
+# see `SubmissionConfirmations`, there is no foreign key constraint as rows are removed
+# in the same transaction as the submission stops being confirmed (or is deleted)
+class SubmissionConfirmation(db.Model):
+    __tablename__ = "submission_confirmations"
+    submission_id: Mapped[int] = mapped_column(
+        Integer, primary_key=True, autoincrement=False
+    )
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    organisation: Mapped[str] = mapped_column(String(255), nullable=False)
+    weight: Mapped[float] = mapped_column(Double, nullable=False)
+
+
+# migrations (see `app.migrations`) that have been applied to the database
+class SchemaMigration(db.Model):
+    __tablename__ = "schema_migrations"
+    version: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+# incremented whenever a row of the table is created, updated or deleted,
+# see `TableVersions`
+class TableVersion(db.Model):
+    __tablename__ = "table_versions"
+    table_name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)  # UTC
+
+
 class UserActionLog(db.Model):
     __tablename__ = "user_action_logs"
+    __table_args__ = (
+        # history of a resource
+        Index(
+            "ix_user_action_logs_resource",
+            "resource_table",
+            "resource_id",
+            "timestamp",
+        ),
+        # actions of a user
+        Index("ix_user_action_logs_user_id", "user_id", "timestamp"),
+        # time ranges and retention
+        Index("ix_user_action_logs_timestamp", "timestamp"),
+    )
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, nullable=False, autoincrement=True
     )
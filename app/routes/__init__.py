@@ -1,13 +1,33 @@
 from enum import Enum
+from functools import wraps
+import hashlib
+import json
 
+from flask import (
+    Response,
+    current_app,
+    make_response,
+    request,
+    send_file,
+    stream_with_context,
+)
+from flask_jwt_extended import current_user
+
+from ..audit import read_auditor
+from ..caches import response_cache
+from ..config import AppConfig
 from ..database_controller import (
     DatabaseController,
     InvalidDataError,
     NotFoundError,
     ServerError,
 )
-from ..jwt import jwt_manager
+from ..enums import ActionType, StaffRole
+from ..jwt import Identity, jwt_manager
 from ..models import User
+from ..schemas import ImageSchema, PaginationSchema, validate_data
+from ..util import create_image_variant, get_image_upload_path, get_image_variant_path
+from ..versions import table_versions
 
 
 class RouteErrors(Enum):
@@ -46,9 +66,101 @@ def get_resource(model, key: str, value) -> dict | tuple[dict, int]:
     return resource.to_dict()
 
 
-def get_resource_all(model) -> dict:
-    resources = db_controller.get_all(model)
-    return {f"{model.__tablename__}": [resource.to_dict() for resource in resources]}
+# paginated with the `limit` and `after` query string parameters,
+# `after` should be set to the `next_cursor` of the previous page
+def get_resource_all(
+    model, key: str | None = None, value=None
+) -> dict | tuple[dict, int]:
+    validation_result = validate_data(request.args.to_dict(), PaginationSchema)
+    if not validation_result.valid:
+        return {
+            "error": validation_result.error_message,
+            "message": validation_result.info,
+        }, 400
+
+    resources, next_cursor = db_controller.get_page(
+        model,
+        validation_result.data.get("limit", AppConfig.DEFAULT_PAGE_SIZE),
+        validation_result.data.get("after"),
+        key,
+        value,
+    )
+
+    return {
+        f"{model.__tablename__}": [resource.to_dict() for resource in resources],
+        "next_cursor": next_cursor,
+    }
+
+
+# `get_resource_all` for the public catalog tables (bins, rewards and recyclables)
+# with ETag and Last-Modified headers derived from the table's version,
+# so a client revalidating an unchanged table gets a 304 without the table being read
+# the serialised (and gzip compressed) body is cached until the table's version changes
+def get_catalog_resource_all(model) -> Response:
+    table = model.__tablename__
+    version, updated_at = table_versions.get(model)
+    etag = hashlib.sha1(
+        f"{table}:{version}:".encode() + request.query_string
+    ).hexdigest()
+
+    # the gzip body is a different representation so it gets its own ETag
+    gzip_etag = f"{etag}-gzip"
+
+    if request.if_none_match:
+        not_modified = any(
+            request.if_none_match.contains(tag) for tag in (etag, gzip_etag)
+        )
+    else:
+        not_modified = (
+            request.if_modified_since is not None
+            and updated_at <= request.if_modified_since
+        )
+
+    if not_modified:
+        response = Response(status=304)
+        if request.if_none_match.contains(gzip_etag):
+            etag = gzip_etag
+    else:
+        cached = response_cache.get(table, version, request.query_string)
+        if cached is None:
+            result = get_resource_all(model)
+            if isinstance(result, tuple):
+                return make_response(result)
+
+            cached = response_cache.set(
+                table,
+                version,
+                request.query_string,
+                current_app.json.dumps(result).encode(),
+            )
+
+        if cached.gzip_body is not None and "gzip" in request.accept_encodings:
+            response = Response(cached.gzip_body, mimetype="application/json")
+            response.content_encoding = "gzip"
+            etag = gzip_etag
+        else:
+            response = Response(cached.body, mimetype="application/json")
+
+    response.vary.add("Accept-Encoding")
+    response.set_etag(etag)
+    response.last_modified = updated_at
+    return response
+
+
+# writes the same JSON as get_resource_all (without pagination) one batch at a time
+# so that memory usage does not grow with the size of the table
+def stream_resource_all(model) -> Response:
+    def generate():
+        yield f'{{"{model.__tablename__}": ['
+        separator = ""
+        for resources in db_controller.stream_all(model, AppConfig.EXPORT_BATCH_SIZE):
+            yield separator + ",".join(
+                json.dumps(resource.to_dict()) for resource in resources
+            )
+            separator = ","
+        yield "]}"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
 
 
 def update_resource(
@@ -77,19 +189,108 @@ def delete_resource(
     return {"message": "Resource deleted"}
 
 
+# logs successful reads of a user's personal data from `table` (see `ReadAuditor`),
+# `user_id_arg` is the view argument holding the id of the user whose data is read
+def audit_read(table: str, user_id_arg: str = "id"):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = view(*args, **kwargs)
+            # errors are returned as (body, status) tuples
+            if not isinstance(response, tuple) and read_auditor.should_log(
+                current_user.id, table, kwargs[user_id_arg]
+            ):
+                try:
+                    db_controller.log_user_action(
+                        current_user.id,
+                        ActionType.read,
+                        kwargs[user_id_arg],
+                        User.__tablename__,
+                        None,
+                        {"table": table},
+                    )
+                except (InvalidDataError, ServerError):
+                    return RouteErrors.SERVER_ERROR.value
+            return response
+
+        return wrapper
+
+    return decorator
+
+
 @jwt_manager.user_identity_loader
 def user_identity_lookup(user):
     return str(user.id)
 
 
+# sends a bin, reward or submission image, `?size=` selects a smaller version
+# versions missing for images uploaded before they were introduced are created on request
+def send_image(id: int, uploads_subdirectory: str):
+    validation_result = validate_data(request.args.to_dict(), ImageSchema)
+    if not validation_result.valid:
+        return {
+            "error": validation_result.error_message,
+            "message": validation_result.info,
+        }, 400
+    size = validation_result.data["size"]
+
+    image_path = get_image_upload_path(
+        id, current_app.config["UPLOADS_DIRECTORY"], uploads_subdirectory
+    )
+
+    try:
+        if size != "full":
+            variant_path = get_image_variant_path(image_path, size)
+            if not variant_path.exists() and image_path.exists():
+                create_image_variant(image_path, size)
+            image_path = variant_path
+
+        return send_file(image_path, mimetype="image/jpeg")
+    except FileNotFoundError:
+        return RouteErrors.NOT_FOUND.value
+    except OSError:
+        return RouteErrors.SERVER_ERROR.value
+
+
+@jwt_manager.additional_claims_loader
+def add_identity_claims(user):
+    if not current_app.config["JWT_IDENTITY_CLAIMS"]:
+        return {}
+
+    role = db_controller.get_staff_role(user.id)
+    return {
+        "role": None if role is None else role.value,
+        "frozen": user.frozen,
+        "ver": user.auth_version,
+    }
+
+
+# tokens issued before the user's role or frozen state last changed are revoked
+@jwt_manager.token_in_blocklist_loader
+def check_identity_claims_revoked(_jwt_header, jwt_data):
+    if "ver" not in jwt_data:
+        return False
+    return db_controller.get_auth_version(int(jwt_data["sub"])) != jwt_data["ver"]
+
+
 @jwt_manager.user_lookup_loader
 def user_lookup_callback(_jwt_header, jwt_data):
     identity = int(jwt_data["sub"])
-    return User.query.filter_by(id=identity).one_or_none()  # TODO update
+
+    # tokens without identity claims (or when they are disabled) require the user to be loaded
+    if not current_app.config["JWT_IDENTITY_CLAIMS"] or "ver" not in jwt_data:
+        return User.query.filter_by(id=identity).one_or_none()
+
+    role = None if jwt_data["role"] is None else StaffRole(jwt_data["role"])
+    db_controller.set_request_staff_role(identity, role)
+    return Identity(identity, role, jwt_data["frozen"])
 
 
 from .bins import bins_routes_bp
+from .images import images_routes_bp
+from .leaderboard import leaderboard_routes_bp
 from .logs import log_routes_bp
+from .metrics import metrics_routes_bp
 from .motivations import motivations_routes_bp
 from .other import other_routes_bp
 from .purchases import purchases_routes_bp
@@ -102,7 +303,10 @@ from .users import users_routes_bp
 
 route_blueprints = [
     bins_routes_bp,
+    images_routes_bp,
+    leaderboard_routes_bp,
     log_routes_bp,
+    metrics_routes_bp,
     motivations_routes_bp,
     other_routes_bp,
     purchases_routes_bp,
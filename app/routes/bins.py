@@ -1,4 +1,4 @@
-from flask import Blueprint, request, send_file, current_app
+from flask import Blueprint, request, current_app
 from flask_jwt_extended import jwt_required, current_user
 
 from . import (
@@ -6,16 +6,19 @@ from . import (
     db_controller,
     create_resource,
     get_resource,
-    get_resource_all,
+    get_catalog_resource_all,
     update_resource,
     delete_resource,
+    send_image,
 )
 
 from ..constants import Constants
 from ..database_controller import NotFoundError
+from ..indexes import bin_location_index
 from ..models import Bin
-from ..schemas import BinSchema, validate_data
-from ..util import get_image_upload_path, process_image, UnidentifiedImageError
+from ..schemas import BinSchema, NearbyBinsSchema, validate_data
+from ..images import image_pipeline
+from ..util import get_image_upload_path
 
 bins_routes_bp = Blueprint("bins", __name__, url_prefix="/bins")
 
@@ -61,13 +64,15 @@ def upload_bin_image(id: int):
     image_file = request.files["image"]
 
     try:
-        process_image(image_file, image_path)
-    except UnidentifiedImageError:
-        return RouteErrors.IMAGE_PROCESSING_ERROR.value
+        job = image_pipeline.submit(image_file, image_path, current_user.id)
     except OSError:
         return RouteErrors.IMAGE_PROCESSING_ERROR.value
 
-    return {"message": "Image uploaded, verification pending."}
+    return {
+        "message": "Image uploaded, processing pending.",
+        "job_id": job["id"],
+        "status": job["status"],
+    }, 202
 
 
 @bins_routes_bp.route("/<int:id>", methods=["GET"])
@@ -77,35 +82,50 @@ def get_bin(id: int):
 
 @bins_routes_bp.route("", methods=["GET"])
 def get_bin_all():
-    return get_resource_all(Bin)
+    return get_catalog_resource_all(Bin)
 
 
-@bins_routes_bp.route("/<int:id>/image", methods=["GET"])
-def get_bin_image(id: int):
-    image_path = get_image_upload_path(
-        id, current_app.config["UPLOADS_DIRECTORY"], Constants.BIN_IMAGES_DIRECTORY
+# nearest bins to a location, answered from the in-memory bin index
+@bins_routes_bp.route("/nearby", methods=["GET"])
+def get_bin_nearby():
+    validation_result = validate_data(request.args.to_dict(), NearbyBinsSchema)
+    if not validation_result.valid:
+        return {
+            "error": validation_result.error_message,
+            "message": validation_result.info,
+        }, 400
+    request_data = validation_result.data
+
+    nearby_bins = bin_location_index.nearby(
+        request_data["lat"],
+        request_data["lon"],
+        request_data["radius"],
+        request_data["limit"],
+        request_data.get("recyclable_id"),
     )
 
-    try:
-        return send_file(image_path, mimetype="image/jpeg")
-    except FileNotFoundError:
-        return RouteErrors.NOT_FOUND.value
-    except OSError:
-        return RouteErrors.SERVER_ERROR.value
+    return {
+        "bins": [
+            {**bin_data, "distance": distance} for distance, bin_data in nearby_bins
+        ]
+    }
+
+
+@bins_routes_bp.route("/<int:id>/image", methods=["GET"])
+def get_bin_image(id: int):
+    return send_image(id, Constants.BIN_IMAGES_DIRECTORY)
 
 
 @bins_routes_bp.route("/<int:id>/whitelist", methods=["GET"])
 def get_bin_whitelist(id: int):
     try:
-        bin = db_controller.get(Bin, "id", id)
+        recyclables = db_controller.get_bin_whitelist(id)
     except NotFoundError:
         return RouteErrors.NOT_FOUND.value
 
-    # no need to get whitelisted recyclables if no whitelist
-    if not bin.whitelist:
+    if recyclables is None:
         return {"whitelist": False, "message": f"Bin {id} does not have a whitelist"}
 
-    recyclables = db_controller.get_bin_whitelist(id)
     return {
         "whitelist": True,
         "recyclables": [recyclable.to_dict() for recyclable in recyclables],
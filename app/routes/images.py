@@ -0,0 +1,21 @@
+from flask import Blueprint
+from flask_jwt_extended import jwt_required, current_user
+
+from . import RouteErrors, db_controller
+from ..images import image_pipeline
+
+images_routes_bp = Blueprint("images", __name__, url_prefix="/images")
+
+
+@images_routes_bp.route("/jobs/<job_id>", methods=["GET"])
+@jwt_required()
+def get_image_job(job_id: str):
+    job = image_pipeline.get_job(job_id)
+    if job is None:
+        return RouteErrors.NOT_FOUND.value
+
+    is_owner = job["user_id"] == current_user.id
+    if not is_owner and not db_controller.has_moderator_access_level(current_user.id):
+        return RouteErrors.UNAUTHORISED_ACCESS.value
+
+    return job
@@ -0,0 +1,57 @@
+from flask import Blueprint, request
+from flask_jwt_extended import jwt_required, current_user
+
+from . import db_controller
+from ..database_controller import NotFoundError
+from ..leaderboard import leaderboard
+from ..models import User
+from ..schemas import LeaderboardSchema, validate_data
+
+leaderboard_routes_bp = Blueprint("leaderboard", __name__, url_prefix="/leaderboard")
+
+
+# users with the most points earned from submissions (all time or this week)
+@leaderboard_routes_bp.route("", methods=["GET"])
+@jwt_required()
+def get_leaderboard():
+    validation_result = validate_data(request.args.to_dict(), LeaderboardSchema)
+    if not validation_result.valid:
+        return {
+            "error": validation_result.error_message,
+            "message": validation_result.info,
+        }, 400
+    request_data = validation_result.data
+
+    organisation = None
+    if request_data["scope"] == "organisation":
+        organisation = request_data.get("organisation")
+        if organisation is None:
+            organisation = leaderboard.organisation_of(current_user.id)
+        # users without any points are not in the rankings
+        if organisation is None:
+            try:
+                organisation = db_controller.get(
+                    User, "id", current_user.id
+                ).organisation
+            except NotFoundError:
+                return {"error": "User not found"}, 404
+
+    entries = leaderboard.top(
+        request_data["period"], organisation, request_data["limit"]
+    )
+    users = db_controller.get_many(User, [user_id for _, user_id, _ in entries])
+
+    return {
+        "scope": request_data["scope"],
+        "organisation": organisation,
+        "period": request_data["period"],
+        "leaderboard": [
+            {
+                "rank": rank,
+                "user_id": user_id,
+                "username": users[user_id].username if user_id in users else None,
+                "points": points,
+            }
+            for rank, user_id, points in entries
+        ],
+    }
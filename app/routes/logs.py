@@ -1,9 +1,21 @@
-from flask import Blueprint
+from datetime import datetime
+
+from flask import Blueprint, request
 from flask_jwt_extended import jwt_required, current_user
 
-from . import RouteErrors, db_controller, get_resource, get_resource_all
+from . import (
+    RouteErrors,
+    db_controller,
+    get_resource,
+    stream_resource_all,
+)
 
+from ..archive import log_archive
+from ..audit import audit_log_writer, read_auditor
+from ..config import AppConfig
+from ..history import get_resource_logs, replay
 from ..models import UserActionLog
+from ..schemas import LogFilterSchema, ResourceVersionSchema, validate_data
 
 log_routes_bp = Blueprint("logs", __name__, url_prefix="/logs")
 
@@ -21,4 +33,97 @@ def get_action_log(id: int):
 def get_action_log_all():
     if not db_controller.has_admin_access_level(current_user.id):
         return RouteErrors.UNAUTHORISED_ACCESS.value
-    return get_resource_all(UserActionLog)
+
+    validation_result = validate_data(request.args.to_dict(), LogFilterSchema)
+    if not validation_result.valid:
+        return {
+            "error": validation_result.error_message,
+            "message": validation_result.info,
+        }, 400
+    start = validation_result.data.get("start")
+    end = validation_result.data.get("end")
+    after = validation_result.data.get("after")
+    limit = validation_result.data.get("limit", AppConfig.DEFAULT_PAGE_SIZE)
+
+    # equality filters on the log's columns
+    filters = {
+        key: validation_result.data[key]
+        for key in ("user_id", "resource_table", "resource_id", "action_type")
+        if key in validation_result.data
+    }
+
+    conditions = [
+        getattr(UserActionLog, key) == value for key, value in filters.items()
+    ]
+    if start is not None:
+        conditions.append(UserActionLog.timestamp >= datetime.fromtimestamp(start))
+    if end is not None:
+        conditions.append(UserActionLog.timestamp <= datetime.fromtimestamp(end))
+
+    # archived logs are older than those in the table, so they come first
+    # and are only read when the time range starts before the retention period
+    archived = []
+    if start is not None and datetime.fromtimestamp(start) < log_archive.cutoff():
+        archived = log_archive.read(start, end, filters, after, limit + 1)
+        if len(archived) > limit:
+            return {
+                "user_action_logs": archived[:limit],
+                "next_cursor": archived[limit - 1]["id"],
+            }
+
+    remaining = limit - len(archived)
+    logs, next_cursor = db_controller.get_page(
+        UserActionLog, max(remaining, 1), after, conditions=conditions
+    )
+    if remaining == 0:
+        # the page is full of archived logs, a log in the table means there is another page
+        next_cursor = archived[-1]["id"] if logs else None
+        logs = []
+
+    return {
+        "user_action_logs": archived + [log.to_dict() for log in logs],
+        "next_cursor": next_cursor,
+    }
+
+
+# a resource as it was at the `at` unix timestamp and/or after the log `log_id` (the latest by default)
+# rebuilt from its logs, `resource` is null if it did not exist at the time
+@log_routes_bp.route("/resources/<resource_table>/<int:resource_id>", methods=["GET"])
+@jwt_required()
+def get_resource_version(resource_table: str, resource_id: int):
+    if not db_controller.has_admin_access_level(current_user.id):
+        return RouteErrors.UNAUTHORISED_ACCESS.value
+
+    validation_result = validate_data(request.args.to_dict(), ResourceVersionSchema)
+    if not validation_result.valid:
+        return {
+            "error": validation_result.error_message,
+            "message": validation_result.info,
+        }, 400
+
+    logs = get_resource_logs(
+        resource_table,
+        resource_id,
+        validation_result.data.get("at"),
+        validation_result.data.get("log_id"),
+    )
+    if not logs:
+        return RouteErrors.NOT_FOUND.value
+
+    return {"resource": replay(logs), "log_id": logs[-1]["id"]}
+
+
+@log_routes_bp.route("/actions/export", methods=["GET"])
+@jwt_required()
+def export_action_log_all():
+    if not db_controller.has_admin_access_level(current_user.id):
+        return RouteErrors.UNAUTHORISED_ACCESS.value
+    return stream_resource_all(UserActionLog)
+
+
+@log_routes_bp.route("/writer", methods=["GET"])
+@jwt_required()
+def get_log_writer_stats():
+    if not db_controller.has_admin_access_level(current_user.id):
+        return RouteErrors.UNAUTHORISED_ACCESS.value
+    return {**audit_log_writer.stats(), "reads": read_auditor.stats()}
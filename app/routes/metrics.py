@@ -0,0 +1,27 @@
+import hmac
+
+from flask import Blueprint, Response, current_app, request
+
+from . import RouteErrors
+from ..metrics import metrics
+
+metrics_routes_bp = Blueprint("metrics", __name__, url_prefix="/metrics")
+
+
+# scraped by Prometheus, which authenticates with METRICS_TOKEN rather than a JWT
+# (the token is only optional when debugging or testing)
+@metrics_routes_bp.route("", methods=["GET"])
+def get_metrics():
+    if not metrics.enabled:
+        return RouteErrors.NOT_FOUND.value
+
+    token = current_app.config["METRICS_TOKEN"]
+    if token is None:
+        if not (current_app.debug or current_app.testing):
+            return RouteErrors.UNAUTHORISED_ACCESS.value
+    elif not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return RouteErrors.UNAUTHORISED_ACCESS.value
+
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required, current_user
 
 from . import (
     RouteErrors,
+    audit_read,
     db_controller,
     create_resource,
     get_resource,
@@ -42,6 +43,7 @@ def create_motivation():
 
 @motivations_routes_bp.route("/<int:user_id>", methods=["GET"])
 @jwt_required()
+@audit_read(Motivation.__tablename__, "user_id")
 def get_motivation(user_id: int):
     if not db_controller.has_moderator_access_level(current_user.id):
         return RouteErrors.UNAUTHORISED_ACCESS.value
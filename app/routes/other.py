@@ -3,7 +3,6 @@ from flask_jwt_extended import create_access_token
 
 from . import db_controller
 from ..database_controller import NotFoundError, FailedAuthenticationError
-from ..models import Staff
 from ..schemas import LoginSchema, validate_data
 
 other_routes_bp = Blueprint("other", __name__, url_prefix="/")
@@ -38,11 +37,7 @@ def login() -> dict | tuple[dict, int]:
         "token": create_access_token(identity=user),
     }
 
-    try:
-        staff = db_controller.get(Staff, "user_id", user.id)
-    except NotFoundError:
-        return_data["role"] = "user"
-    else:
-        return_data["role"] = staff.role.value
+    role = db_controller.get_staff_role(user.id)
+    return_data["role"] = "user" if role is None else role.value
 
     return return_data
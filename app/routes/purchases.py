@@ -30,7 +30,7 @@ def create_purchase():
     ):
         return RouteErrors.UNAUTHORISED_ACCESS.value
 
-    if db_controller.is_frozen(current_user.id):
+    if current_user.frozen:
         return {
             "error": "Your account is frozen and you cannot make new purchases"
         }, 403
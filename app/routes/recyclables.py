@@ -6,7 +6,7 @@ from . import (
     db_controller,
     create_resource,
     get_resource,
-    get_resource_all,
+    get_catalog_resource_all,
     update_resource,
     delete_resource,
 )
@@ -42,7 +42,7 @@ def get_recyclable(id: int):
 
 @recyclables_routes_bp.route("", methods=["GET"])
 def get_recyclable_all():
-    return get_resource_all(Recyclable)
+    return get_catalog_resource_all(Recyclable)
 
 
 @recyclables_routes_bp.route("/<int:id>", methods=["PATCH"])
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, send_file, current_app
+from flask import Blueprint, request, current_app
 from flask_jwt_extended import jwt_required, current_user
 
 from . import (
@@ -6,16 +6,18 @@ from . import (
     db_controller,
     create_resource,
     get_resource,
-    get_resource_all,
+    get_catalog_resource_all,
     update_resource,
     delete_resource,
+    send_image,
     NotFoundError,
 )
 
 from ..constants import Constants
 from ..models import Reward
 from ..schemas import RewardSchema, validate_data
-from ..util import get_image_upload_path, process_image, UnidentifiedImageError
+from ..images import image_pipeline
+from ..util import get_image_upload_path
 
 rewards_routes_bp = Blueprint("rewards", __name__, url_prefix="/rewards")
 
@@ -60,13 +62,15 @@ def upload_reward_image(id: int):
     image_file = request.files["image"]
 
     try:
-        process_image(image_file, image_path)
-    except UnidentifiedImageError:
-        return RouteErrors.IMAGE_PROCESSING_ERROR.value
+        job = image_pipeline.submit(image_file, image_path, current_user.id)
     except OSError:
         return RouteErrors.IMAGE_PROCESSING_ERROR.value
 
-    return {"message": "Image uploaded, verification pending."}
+    return {
+        "message": "Image uploaded, processing pending.",
+        "job_id": job["id"],
+        "status": job["status"],
+    }, 202
 
 
 @rewards_routes_bp.route("/<int:id>", methods=["GET"])
@@ -76,21 +80,12 @@ def get_reward(id: int):
 
 @rewards_routes_bp.route("", methods=["GET"])
 def get_reward_all():
-    return get_resource_all(Reward)
+    return get_catalog_resource_all(Reward)
 
 
 @rewards_routes_bp.route("/<int:id>/image", methods=["GET"])
 def get_reward_image(id: int):
-    image_path = get_image_upload_path(
-        id, current_app.config["UPLOADS_DIRECTORY"], Constants.REWARD_IMAGES_DIRECTORY
-    )
-
-    try:
-        return send_file(image_path, mimetype="image/jpeg")
-    except FileNotFoundError:
-        return RouteErrors.NOT_FOUND.value
-    except OSError:
-        return RouteErrors.SERVER_ERROR.value
+    return send_image(id, Constants.REWARD_IMAGES_DIRECTORY)
 
 
 @rewards_routes_bp.route("/<int:id>", methods=["PATCH"])
@@ -1,11 +1,46 @@
-from flask import Blueprint
+from datetime import date, timedelta
 
-from . import db_controller
-from ..models import Submission
+from flask import Blueprint, request
+
+from ..config import AppConfig
+from ..schemas import TimeseriesSchema, validate_data
+from ..statistics import statistics_counters, submission_rollups
 
 statistics_routes_bp = Blueprint("statistics", __name__, url_prefix="/statistics")
 
 
 @statistics_routes_bp.route("", methods=["GET"])
 def get_statistics():
-    return {"total_submissions": db_controller.get_count_of(Submission)}
+    return statistics_counters.summary()
+
+
+# confirmed submissions per day, week or month, optionally per bin, recyclable or organisation
+@statistics_routes_bp.route("/timeseries", methods=["GET"])
+def get_statistics_timeseries():
+    validation_result = validate_data(request.args.to_dict(), TimeseriesSchema)
+    if not validation_result.valid:
+        return {
+            "error": validation_result.error_message,
+            "message": validation_result.info,
+        }, 400
+    request_data = validation_result.data
+
+    end = request_data.get("end", date.today())
+    start = request_data.get(
+        "start", end - timedelta(days=AppConfig.TIMESERIES_DEFAULT_DAYS - 1)
+    )
+    if (end - start).days >= AppConfig.TIMESERIES_MAX_DAYS:
+        return {
+            "error": "Invalid data",
+            "message": f"Period cannot be longer than {AppConfig.TIMESERIES_MAX_DAYS} days",
+        }, 400
+
+    return {
+        "bucket": request_data["bucket"],
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "group_by": request_data.get("group_by"),
+        "series": submission_rollups.timeseries(
+            request_data["bucket"], start, end, request_data.get("group_by")
+        ),
+    }
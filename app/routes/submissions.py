@@ -1,4 +1,4 @@
-from flask import Blueprint, request, send_file, current_app
+from flask import Blueprint, request, current_app
 from flask_jwt_extended import jwt_required, current_user
 from haversine import haversine, Unit
 
@@ -8,15 +8,25 @@ from . import (
     create_resource,
     get_resource,
     get_resource_all,
+    stream_resource_all,
     update_resource,
     delete_resource,
+    send_image,
 )
 from ..config import AppConfig
 from ..constants import Constants
-from ..database_controller import NotFoundError
-from ..models import Bin, Submission, User
-from ..schemas import SubmissionCreationSchema, SubmissionUpdateSchema, validate_data
-from ..util import get_image_upload_path, process_image, UnidentifiedImageError
+from ..database_controller import InvalidDataError, NotFoundError, ServerError
+from ..models import Bin, Recyclable, Submission, User
+from ..enums import SubmissionStatus
+from ..schemas import (
+    ModerationQueueSchema,
+    SubmissionBulkUpdateSchema,
+    SubmissionCreationSchema,
+    SubmissionUpdateSchema,
+    validate_data,
+)
+from ..images import image_pipeline
+from ..util import get_image_upload_path
 
 submissions_routes_bp = Blueprint("submissions", __name__, url_prefix="/submissions")
 
@@ -34,7 +44,7 @@ def create_submission():
     ):
         return RouteErrors.UNAUTHORISED_ACCESS.value
 
-    if db_controller.is_frozen(current_user.id):
+    if current_user.frozen:
         return {
             "error": "Your account is frozen and you cannot make new submissions"
         }, 403
@@ -54,18 +64,8 @@ def create_submission():
 
     # if bin has a restricted list of valid recyclables
     # check that submitted recyclable is one of them
-    if bin.whitelist:
-        whitelisted_recyclables = db_controller.get_bin_whitelist(
-            request_data["bin_id"]
-        )
-        whitelisted = False
-        for recyclable in whitelisted_recyclables:
-            if recyclable.id == request_data["recyclable_id"]:
-                whitelisted = True
-                break
-
-        if not whitelisted:
-            return {"error": "Recyclable not allowed for this bin"}, 403
+    if not db_controller.is_recyclable_allowed(bin.id, request_data["recyclable_id"]):
+        return {"error": "Recyclable not allowed for this bin"}, 403
 
     # check distance from bin being submitted to
     distance = haversine(
@@ -79,6 +79,103 @@ def create_submission():
     return create_resource(Submission, request_data, current_user.id)
 
 
+# creates several submissions at once, e.g. when a user scans a number of items at a bin
+# invalid submissions are reported in the results and do not prevent the others being created
+@submissions_routes_bp.route("/batch", methods=["POST"])
+@jwt_required()
+def create_submission_batch():
+    request_data = request.get_json()
+
+    if (
+        not isinstance(request_data, dict)
+        or not isinstance(request_data.get("submissions"), list)
+        or not 0 < len(request_data["submissions"]) <= AppConfig.MAX_SUBMISSION_BATCH
+    ):
+        return {
+            "error": "Invalid data",
+            "message": f"Expected a list of 1 to {AppConfig.MAX_SUBMISSION_BATCH} submissions",
+        }, 400
+
+    if current_user.frozen:
+        return {
+            "error": "Your account is frozen and you cannot make new submissions"
+        }, 403
+
+    validation_result = validate_data(
+        request_data["submissions"], SubmissionCreationSchema, many=True
+    )
+    submissions_data = validation_result.data
+
+    results: list[dict] = [{} for _ in submissions_data]
+    for index, messages in validation_result.info.items():
+        if isinstance(index, int):
+            results[index] = {"error": "Invalid data", "message": messages}
+
+    # bins and permissions are resolved once per distinct bin or user, and the users
+    # and recyclables referenced are checked up front so that one bad id is reported
+    # against its submission instead of failing the whole batch
+    pending = [data for data, result in zip(submissions_data, results) if not result]
+    bins = db_controller.get_many(Bin, [data["bin_id"] for data in pending])
+    user_ids = db_controller.get_existing_ids(
+        User, [data["user_id"] for data in pending]
+    )
+    recyclable_ids = db_controller.get_existing_ids(
+        Recyclable, [data["recyclable_id"] for data in pending]
+    )
+    is_owner_or_admin = {}
+
+    for data, result in zip(submissions_data, results):
+        if result:
+            continue
+
+        if data["user_id"] not in is_owner_or_admin:
+            is_owner_or_admin[data["user_id"]] = db_controller.is_owner_or_admin(
+                current_user.id, User, data["user_id"]
+            )
+        bin = bins.get(data["bin_id"])
+
+        if not is_owner_or_admin[data["user_id"]]:
+            result.update(RouteErrors.UNAUTHORISED_ACCESS.value[0])
+        elif data["user_id"] not in user_ids:
+            result["error"] = "User not found"
+        elif data["recyclable_id"] not in recyclable_ids:
+            result["error"] = "Recyclable not found"
+        elif bin is None:
+            result["error"] = "Bin not found"
+        elif not db_controller.is_recyclable_allowed(bin.id, data["recyclable_id"]):
+            result["error"] = "Recyclable not allowed for this bin"
+        elif (
+            haversine(
+                (data["latitude"], data["longitude"]),
+                (bin.latitude, bin.longitude),
+                unit=Unit.METERS,
+            )
+            > AppConfig.MAX_BIN_DISTANCE
+        ):
+            result["error"] = "Not within sufficient distance of specified bin"
+
+    valid_data = [data for data, result in zip(submissions_data, results) if not result]
+    if valid_data:
+        try:
+            submissions = db_controller.create_many(
+                Submission, valid_data, current_user.id
+            )
+        except InvalidDataError:
+            return RouteErrors.INVALID_DATA.value
+        except ServerError:
+            return RouteErrors.SERVER_ERROR.value
+
+        created = iter(submissions)
+        for result in results:
+            if not result:
+                result["resource"] = next(created).to_dict()
+
+    return {
+        "message": f"{len(valid_data)} of {len(results)} submissions created",
+        "results": results,
+    }, (201 if valid_data else 400)
+
+
 @submissions_routes_bp.route("<int:id>/image", methods=["POST"])
 @jwt_required()
 def upload_submission_image(id: int):
@@ -101,13 +198,15 @@ def upload_submission_image(id: int):
     image_file = request.files["image"]
 
     try:
-        process_image(image_file, image_path)
-    except UnidentifiedImageError:
-        return RouteErrors.IMAGE_PROCESSING_ERROR.value
+        job = image_pipeline.submit(image_file, image_path, current_user.id)
     except OSError:
         return RouteErrors.IMAGE_PROCESSING_ERROR.value
 
-    return {"message": "Image uploaded, verification pending."}
+    return {
+        "message": "Image uploaded, processing pending.",
+        "job_id": job["id"],
+        "status": job["status"],
+    }, 202
 
 
 @submissions_routes_bp.route("/<int:id>", methods=["GET"])
@@ -126,25 +225,83 @@ def get_submission_all():
     return get_resource_all(Submission)
 
 
-@submissions_routes_bp.route("/<int:id>/image", methods=["GET"])
+def _moderation_queue_statuses(status: str | None) -> list[SubmissionStatus]:
+    if status is not None:
+        return [SubmissionStatus(status)]
+    return [SubmissionStatus.not_confirmed, SubmissionStatus.moderator_required]
+
+
+# oldest pending submissions that no moderator is currently reviewing
+@submissions_routes_bp.route("/queue", methods=["GET"])
 @jwt_required()
-def get_submission_image(id: int):
-    if not db_controller.is_owner_or_moderator(current_user.id, Submission, id):
+def get_moderation_queue():
+    if not db_controller.has_moderator_access_level(current_user.id):
         return RouteErrors.UNAUTHORISED_ACCESS.value
 
-    image_path = get_image_upload_path(
-        id,
-        current_app.config["UPLOADS_DIRECTORY"],
-        Constants.SUBMISSION_IMAGES_DIRECTORY,
+    validation_result = validate_data(request.args.to_dict(), ModerationQueueSchema)
+    if not validation_result.valid:
+        return {
+            "error": validation_result.error_message,
+            "message": validation_result.info,
+        }, 400
+    request_data = validation_result.data
+
+    submissions = db_controller.get_moderation_queue(
+        _moderation_queue_statuses(request_data.get("status")), request_data["limit"]
     )
+    return {"submissions": [submission.to_dict() for submission in submissions]}
+
+
+# claims submissions from the queue so that other moderators are not given them
+# until the claim expires (MODERATION_CLAIM_TTL seconds)
+@submissions_routes_bp.route("/queue/claim", methods=["POST"])
+@jwt_required()
+def claim_moderation_queue():
+    if not db_controller.has_moderator_access_level(current_user.id):
+        return RouteErrors.UNAUTHORISED_ACCESS.value
+
+    validation_result = validate_data(
+        request.get_json(silent=True) or {}, ModerationQueueSchema
+    )
+    if not validation_result.valid:
+        return {
+            "error": validation_result.error_message,
+            "message": validation_result.info,
+        }, 400
+    request_data = validation_result.data
 
     try:
-        return send_file(image_path, mimetype="image/jpeg")
-    except FileNotFoundError:
-        return RouteErrors.NOT_FOUND.value
-    except OSError:
+        submissions, claim_expires_at = db_controller.claim_moderation_queue(
+            _moderation_queue_statuses(request_data.get("status")),
+            request_data["limit"],
+            current_user.id,
+            AppConfig.MODERATION_CLAIM_TTL,
+        )
+    except ServerError:
         return RouteErrors.SERVER_ERROR.value
 
+    return {
+        "submissions": [submission.to_dict() for submission in submissions],
+        "claim_expires_at": int(claim_expires_at.timestamp()),
+    }
+
+
+@submissions_routes_bp.route("/export", methods=["GET"])
+@jwt_required()
+def export_submission_all():
+    if not db_controller.has_moderator_access_level(current_user.id):
+        return RouteErrors.UNAUTHORISED_ACCESS.value
+    return stream_resource_all(Submission)
+
+
+@submissions_routes_bp.route("/<int:id>/image", methods=["GET"])
+@jwt_required()
+def get_submission_image(id: int):
+    if not db_controller.is_owner_or_moderator(current_user.id, Submission, id):
+        return RouteErrors.UNAUTHORISED_ACCESS.value
+
+    return send_image(id, Constants.SUBMISSION_IMAGES_DIRECTORY)
+
 
 @submissions_routes_bp.route("/<int:id>", methods=["PATCH"])
 @jwt_required()
@@ -167,6 +324,47 @@ def update_submission(id: int):
     return update_resource(Submission, "id", id, request_data, current_user.id)
 
 
+@submissions_routes_bp.route("/bulk", methods=["PATCH"])
+@jwt_required()
+def update_submission_bulk():
+    if not db_controller.has_moderator_access_level(current_user.id):
+        return RouteErrors.UNAUTHORISED_ACCESS.value
+
+    request_data = request.get_json()
+
+    validation_result = validate_data(request_data, SubmissionBulkUpdateSchema)
+    if not validation_result.valid:
+        return {
+            "error": validation_result.error_message,
+            "message": validation_result.info,
+        }, 400
+    request_data = validation_result.data
+
+    filters = request_data.get("filter")
+    if "ids" in request_data:
+        ids = request_data["ids"]
+    else:
+        ids = db_controller.get_ids_matching(Submission, filters, request_data["limit"])
+
+    try:
+        updated_ids = db_controller.update_many(
+            Submission,
+            ids,
+            {"status": request_data["status"]},
+            current_user.id,
+            filters,
+        )
+    except InvalidDataError:
+        return RouteErrors.INVALID_DATA.value
+    except ServerError:
+        return RouteErrors.SERVER_ERROR.value
+
+    return {
+        "message": f"{len(updated_ids)} submissions updated",
+        "updated": updated_ids,
+    }
+
+
 @submissions_routes_bp.route("/<int:id>", methods=["DELETE"])
 @jwt_required()
 def delete_submission(id: int):
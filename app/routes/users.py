@@ -6,6 +6,7 @@ from werkzeug.security import generate_password_hash
 
 from . import (
     RouteErrors,
+    audit_read,
     db_controller,
     get_resource,
     get_resource_all,
@@ -16,8 +17,9 @@ from . import (
 from .other import other_routes_bp
 from ..config import AppConfig
 from ..database_controller import NotFoundError
+from ..leaderboard import leaderboard
 from ..models import User, Submission, Purchase
-from ..schemas import RegistrationSchema, validate_data
+from ..schemas import LeaderboardSchema, RegistrationSchema, validate_data
 
 users_routes_bp = Blueprint("users", __name__, url_prefix="/users")
 
@@ -57,6 +59,7 @@ def create_user():
 
 @users_routes_bp.route("/<int:id>", methods=["GET"])
 @jwt_required()
+@audit_read(User.__tablename__)
 def get_user(id: int):
     if not db_controller.is_owner_or_moderator(current_user.id, User, id):
         return RouteErrors.UNAUTHORISED_ACCESS.value
@@ -75,6 +78,7 @@ def get_user_all():
 
 @users_routes_bp.route("/<int:id>/submissions", methods=["GET"])
 @jwt_required()
+@audit_read(Submission.__tablename__)
 def get_user_submissions(id: int):
     if not db_controller.is_owner_or_moderator(current_user.id, User, id):
         return RouteErrors.UNAUTHORISED_ACCESS.value
@@ -84,8 +88,7 @@ def get_user_submissions(id: int):
     except NotFoundError:
         return {"error": "User not found"}, 404
     else:
-        submissions = db_controller.get_all_matching(Submission, "user_id", id)
-        return {"submissions": [submission.to_dict() for submission in submissions]}
+        return get_resource_all(Submission, "user_id", id)
 
 
 @users_routes_bp.route("/<int:id>/purchases", methods=["GET"])
@@ -99,8 +102,7 @@ def get_user_purchases(id: int):
     except NotFoundError:
         return {"error": "User not found"}, 404
     else:
-        purchases = db_controller.get_all_matching(Purchase, "user_id", id)
-        return {"purchases": [purchase.to_dict() for purchase in purchases]}
+        return get_resource_all(Purchase, "user_id", id)
 
 
 @users_routes_bp.route("/<int:id>/balance", methods=["GET"])
@@ -117,6 +119,44 @@ def get_user_balance(id: int):
         return {"points_balance": points_balance}
 
 
+# the user's position on the global and organisation leaderboards
+@users_routes_bp.route("/<int:id>/rank", methods=["GET"])
+@jwt_required()
+def get_user_rank(id: int):
+    if not db_controller.is_owner_or_moderator(current_user.id, User, id):
+        return RouteErrors.UNAUTHORISED_ACCESS.value
+
+    validation_result = validate_data(request.args.to_dict(), LeaderboardSchema)
+    if not validation_result.valid:
+        return {
+            "error": validation_result.error_message,
+            "message": validation_result.info,
+        }, 400
+    period = validation_result.data["period"]
+
+    # users without any points are not in the rankings
+    organisation = leaderboard.organisation_of(id)
+    if organisation is None:
+        try:
+            organisation = db_controller.get(User, "id", id).organisation
+        except NotFoundError:
+            return {"error": "User not found"}, 404
+
+    points, rank = leaderboard.rank(id, period)
+    organisation_rank = None
+    if organisation:
+        _, organisation_rank = leaderboard.rank(id, period, organisation)
+
+    return {
+        "user_id": id,
+        "period": period,
+        "points": points,
+        "rank": rank,
+        "organisation": organisation,
+        "organisation_rank": organisation_rank,
+    }
+
+
 @users_routes_bp.route("/<int:id>", methods=["PATCH"])
 @jwt_required()
 def update_user(id: int):
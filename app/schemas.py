@@ -1,11 +1,25 @@
 """Schemas for validating JSON input"""
 
-from marshmallow import Schema, ValidationError, fields, validate, validates_schema
+from marshmallow import (
+    EXCLUDE,
+    Schema,
+    ValidationError,
+    fields,
+    validate,
+    validates_schema,
+)
 
-from .enums import StaffRole, SubmissionStatus
+from .config import AppConfig
+from .constants import Constants
+from .enums import ActionType, StaffRole, SubmissionStatus
 
 _roles = [role.value for role in StaffRole]
 _statuses = [status.value for status in SubmissionStatus]
+_action_types = [action_type.value for action_type in ActionType]
+
+# unix timestamps are turned into datetimes, which cannot go past the year 9999
+# (this is the start of its last day, so it is in range in any time zone)
+_timestamp = validate.Range(min=0, max=253402214400)
 
 
 class RegistrationSchema(Schema):
@@ -53,6 +67,23 @@ class BinSchema(Schema):
     description = fields.Str(validate=validate.Length(max=2000))
 
 
+class NearbyBinsSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    lat = fields.Float(required=True, validate=validate.Range(min=-90, max=90))
+    lon = fields.Float(required=True, validate=validate.Range(min=-180, max=180))
+    radius = fields.Float(
+        validate=validate.Range(min=0, max=AppConfig.NEARBY_MAX_RADIUS),
+        load_default=AppConfig.NEARBY_DEFAULT_RADIUS,
+    )
+    limit = fields.Int(
+        validate=validate.Range(min=1, max=AppConfig.NEARBY_MAX_LIMIT),
+        load_default=AppConfig.NEARBY_DEFAULT_LIMIT,
+    )
+    recyclable_id = fields.Int()
+
+
 class RecyclableSchema(Schema):
     type = fields.Str(required=True)
     points_value = fields.Int(required=True)
@@ -87,21 +118,150 @@ class PurchaseSchema(Schema):
     quantity = fields.Int()
 
 
+class SubmissionFilterSchema(Schema):
+    status = fields.Str(validate=validate.OneOf(_statuses))
+    user_id = fields.Int()
+    bin_id = fields.Int()
+    recyclable_id = fields.Int()
+
+
+# the submissions are selected either by id or by a filter (oldest first, up to `limit`)
+class SubmissionBulkUpdateSchema(Schema):
+    status = fields.Str(validate=validate.OneOf(_statuses), required=True)
+    ids = fields.List(
+        fields.Int(),
+        validate=validate.Length(min=1, max=AppConfig.MAX_BULK_UPDATE),
+    )
+    filter = fields.Nested(SubmissionFilterSchema)
+    limit = fields.Int(
+        validate=validate.Range(min=1, max=AppConfig.MAX_BULK_UPDATE),
+        load_default=AppConfig.MAX_BULK_UPDATE,
+    )
+
+    @validates_schema
+    def validate_ids_or_filter(self, data, **kwargs):
+        if ("ids" in data) == ("filter" in data):
+            raise ValidationError("Either ids or filter is required.", field_name="ids")
+
+
+class ModerationQueueSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    # both pending statuses are included when no status is given
+    status = fields.Str(
+        validate=validate.OneOf(
+            [
+                SubmissionStatus.not_confirmed.value,
+                SubmissionStatus.moderator_required.value,
+            ]
+        )
+    )
+    limit = fields.Int(
+        validate=validate.Range(min=1, max=AppConfig.MODERATION_QUEUE_MAX_LIMIT),
+        load_default=AppConfig.MODERATION_QUEUE_DEFAULT_LIMIT,
+    )
+
+
+class LeaderboardSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    # the organisation defaults to the current user's when the scope is organisation
+    scope = fields.Str(
+        validate=validate.OneOf(["global", "organisation"]), load_default="global"
+    )
+    organisation = fields.Str(validate=validate.Length(max=255))
+    period = fields.Str(validate=validate.OneOf(["all", "week"]), load_default="all")
+    limit = fields.Int(
+        validate=validate.Range(min=1, max=AppConfig.LEADERBOARD_MAX_LIMIT),
+        load_default=AppConfig.LEADERBOARD_DEFAULT_LIMIT,
+    )
+
+
+class TimeseriesSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    bucket = fields.Str(
+        validate=validate.OneOf(["day", "week", "month"]), load_default="day"
+    )
+    start = fields.Date(data_key="from")
+    end = fields.Date(data_key="to")
+    group_by = fields.Str(
+        validate=validate.OneOf(["bin", "recyclable", "organisation"])
+    )
+
+    @validates_schema
+    def validate_period(self, data, **kwargs):
+        if "start" in data and "end" in data and data["start"] > data["end"]:
+            raise ValidationError("Cannot be after to.", field_name="from")
+
+
+# query string parameters for list endpoints (keyset pagination on id)
+class PaginationSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    limit = fields.Int(validate=validate.Range(min=1, max=AppConfig.MAX_PAGE_SIZE))
+    after = fields.Int(validate=validate.Range(min=0))
+
+
+class LogFilterSchema(PaginationSchema):
+    user_id = fields.Int()
+    resource_table = fields.Str(validate=validate.Length(max=255))
+    resource_id = fields.Int()
+    action_type = fields.Str(validate=validate.OneOf(_action_types))
+
+    # unix timestamps, both inclusive
+    start = fields.Int(data_key="from", validate=_timestamp)
+    end = fields.Int(data_key="to", validate=_timestamp)
+
+    @validates_schema
+    def validate_period(self, data, **kwargs):
+        if "start" in data and "end" in data and data["start"] > data["end"]:
+            raise ValidationError("Cannot be after to.", field_name="from")
+
+
+class ResourceVersionSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    at = fields.Int(validate=_timestamp)  # unix timestamp
+    log_id = fields.Int(validate=validate.Range(min=0))
+
+
+class ImageSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    size = fields.Str(
+        validate=validate.OneOf(["full", *Constants.IMAGE_VARIANT_SIZES]),
+        load_default="full",
+    )
+
+
 class ValidationResult:
     def __init__(self) -> None:
         self.valid: bool = False
         self.error_message: str = "Invalid data"
         self.info: dict = {}
-        self.data: dict = {}
+        self.data: dict | list = {}
 
 
-def validate_data(data: dict, schema, partial: bool = False) -> ValidationResult:
+# with many = True `data` is a list, `info` is then keyed by the index of each invalid item
+# and `data` holds the valid items (invalid items are left empty)
+def validate_data(
+    data: dict | list, schema, partial: bool = False, many: bool = False
+) -> ValidationResult:
     validation_result = ValidationResult()
     try:
         # missing fields ignored if partial = True
-        validation_result.data = schema().load(data, partial=partial)
+        validation_result.data = schema(many=many).load(data, partial=partial)
     except ValidationError as e:
         validation_result.info = e.messages_dict
+        if many and isinstance(e.valid_data, list):
+            validation_result.data = e.valid_data
         return validation_result
 
     validation_result.valid = True
@@ -0,0 +1,592 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import random
+
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.dialects import mysql
+
+from .caches import TTLCache
+from .config import AppConfig
+from .database import db
+from .enums import SubmissionStatus
+from .lookups import lookup
+from .models import (
+    PointsLedgerEntry,
+    Purchase,
+    Recyclable,
+    StatisticsCounter,
+    Submission,
+    SubmissionConfirmation,
+    SubmissionRollup,
+    User,
+)
+
+# fields each counted model's counters depend on
+_COUNTED_FIELDS = {
+    Submission: ("status", "recyclable_id", "bin_id"),
+    Purchase: ("quantity",),
+    User: (),
+}
+
+# counters that are not kept per bin or recyclable
+_TOTALS = (
+    "submissions",
+    *(f"submissions.status.{status.value}" for status in SubmissionStatus),
+    "recycled_weight",
+    "points_issued",
+    "points_spent",
+    "purchases",
+    "purchased_rewards",
+    "users",
+)
+# prefixes of the counters kept per bin or recyclable
+_GROUPED = ("submissions.recyclable.", "submissions.bin.")
+
+
+# inserts `rows`, a row with the same primary key as an existing one instead sets
+# (or with `increment` adds to) the existing row's `values`
+def _upsert(model, rows: list[dict], values: list[str], increment: bool = False):
+    def updates(new_row) -> dict:
+        return {
+            value: (
+                getattr(model, value) + getattr(new_row, value)
+                if increment
+                else getattr(new_row, value)
+            )
+            for value in values
+        }
+
+    statement = mysql.insert(model).values(rows)
+    statement = statement.on_duplicate_key_update(updates(statement.inserted))
+    db.session.execute(statement)
+
+
+# `row` is either a resource's `to_dict()` or the resource itself
+def _field(row, field: str):
+    return row[field] if isinstance(row, dict) else getattr(row, field)
+
+
+def _values(model, row) -> dict:
+    values = {field: _field(row, field) for field in _COUNTED_FIELDS[model]}
+    if "status" in values:
+        values["status"] = SubmissionStatus(values["status"]).value
+    return values
+
+
+def _is_confirmed(row) -> bool:
+    return SubmissionStatus(_field(row, "status")) == SubmissionStatus.confirmed
+
+
+# the day a submission was made
+def _day(row) -> date:
+    created_at = _field(row, "created_at")
+    if isinstance(created_at, int):
+        created_at = datetime.fromtimestamp(created_at)
+    elif created_at is None:
+        created_at = datetime.now()
+    return created_at.date()
+
+
+# what each of the submissions was credited with as (day, organisation, weight), None if
+# it is not confirmed: the values recorded when it was confirmed, which it keeps while it
+# stays confirmed with the same user, recyclable and day, or else the current values
+def _credited(rows_before: list, rows_after: list) -> tuple[list, list]:
+    def source(row) -> tuple[int, int, date]:
+        return (_field(row, "user_id"), _field(row, "recyclable_id"), _day(row))
+
+    # submission id -> source of the submissions confirmed before
+    sources = {
+        _field(row, "id"): source(row) for row in rows_before if _is_confirmed(row)
+    }
+    recorded = lookup(
+        db.session,
+        SubmissionConfirmation.submission_id,
+        (
+            SubmissionConfirmation.day,
+            SubmissionConfirmation.organisation,
+            SubmissionConfirmation.weight,
+        ),
+        sources.keys(),
+    )
+
+    # current values are only needed for submissions without recorded ones
+    unrecorded = [
+        submission_source
+        for submission_id, submission_source in sources.items()
+        if submission_id not in recorded
+    ] + [
+        source(row)
+        for row in rows_after
+        if _is_confirmed(row) and sources.get(_field(row, "id")) != source(row)
+    ]
+    organisations = lookup(
+        db.session,
+        User.id,
+        User.organisation,
+        {user_id for user_id, _, _ in unrecorded},
+    )
+    weights = lookup(
+        db.session,
+        Recyclable.id,
+        Recyclable.weight,
+        {recyclable_id for _, recyclable_id, _ in unrecorded},
+    )
+
+    def current(submission_source: tuple) -> tuple[date, str, float]:
+        user_id, recyclable_id, day = submission_source
+        return day, organisations.get(user_id, ""), weights.get(recyclable_id, 0)
+
+    credited = {
+        submission_id: (
+            recorded[submission_id]
+            if submission_id in recorded
+            else current(submission_source)
+        )
+        for submission_id, submission_source in sources.items()
+    }
+
+    def credited_after(row) -> tuple[date, str, float] | None:
+        if not _is_confirmed(row):
+            return None
+        if sources.get(_field(row, "id")) == source(row):
+            return credited[_field(row, "id")]
+        return current(source(row))
+
+    return (
+        [
+            credited[_field(row, "id")] if _is_confirmed(row) else None
+            for row in rows_before
+        ],
+        [credited_after(row) for row in rows_after],
+    )
+
+
+class StatisticsCounters:
+    # totals shown by GET /statistics, updated by the DatabaseController (and the points ledger)
+    # in the same transaction as each change so that they never have to be counted
+    def __init__(self, slots: int = 8):
+        self.slots = slots
+
+    # `data_before` is the resource's `to_dict()` before the change (None when created)
+    # `instance` is the resource after the change (None when deleted)
+    def record(self, model, data_before: dict | None, instance):
+        self.record_many(
+            model,
+            [data_before] if data_before is not None else [],
+            [instance] if instance is not None else [],
+        )
+
+    def record_many(self, model, rows_before: list, rows_after: list):
+        if model not in _COUNTED_FIELDS:
+            return
+
+        rows = [(-1, _values(model, row)) for row in rows_before]
+        rows.extend((1, _values(model, row)) for row in rows_after)
+
+        changes = defaultdict(float)
+        if model is Submission:
+            credited_before, credited_after = _credited(rows_before, rows_after)
+            for (sign, values), credited in zip(rows, credited_before + credited_after):
+                changes["submissions"] += sign
+                changes[f"submissions.status.{values['status']}"] += sign
+                changes[f"submissions.recyclable.{values['recyclable_id']}"] += sign
+                changes[f"submissions.bin.{values['bin_id']}"] += sign
+                if credited is not None:
+                    changes["recycled_weight"] += sign * credited[2]
+        elif model is Purchase:
+            for sign, values in rows:
+                changes["purchases"] += sign
+                changes["purchased_rewards"] += sign * values["quantity"]
+        elif model is User:
+            for sign, _ in rows:
+                changes["users"] += sign
+
+        self.add(changes)
+
+    # adds each amount to its counter with a single upsert into a random slot
+    def add(self, changes: dict[str, float]):
+        slot = random.randrange(self.slots)
+        # sorted so concurrent transactions lock rows in the same order
+        rows = [
+            {"name": name, "slot": slot, "value": value}
+            for name, value in sorted(changes.items())
+            if value != 0
+        ]
+        if rows:
+            _upsert(StatisticsCounter, rows, ["value"], increment=True)
+
+    # counter name -> total of its slots, only ranges of the (name, slot) primary key
+    # are read: the slots of each total and of the counters under each grouped prefix
+    def get_all(self) -> dict[str, float]:
+        return dict(
+            db.session.execute(
+                select(StatisticsCounter.name, func.sum(StatisticsCounter.value))
+                .where(
+                    or_(
+                        StatisticsCounter.name.in_(_TOTALS),
+                        *(
+                            StatisticsCounter.name.like(f"{prefix}%")
+                            for prefix in _GROUPED
+                        ),
+                    )
+                )
+                .group_by(StatisticsCounter.name)
+            ).all()
+        )
+
+    def summary(self) -> dict:
+        counters = self.get_all()
+
+        def total(name: str) -> int:
+            return int(counters.get(name, 0))
+
+        def grouped(prefix: str) -> dict[str, int]:
+            return {
+                name.removeprefix(prefix): int(value)
+                for name, value in counters.items()
+                if name.startswith(prefix) and value
+            }
+
+        return {
+            "total_submissions": total("submissions"),
+            "submissions_by_status": {
+                status.value: total(f"submissions.status.{status.value}")
+                for status in SubmissionStatus
+            },
+            "submissions_by_recyclable": grouped("submissions.recyclable."),
+            "submissions_by_bin": grouped("submissions.bin."),
+            "total_recycled_weight": round(counters.get("recycled_weight", 0), 3),
+            "total_points_issued": total("points_issued"),
+            "total_points_spent": total("points_spent"),
+            "total_purchases": total("purchases"),
+            "total_purchased_rewards": total("purchased_rewards"),
+            "total_users": total("users"),
+        }
+
+    # recounts every counter from the tables themselves
+    def rebuild(self):
+        db.session.execute(delete(StatisticsCounter))
+
+        counters = defaultdict(float)
+        counters["users"] = db.session.execute(
+            select(func.count()).select_from(User)
+        ).scalar_one()
+
+        for status, recyclable_id, bin_id, count in db.session.execute(
+            select(
+                Submission.status,
+                Submission.recyclable_id,
+                Submission.bin_id,
+                func.count(),
+            ).group_by(Submission.status, Submission.recyclable_id, Submission.bin_id)
+        ):
+            counters["submissions"] += count
+            counters[f"submissions.status.{status.value}"] += count
+            counters[f"submissions.recyclable.{recyclable_id}"] += count
+            counters[f"submissions.bin.{bin_id}"] += count
+
+        # submissions are counted with the weight they were credited with when confirmed
+        counters["recycled_weight"] = db.session.execute(
+            select(
+                func.coalesce(
+                    func.sum(
+                        func.coalesce(SubmissionConfirmation.weight, Recyclable.weight)
+                    ),
+                    0,
+                )
+            )
+            .select_from(Submission)
+            .join(Recyclable, Submission.recyclable_id == Recyclable.id)
+            .outerjoin(
+                SubmissionConfirmation,
+                SubmissionConfirmation.submission_id == Submission.id,
+            )
+            .where(Submission.status == SubmissionStatus.confirmed)
+        ).scalar_one()
+
+        purchases, purchased_rewards = db.session.execute(
+            select(func.count(), func.coalesce(func.sum(Purchase.quantity), 0))
+        ).one()
+        counters["purchases"] = purchases
+        counters["purchased_rewards"] = purchased_rewards
+
+        for source_table, amount in db.session.execute(
+            select(
+                PointsLedgerEntry.source_table, func.sum(PointsLedgerEntry.amount)
+            ).group_by(PointsLedgerEntry.source_table)
+        ):
+            if source_table == Submission.__tablename__:
+                counters["points_issued"] += amount
+            elif source_table == Purchase.__tablename__:
+                counters["points_spent"] -= amount
+
+        rows = [
+            {"name": name, "slot": 0, "value": value}
+            for name, value in counters.items()
+            if value != 0
+        ]
+        if rows:
+            db.session.execute(insert(StatisticsCounter), rows)
+        db.session.commit()
+
+
+class SubmissionConfirmations:
+    # records what each submission is credited with when it is confirmed, the
+    # DatabaseController calls it once the statistics and rollups have used the previous records
+    def record(self, model, data_before: dict | None, instance):
+        self.record_many(
+            model,
+            [data_before] if data_before is not None else [],
+            [instance] if instance is not None else [],
+        )
+
+    def record_many(self, model, rows_before: list, rows_after: list):
+        if model is not Submission:
+            return
+
+        credited_before, credited_after = _credited(rows_before, rows_after)
+        credited = {
+            _field(row, "id"): values
+            for row, values in zip(rows_after, credited_after)
+            if values is not None
+        }
+        reversed_ids = {
+            _field(row, "id")
+            for row, values in zip(rows_before, credited_before)
+            if values is not None
+        } - credited.keys()
+
+        if reversed_ids:
+            db.session.execute(
+                delete(SubmissionConfirmation).where(
+                    SubmissionConfirmation.submission_id.in_(reversed_ids)
+                )
+            )
+        if credited:
+            _upsert(
+                SubmissionConfirmation,
+                [
+                    {
+                        "submission_id": submission_id,
+                        "day": day,
+                        "organisation": organisation,
+                        "weight": weight,
+                    }
+                    for submission_id, (day, organisation, weight) in sorted(
+                        credited.items()
+                    )
+                ],
+                ["day", "organisation", "weight"],
+            )
+
+    # records the current values for confirmed submissions that have no record
+    def backfill(self):
+        db.session.execute(
+            insert(SubmissionConfirmation).from_select(
+                ["submission_id", "day", "organisation", "weight"],
+                select(
+                    Submission.id,
+                    func.date(Submission.created_at),
+                    User.organisation,
+                    Recyclable.weight,
+                )
+                .join(User, Submission.user_id == User.id)
+                .join(Recyclable, Submission.recyclable_id == Recyclable.id)
+                .outerjoin(
+                    SubmissionConfirmation,
+                    SubmissionConfirmation.submission_id == Submission.id,
+                )
+                .where(
+                    Submission.status == SubmissionStatus.confirmed,
+                    SubmissionConfirmation.submission_id.is_(None),
+                ),
+            )
+        )
+        db.session.commit()
+
+
+# `changes` maps (day, bin_id, recyclable_id, organisation) to [submissions, weight]
+def _rollup_rows(changes: dict) -> list[dict]:
+    return [
+        {
+            "day": key[0],
+            "bin_id": key[1],
+            "recyclable_id": key[2],
+            "organisation": key[3],
+            "submissions": submissions,
+            "weight": weight,
+        }
+        # sorted so concurrent transactions lock rows in the same order
+        for key, (submissions, weight) in sorted(changes.items())
+    ]
+
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+class SubmissionRollups:
+    # confirmed submissions per day, bin, recyclable and organisation for GET /statistics/timeseries
+    # updated by the DatabaseController whenever a submission becomes (or stops being) confirmed
+    def __init__(self, cache_ttl: float = 60):
+        # dashboards repeatedly ask for the same recent buckets,
+        # so changes can take up to `cache_ttl` seconds to appear
+        self.cache = TTLCache(cache_ttl, max_size=1000)
+
+    def record(self, model, data_before: dict | None, instance):
+        self.record_many(
+            model,
+            [data_before] if data_before is not None else [],
+            [instance] if instance is not None else [],
+        )
+
+    def record_many(self, model, rows_before: list, rows_after: list):
+        if model is not Submission:
+            return
+
+        # reversals use the day, organisation and weight recorded at confirmation
+        credited_before, credited_after = _credited(rows_before, rows_after)
+
+        changes = defaultdict(lambda: [0, 0.0])
+        for sign, rows, credited in (
+            (-1, rows_before, credited_before),
+            (1, rows_after, credited_after),
+        ):
+            for row, values in zip(rows, credited):
+                if values is None:
+                    continue
+                day, organisation, weight = values
+                key = (
+                    day,
+                    _field(row, "bin_id"),
+                    _field(row, "recyclable_id"),
+                    organisation,
+                )
+                changes[key][0] += sign
+                changes[key][1] += sign * weight
+
+        rows = [row for row in _rollup_rows(changes) if row["submissions"] != 0]
+        if rows:
+            _upsert(SubmissionRollup, rows, ["submissions", "weight"], increment=True)
+
+    # daily totals between `start` and `end` (inclusive), grouped by `group_by` if given
+    # returns a list of (day, group, submissions, weight)
+    def get_daily(self, start: date, end: date, group_by: str | None) -> list[tuple]:
+        group_column = {
+            None: None,
+            "bin": SubmissionRollup.bin_id,
+            "recyclable": SubmissionRollup.recyclable_id,
+            "organisation": SubmissionRollup.organisation,
+        }[group_by]
+        columns = [SubmissionRollup.day]
+        if group_column is not None:
+            columns.append(group_column)
+
+        rows = db.session.execute(
+            select(
+                *columns,
+                func.sum(SubmissionRollup.submissions),
+                func.sum(SubmissionRollup.weight),
+            )
+            .where(SubmissionRollup.day.between(start, end))
+            .group_by(*columns)
+            .order_by(*columns)
+        ).all()
+
+        if group_column is None:
+            return [
+                (day, None, submissions, weight) for day, submissions, weight in rows
+            ]
+        return [tuple(row) for row in rows]
+
+    # totals per bucket (day, week starting on Monday or month) and group, oldest first
+    def timeseries(
+        self, bucket: str, start: date, end: date, group_by: str | None
+    ) -> list[dict]:
+        key = (bucket, start, end, group_by)
+        found, series = self.cache.get(key)
+        if found:
+            return series  # pyright: ignore
+
+        buckets = defaultdict(lambda: [0, 0.0])
+        for day, group, submissions, weight in self.get_daily(start, end, group_by):
+            if isinstance(day, str):
+                day = date.fromisoformat(day)
+            totals = buckets[(_bucket_start(day, bucket), group)]
+            totals[0] += int(submissions)
+            totals[1] += weight
+
+        series = [
+            {
+                "start": bucket_start.isoformat(),
+                "group": group,
+                "submissions": submissions,
+                "weight": round(weight, 3),
+            }
+            for (bucket_start, group), (submissions, weight) in sorted(
+                buckets.items(), key=lambda item: (item[0][0], str(item[0][1]))
+            )
+        ]
+        self.cache.set(key, series)
+        return series
+
+    # recalculates every rollup from the submissions table
+    def rebuild(self):
+        db.session.execute(delete(SubmissionRollup))
+
+        # submissions are added with the values they were credited with when confirmed
+        changes = defaultdict(lambda: [0, 0.0])
+        for (
+            created_at,
+            bin_id,
+            recyclable_id,
+            organisation,
+            weight,
+            recorded_day,
+            recorded_organisation,
+            recorded_weight,
+        ) in db.session.execute(
+            select(
+                Submission.created_at,
+                Submission.bin_id,
+                Submission.recyclable_id,
+                User.organisation,
+                Recyclable.weight,
+                SubmissionConfirmation.day,
+                SubmissionConfirmation.organisation,
+                SubmissionConfirmation.weight,
+            )
+            .join(User, Submission.user_id == User.id)
+            .join(Recyclable, Submission.recyclable_id == Recyclable.id)
+            .outerjoin(
+                SubmissionConfirmation,
+                SubmissionConfirmation.submission_id == Submission.id,
+            )
+            .where(Submission.status == SubmissionStatus.confirmed)
+            .execution_options(yield_per=AppConfig.EXPORT_BATCH_SIZE)
+        ):
+            if recorded_day is not None:
+                day, organisation, weight = (
+                    recorded_day,
+                    recorded_organisation,
+                    recorded_weight,
+                )
+            else:
+                day = created_at.date()
+            key = (day, bin_id, recyclable_id, organisation)
+            changes[key][0] += 1
+            changes[key][1] += weight
+
+        rows = _rollup_rows(changes)
+        if rows:
+            db.session.execute(insert(SubmissionRollup), rows)
+        db.session.commit()
+
+
+statistics_counters = StatisticsCounters(AppConfig.STATISTICS_COUNTER_SLOTS)
+submission_confirmations = SubmissionConfirmations()
+submission_rollups = SubmissionRollups(AppConfig.TIMESERIES_CACHE_TTL)
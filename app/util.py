@@ -1,34 +1,103 @@
+import json
+import os
 from pathlib import Path
+import uuid
 
 from PIL import Image, UnidentifiedImageError
 import pillow_heif
 from werkzeug.datastructures import FileStorage
 
+from .constants import Constants
+
 # required for the HEIC images that are created by Apple devices
 pillow_heif.register_heif_opener()
 
 
-# used for getting submission, reward and bin images
-def get_image_upload_path(
-    id: int, uploads_directory: str, uploads_subdirectory: str
-) -> Path:
+def get_uploads_subdirectory(uploads_directory: str, uploads_subdirectory: str) -> Path:
     uploads_directory_path = Path(uploads_directory)
     if not uploads_directory_path.exists():
         uploads_directory_path.mkdir()
 
-    images_directory = uploads_directory_path.joinpath(uploads_subdirectory)
-    if not images_directory.exists():
-        images_directory.mkdir()
+    subdirectory = uploads_directory_path.joinpath(uploads_subdirectory)
+    if not subdirectory.exists():
+        subdirectory.mkdir()
+
+    return subdirectory
+
 
+# used for getting submission, reward and bin images
+def get_image_upload_path(
+    id: int, uploads_directory: str, uploads_subdirectory: str
+) -> Path:
+    images_directory = get_uploads_subdirectory(uploads_directory, uploads_subdirectory)
     return images_directory.joinpath(f"{id}.jpg")
 
 
+# smaller versions of an image are stored next to it, e.g. 1.jpg -> 1-thumb.jpg
+def get_image_variant_path(image_path: Path, size: str) -> Path:
+    return image_path.with_name(f"{image_path.stem}-{size}.jpg")
+
+
+def create_image_variant(image_path: Path, size: str) -> Path:
+    variant_path = get_image_variant_path(image_path, size)
+    max_dimension = Constants.IMAGE_VARIANT_SIZES[size]
+
+    with Image.open(image_path) as pil_image:
+        # lets the JPEG decoder downscale while decoding, which is much faster
+        pil_image.draft("RGB", (max_dimension, max_dimension))
+        pil_image.thumbnail((max_dimension, max_dimension))
+
+        temporary_path = variant_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        pil_image.save(temporary_path, format="JPEG")
+        os.replace(temporary_path, variant_path)
+
+    return variant_path
+
+
 # PIL automatically converts image based on file extension (EXIF data is also discarded)
-def process_image(image_file: FileStorage, image_path: Path):
+def process_image(image_file: FileStorage | Path, image_path: Path):
+    source = image_file if isinstance(image_file, Path) else image_file.stream
     try:
-        with Image.open(image_file.stream) as pil_image:
-            pil_image.save(image_path)
+        with Image.open(source) as pil_image:
+            # JPEG does not support transparency or palettes
+            if pil_image.mode not in ("RGB", "L"):
+                pil_image = pil_image.convert("RGB")
+
+            # written to a temporary file first so a partially written image is never served
+            temporary_path = image_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            pil_image.save(temporary_path, format="JPEG")
+            os.replace(temporary_path, image_path)
     except UnidentifiedImageError as e:
         raise e
     except OSError as e:
         raise e
+
+
+def write_json_atomically(data: dict, path: Path):
+    temporary_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    os.replace(temporary_path, path)
+
+
+# run by the image pipeline, possibly in another process
+def process_image_job(job_path: Path, upload_path: Path, image_path: Path):
+    with open(job_path, encoding="utf-8") as file:
+        job = json.load(file)
+
+    try:
+        process_image(upload_path, image_path)
+        for size in Constants.IMAGE_VARIANT_SIZES:
+            create_image_variant(image_path, size)
+    except Exception as e:
+        # e.g. unreadable images or decompression bombs, the job must not stay pending
+        job["status"] = "failed"
+        job["error"] = "Image could not be processed"
+        print(f"{type(e)} -> {e}")
+    else:
+        job["status"] = "done"
+    finally:
+        upload_path.unlink(missing_ok=True)
+
+    write_json_atomically(job, job_path)
+    return job
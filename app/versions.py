@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .database import db
+from .lookups import lookup
+from .models import Bin, Recyclable, Reward, TableVersion
+
+
+def _utc_now() -> datetime:
+    # HTTP dates only have second precision
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+class TableVersions:
+    # versions of the tables behind the public catalog endpoints, used for ETags and
+    # Last-Modified headers so that a revalidation does not have to read the table itself
+    # bumped by the DatabaseController in the same transaction as the change
+    def __init__(self, models):
+        self.tables = {model.__tablename__ for model in models}
+
+    # called on startup, every versioned table needs a row before it can be bumped
+    def ensure_rows(self):
+        existing = set(db.session.execute(select(TableVersion.table_name)).scalars())
+        missing = sorted(self.tables - existing)
+        if not missing:
+            return
+
+        try:
+            db.session.execute(
+                insert(TableVersion),
+                [
+                    {"table_name": table, "version": 0, "updated_at": _utc_now()}
+                    for table in missing
+                ],
+            )
+            db.session.commit()
+        except IntegrityError:
+            # another worker created the rows first
+            db.session.rollback()
+
+    def bump(self, model):
+        if model.__tablename__ not in self.tables:
+            return
+
+        db.session.execute(
+            update(TableVersion)
+            .where(TableVersion.table_name == model.__tablename__)
+            .values(version=TableVersion.version + 1, updated_at=_utc_now())
+        )
+
+    # returns the table's version and when it was last changed (timezone aware)
+    def get(self, model) -> tuple[int, datetime]:
+        version, updated_at = db.session.execute(
+            select(TableVersion.version, TableVersion.updated_at).where(
+                TableVersion.table_name == model.__tablename__
+            )
+        ).one()
+        return version, updated_at.replace(tzinfo=timezone.utc)
+
+    # table name -> version, read once per transaction
+    def get_many(self, models) -> dict[str, int]:
+        return lookup(
+            db.session,
+            TableVersion.table_name,
+            TableVersion.version,
+            [model.__tablename__ for model in models],
+        )
+
+
+table_versions = TableVersions([Bin, Recyclable, Reward])
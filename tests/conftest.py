@@ -2,10 +2,17 @@ import pytest
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from app import create_app, db as _db
+from app.audit import read_auditor
+from app.caches import auth_version_cache, response_cache, staff_role_cache
+from app.indexes import bin_location_index, bin_whitelist_index
+from app.leaderboard import leaderboard
+from app.statistics import submission_rollups
 
 from tests.fixtures.bin_fixtures import *
+from tests.fixtures.log_fixtures import *
 from tests.fixtures.motivation_fixtures import *
 from tests.fixtures.purchase_fixtures import *
+from tests.fixtures.query_fixtures import *
 from tests.fixtures.recyclable_fixtures import *
 from tests.fixtures.reward_fixtures import *
 from tests.fixtures.staff_fixtures import *
@@ -21,6 +28,9 @@ def test_config(tmp_path_factory):
         "TESTING": True,
         "DATABASE_NAME": "recycling_project_TEST",
         "UPLOADS_DIRECTORY": str(tmp_path),
+        # logs are written in the test's transaction so that they are rolled back
+        "AUDIT_LOG_ASYNC": False,
+        "IMAGE_WORKERS": 0,
     }
 
 
@@ -59,6 +69,16 @@ def isolated_transactions(app, db):
         transaction.rollback()
         connection.close()
 
+    # in-memory indexes and caches may refer to rows that have now been rolled back
+    bin_location_index.invalidate()
+    bin_whitelist_index.invalidate()
+    staff_role_cache.invalidate()
+    auth_version_cache.invalidate()
+    response_cache.invalidate()
+    submission_rollups.cache.invalidate()
+    leaderboard.invalidate()
+    read_auditor.invalidate()
+
 
 @pytest.fixture()
 def client(app):
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.archive import log_archive
+from app.enums import ActionType
+from app.models import UserActionLog
+
+
+# each test gets an empty archive
+@pytest.fixture()
+def log_archive_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_archive, "uploads_directory", str(tmp_path))
+    return log_archive.directory
+
+
+# logs from before the retention period, on two different days
+@pytest.fixture()
+def old_logs(db, bin):
+    now = datetime.now().replace(microsecond=0)
+    logs = [
+        UserActionLog(
+            user_id=None,
+            action_type=ActionType.update,
+            resource_id=bin.id,
+            resource_table="bins",
+            data_before={"description": f"Description {days}"},
+            data_after={"description": f"Description {days - 1}"},
+            timestamp=now - timedelta(days=days),
+        )
+        for days in (log_archive.retention_days + 10, log_archive.retention_days + 5)
+    ]
+    db.session.add_all(logs)
+    db.session.commit()
+    return logs
@@ -0,0 +1,159 @@
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+from flask import g, has_app_context, has_request_context, request, request_finished
+import pytest
+from sqlalchemy import event
+
+
+# number of items in the list `key` of a request's JSON body
+def _items(body, key: str) -> int:
+    items = body.get(key) if isinstance(body, dict) else None
+    return len(items) if isinstance(items, list) else 0
+
+
+# most statements a single request may execute, by endpoint, either a number or
+# a function of the request's JSON body for endpoints that take a list of items
+# (a test can allow more with `@pytest.mark.query_budget(n)`)
+DEFAULT_QUERY_BUDGET = 12
+QUERY_BUDGETS = {
+    "submissions.update_submission": 14,
+    "submissions.delete_submission": 13,
+    # a batch is written with one statement per table whatever its size, the allowance
+    # per item only leaves room for occasional lookups such as a whitelist of a new bin
+    "submissions.create_submission_batch": lambda body: (
+        12 + _items(body, "submissions") // 10
+    ),
+    "submissions.update_submission_bulk": 20,
+}
+
+# the same statement executed this many times by one request with different parameters
+# usually means rows are being loaded one at a time (an N+1 query)
+REPEATED_QUERY_LIMIT = 3
+
+
+class QueryPlans:
+    def __init__(self, db):
+        self.db = db
+        self.statements: list[tuple[str, object]] = []
+
+    # records the SELECT statements executed inside the block
+    @contextmanager
+    def capture(self):
+        def before_cursor_execute(
+            connection, cursor, statement, parameters, context, executemany
+        ):
+            if statement.lstrip().upper().startswith("SELECT"):
+                self.statements.append((statement, parameters))
+
+        event.listen(self.db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield self
+        finally:
+            event.remove(self.db.engine, "before_cursor_execute", before_cursor_execute)
+
+    def explain(self, statement: str, parameters) -> list[dict]:
+        connection = self.db.session.connection()
+        if connection.dialect.name == "mysql":
+            prefix = "EXPLAIN"
+        else:
+            prefix = "EXPLAIN QUERY PLAN"
+        result = connection.exec_driver_sql(f"{prefix} {statement}", parameters)
+        return [dict(row) for row in result.mappings()]
+
+    # describes every captured statement that reads a whole table
+    # (on MySQL only scans for which no index could be used at all, since the
+    # optimiser prefers a scan over an index on the small tables used by the tests)
+    def full_scans(self) -> list[str]:
+        full_scans = []
+        for statement, parameters in self.statements:
+            for row in self.explain(statement, parameters):
+                if self.db.engine.dialect.name == "mysql":
+                    is_full_scan = row["type"] == "ALL" and row["possible_keys"] is None
+                else:
+                    is_full_scan = row["detail"].startswith("SCAN")
+                if is_full_scan:
+                    full_scans.append(f"{row} <- {statement}")
+        return full_scans
+
+
+class QueryCounter:
+    def __init__(self, app, db):
+        self.app = app
+        self.db = db
+        # (endpoint, JSON body, [(statement, parameters)]) of each request
+        self.requests: list[tuple[str | None, object, list[tuple[str, object]]]] = []
+
+    # records the statements executed by each request made inside the block
+    # (transaction control statements are not counted)
+    @contextmanager
+    def capture(self):
+        def before_cursor_execute(
+            connection, cursor, statement, parameters, context, executemany
+        ):
+            if has_request_context() and statement.lstrip().upper().startswith(
+                ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+            ):
+                g.setdefault("captured_statements", []).append((statement, parameters))
+
+        def on_request_finished(sender, response, **extra):
+            self.requests.append(
+                (
+                    request.endpoint,
+                    request.get_json(silent=True),
+                    g.pop("captured_statements", []),
+                )
+            )
+
+        # a new app context would remove the session of the one already pushed
+        with nullcontext() if has_app_context() else self.app.app_context():
+            engine = self.db.engine
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        request_finished.connect(on_request_finished, self.app)
+        try:
+            yield self
+        finally:
+            request_finished.disconnect(on_request_finished, self.app)
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    # describes every request that executed more statements than its budget
+    # or executed the same statement with different parameters too many times
+    def violations(self, budget: int | None = None) -> list[str]:
+        violations = []
+        for endpoint, body, statements in self.requests:
+            endpoint_budget = (
+                budget
+                if budget is not None
+                else QUERY_BUDGETS.get(endpoint, DEFAULT_QUERY_BUDGET)
+            )
+            if callable(endpoint_budget):
+                endpoint_budget = endpoint_budget(body)
+            if len(statements) > endpoint_budget:
+                violations.append(
+                    f"{endpoint} executed {len(statements)} statements (budget {endpoint_budget})"
+                )
+
+            repeated = Counter(
+                statement
+                for statement, _ in set(
+                    (statement, repr(parameters))
+                    for statement, parameters in statements
+                )
+            )
+            for statement, count in repeated.items():
+                if count >= REPEATED_QUERY_LIMIT:
+                    violations.append(
+                        f"{endpoint} executed {count} times with different parameters: {statement}"
+                    )
+        return violations
+
+
+@pytest.fixture()
+def query_plans(db):
+    return QueryPlans(db)
+
+
+@pytest.fixture()
+def query_counter(app, db):
+    return QueryCounter(app, db)
@@ -1,5 +1,8 @@
+from pathlib import Path
+
 import pytest
 
+from app.ledger import points_ledger
 from app.models import Submission
 
 
@@ -32,3 +35,20 @@ def submission(db, submission_data):
     db.session.add(submission)
     db.session.commit()
     return submission
+
+
+# credits the user's points the same way the DatabaseController does
+@pytest.fixture()
+def confirmed_submission(db, submission_data):
+    submission_data["status"] = "confirmed"
+    submission = Submission(**submission_data)
+    db.session.add(submission)
+    db.session.flush()
+    points_ledger.record(Submission, None, submission)
+    db.session.commit()
+    return submission
+
+
+@pytest.fixture()
+def submission_image_file_path():
+    return Path("tests/resources/images/empty-milk-jug/empty-milk-jug.heic")
@@ -0,0 +1,21 @@
+import pytest
+
+
+# every request made by a route test is checked against its query budget
+@pytest.fixture(autouse=True)
+def checked_query_counter(query_counter):
+    with query_counter.capture():
+        yield query_counter
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    result = yield
+
+    query_counter = item.funcargs.get("checked_query_counter")
+    if query_counter is not None:
+        marker = item.get_closest_marker("query_budget")
+        violations = query_counter.violations(marker.args[0] if marker else None)
+        assert not violations, "\n".join(violations)
+
+    return result
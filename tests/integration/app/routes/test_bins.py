@@ -1,4 +1,15 @@
+import gzip
+import io
+
 import pytest
+from flask import current_app
+from PIL import Image
+
+from app.constants import Constants
+from app.indexes import bin_whitelist_index
+from app.models import Bin
+from app.util import get_image_upload_path, get_image_variant_path
+from app.versions import table_versions
 
 
 @pytest.mark.usefixtures("isolated_transactions")
@@ -12,7 +23,19 @@ class TestBins:
             response = auth_admin_client.post(
                 f"/bins/{bin.id}/image", data={"image": image_file}
             )
-        assert response.status_code == 200
+        assert response.status_code == 202
+        assert response.get_json()["status"] == "done"
+
+    def test_upload_bin_image_decompression_bomb(
+        self, monkeypatch, auth_admin_client, bin, bin_image_file_path
+    ):
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1)
+        with open(bin_image_file_path, "rb") as image_file:
+            response = auth_admin_client.post(
+                f"/bins/{bin.id}/image", data={"image": image_file}
+            )
+        assert response.status_code == 202
+        assert response.get_json()["status"] == "failed"
 
     def test_upload_bin_image_inadequate_access(
         self, auth_mod_client, bin, bin_image_file_path
@@ -37,13 +60,75 @@ class TestBins:
         response = unauth_client.get("/bins")
         assert response.status_code == 200
 
+    def test_get_bin_nearby(self, unauth_client, bin):
+        response = unauth_client.get("/bins/nearby?lat=1.0001&lon=1.0001&radius=100")
+        assert response.status_code == 200
+        assert response.get_json()["bins"][0]["id"] == bin.id
+
+    def test_get_bin_nearby_out_of_range(self, unauth_client, bin):
+        response = unauth_client.get("/bins/nearby?lat=2&lon=2&radius=100")
+        assert response.status_code == 200
+        assert response.get_json()["bins"] == []
+
+    def test_get_bin_nearby_whitelist(
+        self, unauth_client, bin_with_whitelist, recyclable
+    ):
+        response = unauth_client.get(
+            f"/bins/nearby?lat=1&lon=1&recyclable_id={recyclable.id + 1}"
+        )
+        assert response.get_json()["bins"] == []
+        response = unauth_client.get(
+            f"/bins/nearby?lat=1&lon=1&recyclable_id={recyclable.id}"
+        )
+        assert response.get_json()["bins"][0]["id"] == bin_with_whitelist.id
+
+    def test_get_bin_nearby_created_bin(self, auth_admin_client, bin_data):
+        auth_admin_client.get("/bins/nearby?lat=1&lon=1")  # build index
+        response = auth_admin_client.post("/bins", json=bin_data)
+        bin_id = response.get_json()["resource"]["id"]
+        response = auth_admin_client.get("/bins/nearby?lat=1&lon=1")
+        assert bin_id in [bin["id"] for bin in response.get_json()["bins"]]
+
+    def test_get_bin_nearby_missing_location(self, unauth_client):
+        response = unauth_client.get("/bins/nearby?lat=1")
+        assert response.status_code == 400
+
     def test_get_bin_whithout_whitelist(self, unauth_client, bin):
         response = unauth_client.get(f"/bins/{bin.id}/whitelist")
         assert response.status_code == 200
 
-    def test_get_bin_with_whitelist(self, unauth_client, bin_with_whitelist):
+    def test_get_bin_with_whitelist(
+        self, unauth_client, bin_with_whitelist, recyclable
+    ):
         response = unauth_client.get(f"/bins/{bin_with_whitelist.id}/whitelist")
         assert response.status_code == 200
+        assert response.get_json()["recyclables"][0]["id"] == recyclable.id
+
+    def test_get_bin_whitelist_not_found(self, unauth_client, bin):
+        response = unauth_client.get(f"/bins/{bin.id + 1}/whitelist")
+        assert response.status_code == 404
+
+    def test_get_bin_whitelist_created_after_rebuild(self, unauth_client, db, bin_data):
+        bin_whitelist_index.rebuild()
+
+        # created by another process, so the index is not invalidated
+        bin = Bin(**bin_data)
+        db.session.add(bin)
+        db.session.commit()
+
+        response = unauth_client.get(f"/bins/{bin.id}/whitelist")
+        assert response.status_code == 200
+
+    def test_get_bin_whitelist_changed_by_other_process(self, unauth_client, db, bin):
+        response = unauth_client.get(f"/bins/{bin.id}/whitelist")
+        assert response.get_json()["whitelist"] is False
+
+        bin.whitelist = True
+        table_versions.bump(Bin)
+        db.session.commit()
+
+        response = unauth_client.get(f"/bins/{bin.id}/whitelist")
+        assert response.get_json()["whitelist"] is True
 
     def test_get_bin_image(self, auth_admin_client, bin, bin_image_file_path):
         with open(bin_image_file_path, "rb") as image_file:
@@ -51,6 +136,123 @@ class TestBins:
         response = auth_admin_client.get(f"/bins/{bin.id}/image")
         assert response.status_code == 200
 
+    def test_get_bin_all_not_modified(self, unauth_client, bin):
+        response = unauth_client.get("/bins")
+        assert response.status_code == 200
+        etag, _ = response.get_etag()
+        last_modified = response.headers["Last-Modified"]
+
+        response = unauth_client.get("/bins", headers={"If-None-Match": f'"{etag}"'})
+        assert response.status_code == 304
+
+        response = unauth_client.get(
+            "/bins", headers={"If-Modified-Since": last_modified}
+        )
+        assert response.status_code == 304
+
+    def test_get_bin_all_modified(self, auth_admin_client, bin):
+        response = auth_admin_client.get("/bins")
+        etag, _ = response.get_etag()
+
+        auth_admin_client.patch(f"/bins/{bin.id}", json={"description": "Changed"})
+
+        response = auth_admin_client.get(
+            "/bins", headers={"If-None-Match": f'"{etag}"'}
+        )
+        assert response.status_code == 200
+        assert response.get_etag()[0] != etag
+
+    def test_get_bin_all_etag_depends_on_page(self, unauth_client, bin):
+        first_etag, _ = unauth_client.get("/bins").get_etag()
+        second_etag, _ = unauth_client.get("/bins?limit=1").get_etag()
+        assert first_etag != second_etag
+
+    def test_get_bin_all_cached(self, auth_admin_client, bin):
+        first_response = auth_admin_client.get("/bins")
+        second_response = auth_admin_client.get("/bins")
+        assert second_response.status_code == 200
+        assert second_response.json == first_response.json
+
+        auth_admin_client.patch(f"/bins/{bin.id}", json={"description": "Changed"})
+
+        response = auth_admin_client.get("/bins")
+        assert response.json["bins"][0]["description"] == "Changed"
+
+    def test_get_bin_all_gzip(self, unauth_client, db, bin_data):
+        db.session.add_all([Bin(**bin_data) for _ in range(20)])
+        db.session.commit()
+
+        response = unauth_client.get("/bins", headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert b'"bins"' in gzip.decompress(response.data)
+
+    def test_get_bin_all_gzip_etag(self, unauth_client, db, bin_data):
+        db.session.add_all([Bin(**bin_data) for _ in range(20)])
+        db.session.commit()
+
+        identity_etag, _ = unauth_client.get("/bins").get_etag()
+        response = unauth_client.get("/bins", headers={"Accept-Encoding": "gzip"})
+        gzip_etag, _ = response.get_etag()
+        assert gzip_etag != identity_etag
+
+        response = unauth_client.get(
+            "/bins",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": f'"{gzip_etag}"'},
+        )
+        assert response.status_code == 304
+        assert response.get_etag()[0] == gzip_etag
+        assert "Accept-Encoding" in response.headers["Vary"]
+
+    def test_get_bin_image_not_modified(
+        self, auth_admin_client, bin, bin_image_file_path
+    ):
+        with open(bin_image_file_path, "rb") as image_file:
+            auth_admin_client.post(f"/bins/{bin.id}/image", data={"image": image_file})
+        response = auth_admin_client.get(f"/bins/{bin.id}/image")
+        etag, _ = response.get_etag()
+
+        response = auth_admin_client.get(
+            f"/bins/{bin.id}/image", headers={"If-None-Match": f'"{etag}"'}
+        )
+        assert response.status_code == 304
+
+    def test_get_bin_image_thumbnail(self, auth_admin_client, bin, bin_image_file_path):
+        with open(bin_image_file_path, "rb") as image_file:
+            auth_admin_client.post(f"/bins/{bin.id}/image", data={"image": image_file})
+        response = auth_admin_client.get(f"/bins/{bin.id}/image?size=thumb")
+        assert response.status_code == 200
+
+        with Image.open(io.BytesIO(response.data)) as image:
+            assert max(image.size) <= Constants.IMAGE_VARIANT_SIZES["thumb"]
+
+    def test_get_bin_image_missing_variant(
+        self, auth_admin_client, bin, bin_image_file_path
+    ):
+        with open(bin_image_file_path, "rb") as image_file:
+            auth_admin_client.post(f"/bins/{bin.id}/image", data={"image": image_file})
+
+        # images uploaded before variants existed only have the full size version
+        image_path = get_image_upload_path(
+            bin.id,
+            current_app.config["UPLOADS_DIRECTORY"],
+            Constants.BIN_IMAGES_DIRECTORY,
+        )
+        variant_path = get_image_variant_path(image_path, "medium")
+        variant_path.unlink()
+
+        response = auth_admin_client.get(f"/bins/{bin.id}/image?size=medium")
+        assert response.status_code == 200
+        assert variant_path.exists()
+
+    def test_get_bin_image_invalid_size(
+        self, auth_admin_client, bin, bin_image_file_path
+    ):
+        with open(bin_image_file_path, "rb") as image_file:
+            auth_admin_client.post(f"/bins/{bin.id}/image", data={"image": image_file})
+        response = auth_admin_client.get(f"/bins/{bin.id}/image?size=huge")
+        assert response.status_code == 400
+
     def test_get_bin_image_not_found(self, auth_admin_client, bin, bin_image_file_path):
         with open(bin_image_file_path, "rb") as image_file:
             auth_admin_client.post(f"/bins/{bin.id}/image", data={"image": image_file})
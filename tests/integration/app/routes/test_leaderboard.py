@@ -0,0 +1,78 @@
+import pytest
+
+
+@pytest.mark.usefixtures("isolated_transactions")
+class TestLeaderboard:
+    def test_get_leaderboard(self, auth_mod_client, user, recyclable, submission):
+        response = auth_mod_client.get("/leaderboard")
+        assert response.json["leaderboard"] == []
+
+        # the points are added to the leaderboard once they are committed
+        auth_mod_client.patch(
+            f"/submissions/{submission.id}", json={"status": "confirmed"}
+        )
+
+        response = auth_mod_client.get("/leaderboard")
+        assert response.status_code == 200
+        assert response.json["leaderboard"] == [
+            {
+                "rank": 1,
+                "user_id": user.id,
+                "username": user.username,
+                "points": recyclable.points_value,
+            }
+        ]
+
+    def test_get_leaderboard_after_denial(self, auth_mod_client, submission):
+        auth_mod_client.patch(
+            f"/submissions/{submission.id}", json={"status": "confirmed"}
+        )
+        auth_mod_client.patch(
+            f"/submissions/{submission.id}", json={"status": "denied"}
+        )
+
+        response = auth_mod_client.get("/leaderboard?period=week")
+        assert response.json["leaderboard"][0]["points"] == 0
+
+    def test_get_leaderboard_organisation(
+        self, auth_admin_client, admin, submission_post_data
+    ):
+        submission_post_data["user_id"] = admin.id
+        response = auth_admin_client.post("/submissions", json=submission_post_data)
+        auth_admin_client.patch(
+            f"/submissions/{response.json['resource']['id']}",
+            json={"status": "confirmed"},
+        )
+
+        response = auth_admin_client.get("/leaderboard?scope=organisation")
+        assert response.json["organisation"] == admin.organisation
+        assert [entry["user_id"] for entry in response.json["leaderboard"]] == [
+            admin.id
+        ]
+
+        response = auth_admin_client.get(
+            "/leaderboard?scope=organisation&organisation=Elsewhere"
+        )
+        assert response.json["leaderboard"] == []
+
+    def test_get_leaderboard_invalid_data(self, auth_user_client):
+        response = auth_user_client.get("/leaderboard?period=year")
+        assert response.status_code == 400
+
+    def test_get_user_rank(self, auth_mod_client, user, moderator, submission):
+        auth_mod_client.patch(
+            f"/submissions/{submission.id}", json={"status": "confirmed"}
+        )
+
+        response = auth_mod_client.get(f"/users/{user.id}/rank")
+        assert response.status_code == 200
+        assert response.json["rank"] == 1
+
+        # users without any points are ranked after everyone with points
+        response = auth_mod_client.get(f"/users/{moderator.id}/rank")
+        assert response.json["points"] == 0
+        assert response.json["rank"] == 2
+
+    def test_get_user_rank_inadequate_access(self, auth_user_client, moderator):
+        response = auth_user_client.get(f"/users/{moderator.id}/rank")
+        assert response.status_code == 403
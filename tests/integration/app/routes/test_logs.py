@@ -1,5 +1,9 @@
+import time
+
 import pytest
 
+from app.archive import log_archive
+
 
 @pytest.mark.usefixtures("isolated_transactions")
 class TestLogs:
@@ -48,3 +52,212 @@ class TestLogs:
         auth_admin_client.delete(f"/submissions/{submission.id}")
         response = auth_admin_client.get("logs/actions")
         assert response.status_code == 200
+
+    def test_export_logs(self, auth_admin_client, bin_data):
+        auth_admin_client.post("/bins", json=bin_data)
+        auth_admin_client.post("/bins", json=bin_data)
+        response = auth_admin_client.get("/logs/actions/export")
+        assert response.status_code == 200
+        assert len(response.get_json()["user_action_logs"]) == 2
+
+    def test_get_logs_in_time_range(self, auth_admin_client, bin_data):
+        auth_admin_client.post("/bins", json=bin_data)
+        now = int(time.time())
+
+        response = auth_admin_client.get(f"/logs/actions?from={now - 60}")
+        assert len(response.get_json()["user_action_logs"]) == 1
+
+        response = auth_admin_client.get(f"/logs/actions?to={now - 60}")
+        assert response.get_json()["user_action_logs"] == []
+
+    def test_get_logs_of_resource(self, auth_admin_client, bin, bin_data):
+        auth_admin_client.post("/bins", json=bin_data)
+        auth_admin_client.patch(
+            f"/bins/{bin.id}", json={"description": "New description"}
+        )
+
+        response = auth_admin_client.get(
+            f"/logs/actions?resource_table=bins&resource_id={bin.id}"
+        )
+        logs = response.get_json()["user_action_logs"]
+        assert len(logs) == 1
+        assert logs[0]["action_type"] == "update"
+
+        response = auth_admin_client.get("/logs/actions?action_type=create")
+        assert len(response.get_json()["user_action_logs"]) == 1
+
+    def test_get_logs_of_user(self, auth_admin_client, admin, bin_data):
+        auth_admin_client.post("/bins", json=bin_data)
+        auth_admin_client.post("/bins", json=bin_data)
+
+        response = auth_admin_client.get(f"/logs/actions?user_id={admin.id}&limit=1")
+        assert len(response.get_json()["user_action_logs"]) == 1
+        cursor = response.get_json()["next_cursor"]
+
+        response = auth_admin_client.get(
+            f"/logs/actions?user_id={admin.id}&after={cursor}"
+        )
+        assert len(response.get_json()["user_action_logs"]) == 1
+        assert response.get_json()["next_cursor"] is None
+
+        response = auth_admin_client.get(f"/logs/actions?user_id={admin.id + 1}")
+        assert response.get_json()["user_action_logs"] == []
+
+    def test_update_log_has_changed_fields(self, auth_admin_client, bin):
+        description = bin.description
+        auth_admin_client.patch(
+            f"/bins/{bin.id}", json={"description": "New description"}
+        )
+        response = auth_admin_client.get(
+            f"/logs/actions?resource_table=bins&resource_id={bin.id}"
+        )
+        log = response.get_json()["user_action_logs"][0]
+        assert log["data_before"] == {"description": description}
+        assert log["data_after"] == {"description": "New description"}
+
+    def test_get_resource_versions(self, auth_admin_client, bin_data):
+        response = auth_admin_client.post("/bins", json=bin_data)
+        bin_id = response.get_json()["resource"]["id"]
+        auth_admin_client.patch(f"/bins/{bin_id}", json={"description": "First"})
+        auth_admin_client.patch(f"/bins/{bin_id}", json={"description": "Second"})
+        auth_admin_client.delete(f"/bins/{bin_id}")
+
+        logs = auth_admin_client.get(
+            f"/logs/actions?resource_table=bins&resource_id={bin_id}"
+        ).get_json()["user_action_logs"]
+        assert len(logs) == 4
+
+        response = auth_admin_client.get(
+            f"/logs/resources/bins/{bin_id}?log_id={logs[0]['id']}"
+        )
+        assert response.get_json()["resource"] == logs[0]["data_after"]
+
+        response = auth_admin_client.get(
+            f"/logs/resources/bins/{bin_id}?log_id={logs[2]['id']}"
+        )
+        assert response.get_json()["resource"] == {
+            **logs[0]["data_after"],
+            "description": "Second",
+        }
+
+        # deleted
+        response = auth_admin_client.get(f"/logs/resources/bins/{bin_id}")
+        assert response.get_json()["resource"] is None
+
+    def test_get_resource_version_not_found(self, auth_admin_client):
+        response = auth_admin_client.get("/logs/resources/bins/1")
+        assert response.status_code == 404
+
+    def test_get_logs_invalid_filter(self, auth_admin_client):
+        response = auth_admin_client.get("/logs/actions?action_type=archive")
+        assert response.status_code == 400
+
+    def test_get_logs_invalid_time_range(self, auth_admin_client):
+        response = auth_admin_client.get("/logs/actions?from=20&to=10")
+        assert response.status_code == 400
+
+    def test_get_logs_time_out_of_range(self, auth_admin_client):
+        response = auth_admin_client.get("/logs/actions?to=253402214400")
+        assert response.status_code == 200
+
+        response = auth_admin_client.get(f"/logs/actions?to={10**20}")
+        assert response.status_code == 400
+
+    def test_get_archived_logs(
+        self, app, auth_admin_client, bin, log_archive_directory, old_logs
+    ):
+        old_log_ids = [log.id for log in old_logs]
+        auth_admin_client.patch(
+            f"/bins/{bin.id}", json={"description": "New description"}
+        )
+
+        result = app.test_cli_runner().invoke(args=["logs", "archive"])
+        assert "2 log(s) archived" in result.output
+        assert len(list(log_archive_directory.glob("*/*/*.jsonl.gz"))) == 2
+
+        # archived logs are no longer in the table
+        logs = auth_admin_client.get("/logs/actions").get_json()["user_action_logs"]
+        assert [log["id"] for log in logs if log["id"] in old_log_ids] == []
+
+        # but are returned for a time range that reaches past the retention period
+        start = old_logs[0].timestamp.timestamp() - 60
+        ids = []
+        cursor = None
+        while True:
+            query = f"/logs/actions?from={int(start)}&limit=1"
+            if cursor is not None:
+                query += f"&after={cursor}"
+            response = auth_admin_client.get(query).get_json()
+            ids.extend(log["id"] for log in response["user_action_logs"])
+            cursor = response["next_cursor"]
+            if cursor is None:
+                break
+
+        assert ids[:2] == old_log_ids
+        assert len(ids) == 3
+
+        end = old_logs[0].timestamp.timestamp()
+        response = auth_admin_client.get(
+            f"/logs/actions?from={int(start)}&to={int(end)}"
+        )
+        assert [log["id"] for log in response.get_json()["user_action_logs"]] == [
+            old_log_ids[0]
+        ]
+
+    def test_get_archived_logs_of_resource(
+        self, app, auth_admin_client, bin, log_archive_directory, old_logs
+    ):
+        app.test_cli_runner().invoke(args=["logs", "archive"])
+
+        start = int(old_logs[0].timestamp.timestamp()) - 60
+        response = auth_admin_client.get(
+            f"/logs/actions?from={start}&resource_table=bins&resource_id={bin.id}"
+        )
+        assert len(response.get_json()["user_action_logs"]) == 2
+
+        response = auth_admin_client.get(
+            f"/logs/actions?from={start}&resource_table=rewards"
+        )
+        assert response.get_json()["user_action_logs"] == []
+
+    def test_get_archived_resource_version(
+        self, app, monkeypatch, auth_admin_client, bin, log_archive_directory, old_logs
+    ):
+        app.test_cli_runner().invoke(args=["logs", "archive"])
+
+        read_days = []
+        read_segment = log_archive._read_segment
+
+        def read_segment_spy(day):
+            read_days.append(day)
+            return read_segment(day)
+
+        monkeypatch.setattr(log_archive, "_read_segment", read_segment_spy)
+
+        # segments without logs of the resource are skipped
+        response = auth_admin_client.get(f"/logs/resources/bins/{bin.id + 1}")
+        assert response.status_code == 404
+        assert read_days == []
+
+        at = int(old_logs[0].timestamp.timestamp())
+        response = auth_admin_client.get(f"/logs/resources/bins/{bin.id}?at={at}")
+        assert response.get_json()["resource"] == old_logs[0].data_after
+        assert read_days == [old_logs[0].timestamp.date()]
+
+        response = auth_admin_client.get(f"/logs/resources/bins/{bin.id}?at={10**20}")
+        assert response.status_code == 400
+
+    def test_archive_logs_twice(self, app, log_archive_directory, old_logs):
+        runner = app.test_cli_runner()
+        runner.invoke(args=["logs", "archive"])
+        result = runner.invoke(args=["logs", "archive"])
+        assert "0 log(s) archived" in result.output
+
+    def test_get_log_writer_stats(self, auth_admin_client):
+        response = auth_admin_client.get("/logs/writer")
+        assert response.status_code == 200
+        assert response.get_json()["queue_depth"] == 0
+
+    def test_get_log_writer_stats_inadequate_access(self, auth_mod_client):
+        response = auth_mod_client.get("/logs/writer")
+        assert response.status_code == 403
@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.metrics import metrics
+
+OTHER_SNAPSHOT = (
+    '{"counters": [["http_requests_total", {"blueprint": "other", '
+    '"endpoint": "other.test", "method": "GET", "status": "200"}, 3]], '
+    '"histograms": []}'
+)
+OTHER_REQUESTS = 'http_requests_total{blueprint="other",endpoint="other.test",method="GET",status="200"}'
+
+
+@pytest.mark.usefixtures("isolated_transactions")
+class TestMetrics:
+    def test_get_metrics(self, client, bin):
+        client.get("/bins")
+        client.get("/bins")
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+
+        text = response.get_data(as_text=True)
+        assert (
+            'http_requests_total{blueprint="bins",endpoint="bins.get_bin_all",method="GET",status="200"}'
+            in text
+        )
+        assert (
+            'http_request_duration_seconds_bucket{endpoint="bins.get_bin_all",le="+Inf"}'
+            in text
+        )
+        assert 'db_query_duration_seconds_count{endpoint="bins.get_bin_all"}' in text
+        assert 'cache_hits_total{cache="catalog_response"}' in text
+
+    def test_get_metrics_added_up_across_processes(self, client):
+        client.get("/metrics")
+        # another worker's metrics
+        snapshot_path = metrics.directory.joinpath(f"{os.getppid()}-other.json")
+        snapshot_path.write_text(OTHER_SNAPSHOT)
+
+        text = client.get("/metrics").get_data(as_text=True)
+        snapshot_path.unlink()
+        assert f"{OTHER_REQUESTS} 3" in text
+
+    def test_get_metrics_of_exited_process(self, client):
+        exited_pid = subprocess.run(
+            [sys.executable, "-c", "import os; print(os.getpid())"],
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        snapshot_path = metrics.directory.joinpath(f"{exited_pid}-exited.json")
+        snapshot_path.write_text(OTHER_SNAPSHOT)
+        exited_path = metrics.directory.joinpath("exited.json")
+
+        # the exited process's totals are kept, but its file is not
+        for _ in range(2):
+            text = client.get("/metrics").get_data(as_text=True)
+            assert f"{OTHER_REQUESTS} 3" in text
+        assert not snapshot_path.exists()
+
+        # processes that exit later are added to them
+        snapshot_path.write_text(OTHER_SNAPSHOT)
+        text = client.get("/metrics").get_data(as_text=True)
+        exited_path.unlink()
+        assert f"{OTHER_REQUESTS} 6" in text
+
+    def test_get_metrics_with_token(self, app, client, monkeypatch):
+        monkeypatch.setitem(app.config, "METRICS_TOKEN", "secret")
+
+        response = client.get("/metrics")
+        assert response.status_code == 403
+
+        response = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+        assert response.status_code == 200
+
+    def test_get_metrics_without_token_outside_development(
+        self, app, client, monkeypatch
+    ):
+        monkeypatch.setitem(app.config, "TESTING", False)
+
+        response = client.get("/metrics")
+        assert response.status_code == 403
@@ -11,6 +11,13 @@ class TestMotivations:
         response = auth_mod_client.get(f"/motivations/{motivation.user_id}")
         assert response.status_code == 200
 
+    def test_get_motivation_logs_read(self, auth_admin_client, motivation):
+        auth_admin_client.get(f"/motivations/{motivation.user_id}")
+        response = auth_admin_client.get(
+            f"/logs/actions?action_type=read&resource_id={motivation.user_id}"
+        )
+        assert len(response.get_json()["user_action_logs"]) == 1
+
     def test_get_motivation_all(self, auth_mod_client, motivation):
         response = auth_mod_client.get("/motivations")
         assert response.status_code == 200
@@ -4,11 +4,27 @@ import pytest
 @pytest.mark.usefixtures("isolated_transactions")
 class Testpurchases:
     def test_create_purchase_with_submission(
-        self, auth_user_client, submission, purchase_data
+        self, auth_user_client, confirmed_submission, purchase_data
     ):
         response = auth_user_client.post("/purchases", json=purchase_data)
         assert response.status_code == 201
 
+    # points from submissions that are yet to be confirmed cannot be spent
+    def test_create_purchase_unconfirmed_submission(
+        self, auth_user_client, submission, purchase_data
+    ):
+        response = auth_user_client.post("/purchases", json=purchase_data)
+        assert response.status_code == 403
+
+    def test_create_purchase_deducts_balance(
+        self, auth_user_client, user, confirmed_submission, purchase_data, reward
+    ):
+        response = auth_user_client.get(f"/users/{user.id}/balance")
+        balance = response.get_json()["points_balance"]
+        auth_user_client.post("/purchases", json=purchase_data)
+        response = auth_user_client.get(f"/users/{user.id}/balance")
+        assert response.get_json()["points_balance"] == balance - reward.price
+
     # client has no points
     def test_create_purchase_no_submission(self, auth_user_client, purchase_data):
         response = auth_user_client.post("/purchases", json=purchase_data)
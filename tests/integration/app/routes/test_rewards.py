@@ -14,7 +14,8 @@ class TestRewards:
             response = auth_admin_client.post(
                 f"/rewards/{reward.id}/image", data={"image": image_file}
             )
-        assert response.status_code == 200
+        assert response.status_code == 202
+        assert response.get_json()["status"] == "done"
 
     def test_upload_reward_image_inadequate_access(
         self, auth_mod_client, reward, reward_image_file_path
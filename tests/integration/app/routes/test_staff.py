@@ -1,3 +1,4 @@
+from flask_jwt_extended import create_access_token
 import pytest
 
 
@@ -58,3 +59,18 @@ class TestStaff:
     def test_delete_staff_inadequate_access(self, auth_mod_client, staff):
         response = auth_mod_client.delete(f"/staff/{staff.user_id}")
         assert response.status_code == 403
+
+    def test_delete_staff_revokes_access(self, auth_admin_client, user, staff):
+        user_headers = {"Authorization": f"Bearer {create_access_token(identity=user)}"}
+        response = auth_admin_client.get("/logs/actions", headers=user_headers)
+        assert response.status_code == 200
+
+        auth_admin_client.delete(f"/staff/{user.id}")
+
+        # token claiming the admin role is revoked
+        response = auth_admin_client.get("/logs/actions", headers=user_headers)
+        assert response.status_code == 401
+
+        user_headers = {"Authorization": f"Bearer {create_access_token(identity=user)}"}
+        response = auth_admin_client.get("/logs/actions", headers=user_headers)
+        assert response.status_code == 403
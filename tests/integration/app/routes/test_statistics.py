@@ -1,3 +1,5 @@
+from datetime import date, timedelta
+
 import pytest
 
 
@@ -10,3 +12,118 @@ class TestStatistics:
     def test_get_total_submissions_no_entries(self, unauth_client):
         response = unauth_client.get("/statistics")
         assert response.status_code == 200
+
+    def test_get_statistics_after_submission(
+        self, auth_user_client, bin, recyclable, submission_post_data
+    ):
+        auth_user_client.post("/submissions", json=submission_post_data)
+
+        statistics = auth_user_client.get("/statistics").json
+        assert statistics["total_submissions"] == 1
+        assert statistics["submissions_by_status"]["not_confirmed"] == 1
+        assert statistics["submissions_by_bin"] == {str(bin.id): 1}
+        assert statistics["submissions_by_recyclable"] == {str(recyclable.id): 1}
+        assert statistics["total_recycled_weight"] == 0
+
+    def test_get_statistics_after_moderation(
+        self, auth_admin_client, recyclable, submission_post_data
+    ):
+        response = auth_admin_client.post("/submissions", json=submission_post_data)
+        submission_id = response.json["resource"]["id"]
+        auth_admin_client.patch(
+            f"/submissions/{submission_id}", json={"status": "confirmed"}
+        )
+
+        statistics = auth_admin_client.get("/statistics").json
+        assert statistics["total_submissions"] == 1
+        assert statistics["submissions_by_status"]["not_confirmed"] == 0
+        assert statistics["submissions_by_status"]["confirmed"] == 1
+        assert statistics["total_recycled_weight"] == recyclable.weight
+        assert statistics["total_points_issued"] == recyclable.points_value
+
+        auth_admin_client.delete(f"/submissions/{submission_id}")
+
+        statistics = auth_admin_client.get("/statistics").json
+        assert statistics["total_submissions"] == 0
+        assert statistics["total_recycled_weight"] == 0
+        assert statistics["total_points_issued"] == 0
+
+    def test_get_statistics_after_weight_edited(
+        self, auth_admin_client, recyclable, submission_post_data
+    ):
+        response = auth_admin_client.post("/submissions", json=submission_post_data)
+        submission_id = response.json["resource"]["id"]
+        auth_admin_client.patch(
+            f"/submissions/{submission_id}", json={"status": "confirmed"}
+        )
+
+        # the weight credited when the submission was confirmed is taken off again
+        auth_admin_client.patch(
+            f"/recyclables/{recyclable.id}", json={"weight": recyclable.weight + 1}
+        )
+        auth_admin_client.patch(
+            f"/submissions/{submission_id}", json={"status": "denied"}
+        )
+
+        statistics = auth_admin_client.get("/statistics").json
+        assert statistics["total_recycled_weight"] == 0
+
+    def test_get_statistics_timeseries(
+        self, auth_admin_client, bin, recyclable, submission_post_data
+    ):
+        response = auth_admin_client.post("/submissions", json=submission_post_data)
+        submission_id = response.json["resource"]["id"]
+        auth_admin_client.patch(
+            f"/submissions/{submission_id}", json={"status": "confirmed"}
+        )
+
+        response = auth_admin_client.get("/statistics/timeseries?group_by=bin")
+        assert response.status_code == 200
+        assert response.json["series"] == [
+            {
+                "start": date.today().isoformat(),
+                "group": bin.id,
+                "submissions": 1,
+                "weight": recyclable.weight,
+            }
+        ]
+
+    def test_get_statistics_timeseries_after_organisation_edited(
+        self, auth_admin_client, user, submission_post_data
+    ):
+        response = auth_admin_client.post("/submissions", json=submission_post_data)
+        submission_id = response.json["resource"]["id"]
+        auth_admin_client.patch(
+            f"/submissions/{submission_id}", json={"status": "confirmed"}
+        )
+
+        # the submission is taken off the organisation it was added to
+        auth_admin_client.patch(f"/users/{user.id}", json={"organisation": "Elsewhere"})
+        auth_admin_client.patch(
+            f"/submissions/{submission_id}", json={"status": "denied"}
+        )
+
+        response = auth_admin_client.get("/statistics/timeseries?group_by=organisation")
+        assert all(entry["submissions"] == 0 for entry in response.json["series"])
+
+    def test_get_statistics_timeseries_month(
+        self, auth_admin_client, recyclable, submission_post_data
+    ):
+        for _ in range(2):
+            response = auth_admin_client.post("/submissions", json=submission_post_data)
+            auth_admin_client.patch(
+                f"/submissions/{response.json['resource']['id']}",
+                json={"status": "confirmed"},
+            )
+
+        response = auth_admin_client.get("/statistics/timeseries?bucket=month")
+        series = response.json["series"]
+        assert series[-1]["start"] == date.today().replace(day=1).isoformat()
+        assert series[-1]["submissions"] == 2
+
+    def test_get_statistics_timeseries_invalid_period(self, unauth_client):
+        today = date.today()
+        response = unauth_client.get(
+            f"/statistics/timeseries?from={today}&to={today - timedelta(days=1)}"
+        )
+        assert response.status_code == 400
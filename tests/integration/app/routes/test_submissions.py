@@ -1,4 +1,14 @@
+from datetime import datetime, timedelta
+import io
+
+from flask_jwt_extended import create_access_token
 import pytest
+from sqlalchemy import update
+
+from app.config import AppConfig
+from app.ledger import points_ledger
+from app.models import Submission
+from app.routes import db_controller
 
 
 @pytest.mark.usefixtures("isolated_transactions")
@@ -7,6 +17,21 @@ class TestSubmissions:
         response = auth_user_client.post("/submissions", json=submission_post_data)
         assert response.status_code == 201
 
+    def test_create_submission_whitelisted(
+        self, auth_user_client, bin_with_whitelist, submission_post_data
+    ):
+        submission_post_data["bin_id"] = bin_with_whitelist.id
+        response = auth_user_client.post("/submissions", json=submission_post_data)
+        assert response.status_code == 201
+
+    def test_create_submission_not_whitelisted(
+        self, auth_user_client, bin_with_whitelist, submission_post_data
+    ):
+        submission_post_data["bin_id"] = bin_with_whitelist.id
+        submission_post_data["recyclable_id"] += 1
+        response = auth_user_client.post("/submissions", json=submission_post_data)
+        assert response.status_code == 403
+
     def test_create_submission_too_far(self, auth_user_client, submission_post_data):
         submission_post_data["latitude"] += 10
         submission_post_data["longitude"] += 10
@@ -20,6 +45,109 @@ class TestSubmissions:
         response = auth_user_client.post("/submissions", json=submission_post_data)
         assert response.status_code == 403
 
+    @pytest.mark.parametrize("size", [3, AppConfig.MAX_SUBMISSION_BATCH])
+    def test_create_submission_batch(
+        self, auth_user_client, submission_post_data, size
+    ):
+        response = auth_user_client.post(
+            "/submissions/batch", json={"submissions": [submission_post_data] * size}
+        )
+        assert response.status_code == 201
+        assert len(response.json["results"]) == size
+        assert all("resource" in result for result in response.json["results"])
+
+    def test_create_submission_batch_partially_invalid(
+        self, auth_user_client, submission_post_data
+    ):
+        too_far_data = dict(submission_post_data, latitude=50.0)
+        invalid_data = dict(submission_post_data, bin_id="bin")
+        response = auth_user_client.post(
+            "/submissions/batch",
+            json={"submissions": [submission_post_data, too_far_data, invalid_data]},
+        )
+        assert response.status_code == 201
+
+        results = response.json["results"]
+        assert "resource" in results[0]
+        assert results[1]["error"] == "Not within sufficient distance of specified bin"
+        assert results[2]["error"] == "Invalid data"
+
+    def test_create_submission_batch_unknown_ids(
+        self, auth_admin_client, submission_post_data
+    ):
+        unknown_user_data = dict(
+            submission_post_data, user_id=submission_post_data["user_id"] + 1000
+        )
+        unknown_recyclable_data = dict(
+            submission_post_data,
+            recyclable_id=submission_post_data["recyclable_id"] + 1000,
+        )
+        response = auth_admin_client.post(
+            "/submissions/batch",
+            json={
+                "submissions": [
+                    submission_post_data,
+                    unknown_user_data,
+                    unknown_recyclable_data,
+                ]
+            },
+        )
+        assert response.status_code == 201
+
+        results = response.json["results"]
+        assert "resource" in results[0]
+        assert results[1]["error"] == "User not found"
+        assert results[2]["error"] == "Recyclable not found"
+
+    def test_create_submission_batch_too_large(
+        self, auth_user_client, submission_post_data
+    ):
+        response = auth_user_client.post(
+            "/submissions/batch",
+            json={
+                "submissions": [submission_post_data]
+                * (AppConfig.MAX_SUBMISSION_BATCH + 1)
+            },
+        )
+        assert response.status_code == 400
+
+    def test_create_submission_batch_other_user(
+        self, auth_user_client, submission_post_data
+    ):
+        submission_post_data["user_id"] += 1
+        response = auth_user_client.post(
+            "/submissions/batch", json={"submissions": [submission_post_data]}
+        )
+        assert response.status_code == 400
+        assert response.json["results"][0]["error"] == "Unauthorised access"
+
+    def test_upload_submission_image(
+        self, auth_user_client, submission, submission_image_file_path
+    ):
+        with open(submission_image_file_path, "rb") as image_file:
+            response = auth_user_client.post(
+                f"/submissions/{submission.id}/image", data={"image": image_file}
+            )
+        assert response.status_code == 202
+
+        response = auth_user_client.get(f"/images/jobs/{response.get_json()['job_id']}")
+        assert response.status_code == 200
+        assert response.get_json()["status"] == "done"
+
+    def test_upload_submission_image_unidentified(self, auth_user_client, submission):
+        response = auth_user_client.post(
+            f"/submissions/{submission.id}/image",
+            data={"image": (io.BytesIO(b"not an image"), "image.jpg")},
+        )
+        assert response.status_code == 202
+
+        response = auth_user_client.get(f"/images/jobs/{response.get_json()['job_id']}")
+        assert response.get_json()["status"] == "failed"
+
+    def test_get_image_job_not_found(self, auth_user_client):
+        response = auth_user_client.get("/images/jobs/not-a-job")
+        assert response.status_code == 404
+
     def test_get_submission(self, auth_mod_client, submission):
         response = auth_mod_client.get(f"/submissions/{submission.id}")
         assert response.status_code == 200
@@ -28,6 +156,39 @@ class TestSubmissions:
         response = auth_mod_client.get("/submissions")
         assert response.status_code == 200
 
+    def test_get_submission_all_paginated(
+        self, db, auth_mod_client, submission, submission_data
+    ):
+        db.session.add(Submission(**submission_data))
+        db.session.commit()
+
+        response = auth_mod_client.get("/submissions?limit=1")
+        first_page = response.get_json()
+        assert len(first_page["submissions"]) == 1
+        assert first_page["next_cursor"] == first_page["submissions"][0]["id"]
+
+        response = auth_mod_client.get(
+            f"/submissions?limit=1&after={first_page['next_cursor']}"
+        )
+        second_page = response.get_json()
+        assert len(second_page["submissions"]) == 1
+        assert second_page["submissions"][0]["id"] > first_page["next_cursor"]
+
+    def test_get_submission_all_invalid_limit(self, auth_mod_client, submission):
+        response = auth_mod_client.get("/submissions?limit=0")
+        assert response.status_code == 400
+
+    def test_export_submission_all(self, auth_mod_client, submission):
+        response = auth_mod_client.get("/submissions/export")
+        assert response.status_code == 200
+        assert response.get_json()["submissions"][0]["id"] == submission.id
+
+    def test_export_submission_all_inadequate_access(
+        self, auth_user_client, submission
+    ):
+        response = auth_user_client.get("/submissions/export")
+        assert response.status_code == 403
+
     def test_update_submission(self, auth_mod_client, submission):
         update_submission_data = {"status": "confirmed"}
         response = auth_mod_client.patch(
@@ -49,6 +210,188 @@ class TestSubmissions:
         )
         assert response.status_code == 400
 
+    def test_update_submission_bulk(
+        self, auth_mod_client, db, user, recyclable, submission_data
+    ):
+        submissions = [Submission(**submission_data) for _ in range(3)]
+        db.session.add_all(submissions)
+        db.session.commit()
+
+        response = auth_mod_client.patch(
+            "/submissions/bulk",
+            json={
+                "ids": [submission.id for submission in submissions],
+                "status": "confirmed",
+            },
+        )
+        assert response.status_code == 200
+        assert len(response.json["updated"]) == 3
+
+        response = auth_mod_client.get(f"/users/{user.id}/balance")
+        assert response.json["points_balance"] == 3 * recyclable.points_value
+
+    def test_update_submission_bulk_filter(
+        self, auth_mod_client, db, user, recyclable, submission_data
+    ):
+        db.session.add_all([Submission(**submission_data) for _ in range(3)])
+        db.session.add(Submission(**dict(submission_data, status="denied")))
+        db.session.commit()
+
+        response = auth_mod_client.patch(
+            "/submissions/bulk",
+            json={
+                "filter": {"status": "not_confirmed"},
+                "status": "confirmed",
+                "limit": 2,
+            },
+        )
+        assert response.status_code == 200
+        assert len(response.json["updated"]) == 2
+
+        # confirmed submissions no longer match the filter
+        response = auth_mod_client.patch(
+            "/submissions/bulk",
+            json={"filter": {"status": "not_confirmed"}, "status": "confirmed"},
+        )
+        assert len(response.json["updated"]) == 1
+
+        response = auth_mod_client.get(f"/users/{user.id}/balance")
+        assert response.json["points_balance"] == 3 * recyclable.points_value
+
+    def test_update_submission_bulk_filter_rechecked(
+        self, auth_mod_client, db, monkeypatch, submission_data
+    ):
+        submissions = [Submission(**submission_data) for _ in range(2)]
+        db.session.add_all(submissions)
+        db.session.commit()
+
+        # another request denies a submission after the ids were selected
+        get_ids_matching = db_controller.get_ids_matching
+
+        def get_ids_matching_then_deny(*args, **kwargs):
+            ids = get_ids_matching(*args, **kwargs)
+            db.session.execute(
+                update(Submission)
+                .where(Submission.id == submissions[0].id)
+                .values(status="denied")
+            )
+            return ids
+
+        monkeypatch.setattr(
+            db_controller, "get_ids_matching", get_ids_matching_then_deny
+        )
+
+        response = auth_mod_client.patch(
+            "/submissions/bulk",
+            json={"filter": {"status": "not_confirmed"}, "status": "confirmed"},
+        )
+        assert response.json["updated"] == [submissions[1].id]
+
+    def test_update_submission_bulk_reverses_points(
+        self, auth_mod_client, user, confirmed_submission
+    ):
+        response = auth_mod_client.patch(
+            "/submissions/bulk",
+            json={"ids": [confirmed_submission.id], "status": "denied"},
+        )
+        assert response.json["updated"] == [confirmed_submission.id]
+
+        response = auth_mod_client.get(f"/users/{user.id}/balance")
+        assert response.json["points_balance"] == 0
+        assert points_ledger.verify() == []
+
+    def test_update_submission_bulk_invalid_data(self, auth_mod_client, submission):
+        response = auth_mod_client.patch(
+            "/submissions/bulk", json={"status": "confirmed"}
+        )
+        assert response.status_code == 400
+
+    def test_update_submission_bulk_inadequate_access(
+        self, auth_user_client, submission
+    ):
+        response = auth_user_client.patch(
+            "/submissions/bulk", json={"ids": [submission.id], "status": "confirmed"}
+        )
+        assert response.status_code == 403
+
+    def test_get_moderation_queue(self, auth_mod_client, db, submission_data):
+        db.session.add_all([Submission(**submission_data) for _ in range(3)])
+        db.session.add(Submission(**dict(submission_data, status="denied")))
+        db.session.commit()
+
+        response = auth_mod_client.get("/submissions/queue?limit=2")
+        assert response.status_code == 200
+
+        ids = [submission["id"] for submission in response.json["submissions"]]
+        assert len(ids) == 2
+        assert ids == sorted(ids)
+
+    def test_get_moderation_queue_of_statuses(
+        self, auth_mod_client, db, submission_data
+    ):
+        created_at = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+        submissions = [
+            Submission(
+                **dict(submission_data, status=status),
+                created_at=created_at + timedelta(minutes=minutes),
+            )
+            for status, minutes in [
+                ("moderator_required", 0),
+                ("not_confirmed", 1),
+                ("moderator_required", 2),
+            ]
+        ]
+        db.session.add_all(submissions)
+        db.session.commit()
+
+        # submissions of either status are taken oldest first
+        response = auth_mod_client.post("/submissions/queue/claim", json={"limit": 2})
+        assert [item["id"] for item in response.json["submissions"]] == [
+            submissions[0].id,
+            submissions[1].id,
+        ]
+
+    def test_claim_moderation_queue(self, auth_mod_client, admin, db, submission_data):
+        db.session.add_all([Submission(**submission_data) for _ in range(3)])
+        db.session.commit()
+
+        response = auth_mod_client.post("/submissions/queue/claim", json={"limit": 2})
+        assert response.status_code == 200
+        claimed_ids = {submission["id"] for submission in response.json["submissions"]}
+        assert len(claimed_ids) == 2
+
+        # another moderator is only given the submission that has not been claimed
+        admin_headers = {
+            "Authorization": f"Bearer {create_access_token(identity=admin)}"
+        }
+        response = auth_mod_client.post(
+            "/submissions/queue/claim", json={"limit": 2}, headers=admin_headers
+        )
+        other_ids = {submission["id"] for submission in response.json["submissions"]}
+        assert len(other_ids) == 1
+        assert not claimed_ids & other_ids
+
+        response = auth_mod_client.get("/submissions/queue")
+        assert response.json["submissions"] == []
+
+    def test_claim_moderation_queue_expired(self, auth_mod_client, db, submission_data):
+        submission = Submission(
+            **submission_data,
+            claimed_by=0,
+            claim_expires_at=datetime.now() - timedelta(seconds=1),
+        )
+        db.session.add(submission)
+        db.session.commit()
+
+        response = auth_mod_client.post("/submissions/queue/claim")
+        assert [item["id"] for item in response.json["submissions"]] == [submission.id]
+
+    def test_claim_moderation_queue_inadequate_access(
+        self, auth_user_client, submission
+    ):
+        response = auth_user_client.post("/submissions/queue/claim")
+        assert response.status_code == 403
+
     def test_delete_submission(self, auth_mod_client, submission):
         response = auth_mod_client.delete(f"/submissions/{submission.id}")
         assert response.status_code == 200
@@ -1,5 +1,8 @@
+from flask_jwt_extended import create_access_token
 import pytest
 
+from app.audit import read_auditor
+
 
 @pytest.mark.usefixtures("isolated_transactions")
 class TestUsers:
@@ -51,6 +54,24 @@ class TestUsers:
         response = auth_user_client.get(f"/users/{user.id}/submissions")
         assert response.status_code == 200
 
+    def test_get_user_logs_read(self, auth_admin_client, user):
+        auth_admin_client.get(f"/users/{user.id}")
+        auth_admin_client.get(f"/users/{user.id}")  # coalesced with the first read
+        auth_admin_client.get(f"/users/{user.id}/submissions")
+
+        response = auth_admin_client.get(
+            f"/logs/actions?action_type=read&resource_id={user.id}"
+        )
+        logs = response.get_json()["user_action_logs"]
+        assert [log["data_after"]["table"] for log in logs] == ["users", "submissions"]
+
+    def test_get_user_read_not_sampled(self, auth_admin_client, user, monkeypatch):
+        monkeypatch.setattr(read_auditor, "sample_rates", {"users": 0})
+        auth_admin_client.get(f"/users/{user.id}")
+
+        response = auth_admin_client.get("/logs/actions?action_type=read")
+        assert response.get_json()["user_action_logs"] == []
+
     def test_get_user_purchases(self, auth_user_client, user, purchase):
         response = auth_user_client.get(f"/users/{user.id}/purchases")
         assert response.status_code == 200
@@ -59,6 +80,27 @@ class TestUsers:
         response = auth_user_client.get(f"/users/{user.id}/balance")
         assert response.status_code == 200
 
+    def test_get_user_balance_confirmed_submission(
+        self, auth_user_client, user, confirmed_submission, recyclable
+    ):
+        response = auth_user_client.get(f"/users/{user.id}/balance")
+        assert response.get_json()["points_balance"] == recyclable.points_value
+
+    def test_get_user_balance_after_moderation(
+        self, auth_mod_client, user, submission, recyclable
+    ):
+        auth_mod_client.patch(
+            f"/submissions/{submission.id}", json={"status": "confirmed"}
+        )
+        response = auth_mod_client.get(f"/users/{user.id}/balance")
+        assert response.get_json()["points_balance"] == recyclable.points_value
+
+        auth_mod_client.patch(
+            f"/submissions/{submission.id}", json={"status": "denied"}
+        )
+        response = auth_mod_client.get(f"/users/{user.id}/balance")
+        assert response.get_json()["points_balance"] == 0
+
     def test_update_user(self, auth_user_client, user):
         update_data = {"email": "users-new-email@mail.com"}
         response = auth_user_client.patch(f"/users/{user.id}", json=update_data)
@@ -81,6 +123,21 @@ class TestUsers:
         response = auth_mod_client.post(f"/users/{moderator.id}/freeze")
         assert response.status_code == 403
 
+    def test_freeze_user_revokes_token(self, auth_mod_client, user):
+        user_headers = {"Authorization": f"Bearer {create_access_token(identity=user)}"}
+        auth_mod_client.post(f"/users/{user.id}/freeze")
+        response = auth_mod_client.get(f"/users/{user.id}", headers=user_headers)
+        assert response.status_code == 401
+
+    def test_frozen_user_token(self, db, auth_mod_client, user, submission_post_data):
+        auth_mod_client.post(f"/users/{user.id}/freeze")
+        db.session.refresh(user)
+        user_headers = {"Authorization": f"Bearer {create_access_token(identity=user)}"}
+        response = auth_mod_client.post(
+            "/submissions", json=submission_post_data, headers=user_headers
+        )
+        assert response.status_code == 403
+
     def test_unfreeze_user(self, auth_mod_client, user):
         response = auth_mod_client.post(f"/users/{user.id}/unfreeze")
         assert response.status_code == 200
@@ -0,0 +1,47 @@
+import pytest
+
+
+@pytest.mark.usefixtures("isolated_transactions")
+class TestLedgerCommands:
+    def test_verify_ledger(self, app, confirmed_submission, purchase):
+        result = app.test_cli_runner().invoke(args=["ledger", "verify"])
+        assert result.exit_code == 1  # purchase fixture bypasses the ledger
+
+    def test_rebuild_ledger(
+        self, app, db, user, recyclable, reward, confirmed_submission, purchase
+    ):
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=["ledger", "rebuild"])
+        assert result.exit_code == 0
+
+        db.session.refresh(user)
+        assert user.points_balance == recyclable.points_value - reward.price
+
+        result = runner.invoke(args=["ledger", "verify"])
+        assert result.exit_code == 0
+
+
+@pytest.mark.usefixtures("isolated_transactions")
+class TestDatabaseCommands:
+    def test_upgrade_database(self, app):
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=["db", "upgrade"])
+        assert result.exit_code == 0
+
+        result = runner.invoke(args=["db", "status"])
+        assert "pending" not in result.output
+
+        # migrations that have been applied are not applied again
+        result = runner.invoke(args=["db", "upgrade"])
+        assert "Applying" not in result.output
+
+
+@pytest.mark.usefixtures("isolated_transactions")
+class TestStatisticsCommands:
+    def test_rebuild_statistics(self, app, db, submission, confirmed_submission):
+        result = app.test_cli_runner().invoke(args=["statistics", "rebuild"])
+        assert result.exit_code == 0
+
+        statistics = app.test_client().get("/statistics").json
+        assert statistics["total_submissions"] == 2
+        assert statistics["submissions_by_status"]["confirmed"] == 1
@@ -0,0 +1,82 @@
+import pytest
+
+
+# the hot queries behind these endpoints should not read whole tables
+@pytest.mark.usefixtures("isolated_transactions")
+class TestQueryPlans:
+    def test_get_user_submissions(
+        self, auth_user_client, user, submission, query_plans
+    ):
+        with query_plans.capture():
+            auth_user_client.get(f"/users/{user.id}/submissions")
+        assert query_plans.full_scans() == []
+
+    def test_get_user_purchases(self, auth_user_client, user, purchase, query_plans):
+        with query_plans.capture():
+            auth_user_client.get(f"/users/{user.id}/purchases")
+        assert query_plans.full_scans() == []
+
+    def test_get_user_balance(self, auth_user_client, user, query_plans):
+        with query_plans.capture():
+            auth_user_client.get(f"/users/{user.id}/balance")
+        assert query_plans.full_scans() == []
+
+    def test_get_moderation_queue(self, auth_mod_client, submission, query_plans):
+        with query_plans.capture():
+            auth_mod_client.get("/submissions/queue?status=not_confirmed")
+        assert query_plans.full_scans() == []
+
+    def test_update_submission(
+        self, auth_mod_client, confirmed_submission, query_plans
+    ):
+        with query_plans.capture():
+            auth_mod_client.patch(
+                f"/submissions/{confirmed_submission.id}", json={"status": "denied"}
+            )
+        assert query_plans.full_scans() == []
+
+    def test_get_logs_of_resource(self, auth_admin_client, bin, query_plans):
+        with query_plans.capture():
+            auth_admin_client.get(
+                f"/logs/actions?resource_table=bins&resource_id={bin.id}"
+            )
+        assert query_plans.full_scans() == []
+
+    def test_get_logs_of_user(self, auth_admin_client, admin, query_plans):
+        with query_plans.capture():
+            auth_admin_client.get(f"/logs/actions?user_id={admin.id}")
+        assert query_plans.full_scans() == []
+
+
+@pytest.mark.usefixtures("isolated_transactions")
+class TestQueryCounter:
+    def test_counts_statements_per_request(self, client, bin, query_counter):
+        with query_counter.capture():
+            client.get(f"/bins/{bin.id}")
+            client.get("/bins")
+
+        assert [endpoint for endpoint, _, _ in query_counter.requests] == [
+            "bins.get_bin",
+            "bins.get_bin_all",
+        ]
+        assert query_counter.violations() == []
+        assert query_counter.violations(budget=0) != []
+
+    def test_detects_repeated_statements(self, query_counter):
+        statement = "SELECT recyclables.* FROM recyclables WHERE recyclables.id = ?"
+        query_counter.requests.append(
+            ("bins.get_bin_whitelist", None, [(statement, (id,)) for id in range(3)])
+        )
+        assert len(query_counter.violations()) == 1
+
+    def test_budgets_batches_by_item_count(self, query_counter):
+        statements = [(f"SELECT {index}", ()) for index in range(15)]
+        for size in (3, 50):
+            query_counter.requests.append(
+                (
+                    "submissions.create_submission_batch",
+                    {"submissions": [{}] * size},
+                    statements,
+                )
+            )
+        assert len(query_counter.violations()) == 1
@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from app.audit import AuditLogWriter
+
+
+class RecordingWriter(AuditLogWriter):
+    # records the batches instead of writing them to the database
+    def __init__(self, queue_size: int = 100, batch_size: int = 500):
+        super().__init__()
+        self.enabled = True
+        self.batch_size = batch_size
+        self.flush_interval = 0.05
+        self.put_timeout = 0.05
+        self._queue = queue.Queue(maxsize=queue_size)
+
+        self.batches: list[tuple[str, list[dict]]] = []
+        # batches written by the writer thread wait until this is set
+        self.thread_may_write = threading.Event()
+        self.thread_may_write.set()
+        self.thread_writing = threading.Event()
+        self.fail = False
+
+    def _write(self, batch: list[dict]):
+        if threading.current_thread().name == "audit-log-writer":
+            self.thread_writing.set()
+            self.thread_may_write.wait(5)
+        if self.fail:
+            raise RuntimeError("Database unavailable")
+        self.batches.append((threading.current_thread().name, batch))
+
+    def written_logs(self) -> list[dict]:
+        return [log for _, batch in self.batches for log in batch]
+
+
+def logs(count: int, start: int = 0) -> list[dict]:
+    return [{"resource_id": id} for id in range(start, start + count)]
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("Timed out waiting for the audit log writer")
+        time.sleep(0.01)
+
+
+def test_logs_are_written_in_batches():
+    writer = RecordingWriter(batch_size=2)
+    writer.write_many(logs(5))
+    writer.shutdown()
+
+    assert writer.written_logs() == logs(5)
+    assert all(len(batch) <= 2 for _, batch in writer.batches)
+    assert all(name == "audit-log-writer" for name, _ in writer.batches)
+    assert writer.stats()["enqueued"] == 5
+    assert writer.stats()["written"] == 5
+
+
+def test_logs_are_written_after_flush_interval():
+    writer = RecordingWriter()
+    writer.write_many(logs(1))
+
+    # far fewer than `batch_size` logs are written once the interval has passed
+    wait_for(lambda: writer.stats()["written"] == 1)
+    assert writer.stats()["flushes"] == 1
+    writer.shutdown()
+
+
+def test_shutdown_writes_queued_logs():
+    writer = RecordingWriter()
+    writer.thread_may_write.clear()
+    writer.write_many(logs(1))
+    wait_for(writer.thread_writing.is_set)
+
+    writer.write_many(logs(3, start=1))
+    assert writer.stats()["queue_depth"] == 3
+
+    writer.thread_may_write.set()
+    writer.shutdown()
+    assert writer.written_logs() == logs(4)
+    assert writer.stats()["queue_depth"] == 0
+
+
+def test_caller_writes_logs_when_queue_is_full():
+    writer = RecordingWriter(queue_size=1, batch_size=1)
+    writer.thread_may_write.clear()
+    writer.write_many(logs(1))
+    wait_for(writer.thread_writing.is_set)
+
+    # the first log fills the queue, the rest are written by the caller
+    writer.write_many(logs(3, start=1))
+    assert writer.batches == [(threading.current_thread().name, logs(2, start=2))]
+    assert writer.stats()["backpressure_events"] == 1
+    assert writer.stats()["enqueued"] == 2
+
+    writer.thread_may_write.set()
+    writer.shutdown()
+    assert sorted(log["resource_id"] for log in writer.written_logs()) == [0, 1, 2, 3]
+
+
+def test_failed_writes_are_counted():
+    writer = RecordingWriter()
+    writer.fail = True
+    writer.write_many(logs(3))
+    writer.shutdown()
+
+    assert writer.stats()["failed"] == 3
+    assert writer.stats()["written"] == 0
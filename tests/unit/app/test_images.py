@@ -0,0 +1,44 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import os
+from pathlib import Path
+import time
+
+from app.images import ImagePipeline
+from app.util import write_json_atomically
+
+
+def create_job(pipeline: ImagePipeline, job_id: str) -> tuple[dict, Path, Path]:
+    job = {"id": job_id, "user_id": 1, "status": "pending"}
+    job_path = pipeline.jobs_directory.joinpath(f"{job_id}.json")
+    upload_path = pipeline.jobs_directory.joinpath(f"{job_id}.upload")
+    write_json_atomically(job, job_path)
+    upload_path.write_bytes(b"image")
+    return job, job_path, upload_path
+
+
+def test_job_fails_when_worker_dies(tmp_path):
+    pipeline = ImagePipeline()
+    pipeline.uploads_directory = str(tmp_path)
+    job, job_path, upload_path = create_job(pipeline, "a" * 32)
+
+    future = Future()
+    future.set_exception(BrokenProcessPool())
+    pipeline._job_done(time.perf_counter(), future, job, job_path, upload_path)
+
+    assert pipeline.get_job(job["id"])["status"] == "failed"
+    assert not upload_path.exists()
+
+
+def test_old_jobs_are_pruned(tmp_path):
+    pipeline = ImagePipeline()
+    pipeline.uploads_directory = str(tmp_path)
+    old_job, old_job_path, _ = create_job(pipeline, "a" * 32)
+    new_job, _, _ = create_job(pipeline, "b" * 32)
+
+    submitted_at = time.time() - pipeline.job_ttl - 1
+    os.utime(old_job_path, (submitted_at, submitted_at))
+    pipeline._prune_jobs()
+
+    assert pipeline.get_job(old_job["id"]) is None
+    assert pipeline.get_job(new_job["id"]) is not None